@@ -0,0 +1,74 @@
+"""
+Cold import benchmark
+
+Every measurement runs in a fresh interpreter, so nothing is shared through
+`sys.modules`. Compare the bare package import with importing a single vendor
+client and with the old eager behaviour (importing every vendor module).
+
+Usage:
+    python benchmarks/bench_import.py [--runs 10]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+VENDOR_MODULES = ["openai", "boto3", "aioboto3", "google.generativeai", "PIL"]
+
+SCENARIOS = {
+    "package only": "import shz_llm_client",
+    "OpenAIClient": "from shz_llm_client import OpenAIClient",
+    "AnthropicBedrockClient": "from shz_llm_client import AnthropicBedrockClient",
+    "GoogleClient": "from shz_llm_client import GoogleClient",
+    "eager (all vendors)": (
+        "import shz_llm_client.openai_client, shz_llm_client.perplexity_client, "
+        "shz_llm_client.google_client, shz_llm_client.anthropic_bedrock_client, "
+        "shz_llm_client.vision"
+    ),
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {vendors!r} if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(statement: str, runs: int) -> tuple[list[float], str]:
+    timings = []
+    loaded = ""
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                PROBE.format(statement=statement, vendors=VENDOR_MODULES),
+            ],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        )
+        elapsed, loaded = output.strip().partition(" ")[::2]
+        timings.append(float(elapsed))
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<24} {'median ms':>10} {'min ms':>8}  vendor modules loaded")
+    for name, statement in SCENARIOS.items():
+        timings, loaded = measure(statement, args.runs)
+        print(
+            f"{name:<24} {statistics.median(timings) * 1000:>10.1f} "
+            f"{min(timings) * 1000:>8.1f}  {loaded or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
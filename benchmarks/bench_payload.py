@@ -0,0 +1,99 @@
+"""
+Payload build benchmark for long chat histories
+
+Simulates a chat session: every turn appends a user and an assistant message to
+the history and builds the payload for the whole history, as `send` does. Every
+`--image-every`th user message carries a ~200KB base64 image.
+
+- legacy: the previous builder, pydantic dump of every text message and a new
+  data URL for every image on every call
+- cold: the current builder with its formatted-message memo cleared every turn
+- warm: the current builder, images of historical messages are formatted once
+
+Usage:
+    python benchmarks/bench_payload.py [--turns 1000] [--image-every 10]
+"""
+
+import argparse
+import base64
+import os
+import time
+
+from shz_llm_client import Base64ImageItem, OpenAIClient, RequestMessage
+
+
+def legacy_build_payload(client, messages, system_prompt):
+    formatted_messages = []
+    for message in [system_prompt, *messages]:
+        if message.b64_images:
+            content = [{"type": "text", "text": message.content}]
+            for image_item in message.b64_images:
+                content.append(
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/{image_item.image_type.value};base64,{image_item.b64_string}"
+                        },
+                    }
+                )
+            formatted_messages.append({"role": message.role, "content": content})
+        else:
+            formatted_messages.append(message.model_dump(exclude={"b64_images"}))
+
+    return {
+        "model": client.model_id,
+        "messages": formatted_messages,
+        "temperature": client.temperature,
+    }
+
+
+def run(turns: int, image_every: int, mode: str) -> float:
+    client = OpenAIClient(api_key="benchmark")
+    system_prompt = RequestMessage(
+        role="system", content="You are a helpful assistant."
+    )
+    image_item = Base64ImageItem(
+        b64_string=base64.b64encode(os.urandom(150_000)).decode(), image_type="jpeg"
+    )
+    history = []
+
+    elapsed = 0.0
+    for turn in range(turns):
+        b64_images = [image_item] if image_every and turn % image_every == 0 else []
+        history.append(
+            RequestMessage(
+                role="user", content=f"question {turn} " * 20, b64_images=b64_images
+            )
+        )
+        if mode == "cold":
+            client._message_format_cache.clear()
+
+        start = time.perf_counter()
+        if mode == "legacy":
+            legacy_build_payload(client, history, system_prompt)
+        else:
+            client._build_payload(history, system_prompt)
+        elapsed += time.perf_counter() - start
+
+        history.append(RequestMessage(role="assistant", content=f"answer {turn} " * 40))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--image-every", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns, {args.turns * 2} messages in the final history")
+    timings = {
+        mode: run(args.turns, args.image_every, mode)
+        for mode in ["legacy", "cold", "warm"]
+    }
+    for mode, elapsed in timings.items():
+        speedup = timings["legacy"] / elapsed
+        print(f"{mode:<8} {elapsed * 1000:9.1f} ms total  {speedup:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
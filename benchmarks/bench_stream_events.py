@@ -0,0 +1,125 @@
+"""
+Stream event benchmark
+
+Processes a stream of OpenAI chat completion chunks and reads the delta of every
+event, the way a consumer of `send(stream=True)` does.
+
+- legacy: the previous `_process_stream_response`, a new dict per chunk
+- events: the current `_process_stream_response`, yielding dict literals typed
+  as `StreamDelta` / `StreamStop`
+
+Reported per chunk: processing time, time to read `delta` and the memory of the
+events kept for a whole stream, as the response cache does.
+
+Usage:
+    python benchmarks/bench_stream_events.py [--chunks 200000]
+"""
+
+import argparse
+import logging
+import time
+import tracemalloc
+
+from openai.types.chat import ChatCompletionChunk
+
+from shz_llm_client import OpenAIClient
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_process_stream_response(chunk: ChatCompletionChunk) -> dict:
+    if chunk.usage:
+        return {
+            "delta": "",
+            "input_tokens": chunk.usage.prompt_tokens,
+            "output_tokens": chunk.usage.completion_tokens,
+            "total_tokens": chunk.usage.total_tokens,
+            "type": "stop",
+        }
+    choice = chunk.choices[0]
+    if choice.finish_reason not in ["stop", None]:
+        logger.warning(f"{chunk.id}: Finish Reason: {choice.finish_reason}")
+
+    if chunk.choices[0].delta.content is not None:
+        return {
+            "delta": chunk.choices[0].delta.content,
+            "type": "delta",
+        }
+    return {
+        "delta": "",
+        "type": "delta",
+    }
+
+
+def make_chunks(count: int) -> list[ChatCompletionChunk]:
+    def chunk(idx: int) -> ChatCompletionChunk:
+        return ChatCompletionChunk.model_validate(
+            {
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": f" tok{idx}"},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+        )
+
+    # Chunks are immutable here, reuse a few distinct ones to keep setup short
+    distinct = [chunk(idx) for idx in range(100)]
+    return [distinct[idx % 100] for idx in range(count)]
+
+
+def measure(process, chunks) -> dict:
+    start = time.perf_counter()
+    events = [process(chunk) for chunk in chunks]
+    process_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for event in events:
+        event["delta"]
+    read_time = time.perf_counter() - start
+    del events
+
+    tracemalloc.start()
+    events = [process(chunk) for chunk in chunks]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+
+    count = len(chunks)
+    return {
+        "process_ns": process_time / count * 1e9,
+        "read_ns": read_time / count * 1e9,
+        "bytes": retained / count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=200_000)
+    args = parser.parse_args()
+
+    client = OpenAIClient(api_key="benchmark", stream=True)
+    chunks = make_chunks(args.chunks)
+
+    results = {
+        "legacy": measure(legacy_process_stream_response, chunks),
+        "events": measure(client._process_stream_response, chunks),
+    }
+
+    print(f"{args.chunks} chunks, per chunk:")
+    for name, result in results.items():
+        print(
+            f"{name:<8} process {result['process_ns']:7.1f} ns  "
+            f"read {result['read_ns']:6.1f} ns  "
+            f"retained {result['bytes']:6.1f} B"
+        )
+
+
+if __name__ == "__main__":
+    main()
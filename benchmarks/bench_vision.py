@@ -0,0 +1,127 @@
+"""
+Image pipeline memory / latency benchmark
+
+Generates a large JPEG and PNG, then runs every scenario in a fresh interpreter
+and reports wall time and the growth of the peak resident set size (PIL pixel
+buffers live outside the Python allocator, so tracemalloc would miss them).
+Linux only: the peak is read from VmHWM, since ru_maxrss survives exec.
+
+- legacy_stream_to_base64: the previous S3 path, the whole body is read and kept
+  while it is encoded
+- new_stream_to_base64: chunked encoding of the same stream
+- legacy_resize_image: the previous resize, full size decode
+- new_resize_image / new_load_image_item: reduced scale decode for JPEGs
+
+Usage:
+    python benchmarks/bench_vision.py [--width 6000 --height 4000]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import base64, sys, time
+from io import BytesIO
+from PIL import Image
+from shz_llm_client import vision
+
+path = sys.argv[1]
+
+def peak_rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+def legacy_stream_to_base64():
+    with open(path, "rb") as f:
+        image_data = f.read()
+        encoded_string = base64.b64encode(image_data).decode("utf-8")
+        return encoded_string
+
+def legacy_resize_image():
+    with open(path, "rb") as f:
+        image = Image.open(f)
+        width, height = image.size
+        short_side, long_side = sorted((width, height))
+        scale = min(1568 / short_side, 1568 / long_side)
+        image = image.resize((int(width * scale), int(height * scale)))
+        out = BytesIO()
+        image.save(out, format=path.rsplit(".", 1)[-1].upper())
+        return base64.b64encode(out.getvalue()).decode("utf-8")
+
+def new_stream_to_base64():
+    with open(path, "rb") as f:
+        return vision._stream_to_base64(f)
+
+def new_resize_image():
+    with open(path, "rb") as f:
+        return vision.resize_image(f, 1568, 1568)
+
+def new_load_image_item():
+    return vision.load_image_item(path, 1568, 1568)
+
+scenario = globals()[sys.argv[2]]
+baseline = peak_rss_kb()
+start = time.perf_counter()
+scenario()
+elapsed = time.perf_counter() - start
+peak = peak_rss_kb()
+print(elapsed, (peak - baseline) / 1024)
+"""
+
+SCENARIOS = [
+    "legacy_stream_to_base64",
+    "new_stream_to_base64",
+    "legacy_resize_image",
+    "new_resize_image",
+    "new_load_image_item",
+]
+
+
+def make_images(directory: str, width: int, height: int) -> list[str]:
+    from PIL import Image
+
+    # Noise on a gradient so the encoders can't compress it away
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 64)
+    image = Image.merge(
+        "RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT))
+    )
+
+    paths = []
+    for image_format in ["jpeg", "png"]:
+        path = os.path.join(directory, f"large.{image_format}")
+        image.save(path, format=image_format.upper())
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=6000)
+    parser.add_argument("--height", type=int, default=4000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for path in make_images(directory, args.width, args.height):
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(
+                f"\n{os.path.basename(path)} {args.width}x{args.height} {size_mb:.1f} MB"
+            )
+            print(f"{'scenario':<24} {'time ms':>8} {'peak RSS +MB':>13}")
+            for scenario in SCENARIOS:
+                output = subprocess.check_output(
+                    [sys.executable, "-c", PROBE, path, scenario],
+                    text=True,
+                    stderr=subprocess.DEVNULL,
+                )
+                elapsed, rss_mb = map(float, output.split())
+                print(f"{scenario:<24} {elapsed * 1000:>8.1f} {rss_mb:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
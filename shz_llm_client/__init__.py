@@ -1,16 +1,113 @@
-from .anthropic_bedrock_client import AnthropicBedrockClient
+"""
+Vendor clients are resolved lazily on first attribute access, so importing
+`shz_llm_client` only pays for the SDK of the vendor that is actually used.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
 from .base_client import BaseLLMClient
-from .google_client import GoogleClient
-from .openai_client import OpenAIClient
-from .perplexity_client import PerplexityClient
-from .schemas import Base64ImageItem, RequestMessage
+from .factory import LLMClientFactory
+from .image_cache import ImageCache
+from .instrumentation import ClientObserver, RequestTrace
+from .router import RouterClient
+from .schemas import (
+    Base64ImageItem,
+    BatchRequest,
+    BatchResult,
+    Conversation,
+    LLMResponse,
+    RequestMessage,
+    StreamDelta,
+    StreamEvent,
+    StreamStop,
+    stream_stop,
+)
+from .stream_coalescing import DeltaCoalescing
+from .usage import UsageStats
+
+if TYPE_CHECKING:
+    from .anthropic_bedrock_client import AnthropicBedrockClient
+    from .google_client import GoogleClient
+    from .openai_client import OpenAIClient
+    from .perplexity_client import PerplexityClient
+    from .vision import (
+        async_load_s3_images,
+        async_prepare_images,
+        image_to_base64,
+        load_image_item,
+        prepare_images,
+        resize_image,
+        s3_image_to_base64,
+    )
+
+# Public name -> (submodule, pip extra that provides its dependencies)
+_LAZY_ATTRS = {
+    "OpenAIClient": ("openai_client", "openai"),
+    "PerplexityClient": ("perplexity_client", "perplexity"),
+    "GoogleClient": ("google_client", "google"),
+    "AnthropicBedrockClient": ("anthropic_bedrock_client", "bedrock"),
+    "image_to_base64": ("vision", "vision"),
+    "s3_image_to_base64": ("vision", "vision"),
+    "resize_image": ("vision", "vision"),
+    "load_image_item": ("vision", "vision"),
+    "prepare_images": ("vision", "vision"),
+    "async_prepare_images": ("vision", "vision"),
+    "async_load_s3_images": ("vision", "vision"),
+}
 
 __all__ = [
     "RequestMessage",
+    "Conversation",
     "Base64ImageItem",
+    "BatchRequest",
+    "BatchResult",
+    "StreamEvent",
+    "StreamDelta",
+    "StreamStop",
+    "stream_stop",
+    "LLMResponse",
+    "UsageStats",
+    "DeltaCoalescing",
+    "ClientObserver",
+    "RequestTrace",
     "BaseLLMClient",
+    "RouterClient",
+    "LLMClientFactory",
+    "ImageCache",
     "OpenAIClient",
     "GoogleClient",
     "AnthropicBedrockClient",
     "PerplexityClient",
+    "image_to_base64",
+    "s3_image_to_base64",
+    "resize_image",
+    "load_image_item",
+    "prepare_images",
+    "async_prepare_images",
+    "async_load_s3_images",
 ]
+
+
+def __getattr__(name: str):
+    try:
+        module_name, extra = _LAZY_ATTRS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    try:
+        module = importlib.import_module(f".{module_name}", __name__)
+    except ImportError as e:
+        raise ImportError(
+            f"{name} requires optional dependencies, "
+            f"install them with `pip install shz-llm-client[{extra}]`"
+        ) from e
+
+    value = getattr(module, name)
+    # Cache on the package so the next lookup skips __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,18 +1,68 @@
+import asyncio
 import json
+import threading
+from contextlib import AsyncExitStack
+from io import BytesIO
 
-import aioboto3
 import boto3
+from botocore import exceptions as botocore_exceptions
+from botocore.config import Config
 
 from .base_client import BaseLLMClient
-from .schemas import RequestMessage
+from .schemas import (
+    Conversation,
+    LLMResponse,
+    RequestMessage,
+    StreamDelta,
+    StreamStop,
+    stream_stop,
+)
+from .stream_bridge import async_iterate_in_thread, read_ahead
+
+# Error codes of transient Bedrock failures, retried by `retry_policy`
+RETRYABLE_ERROR_CODES = frozenset(
+    {
+        "ThrottlingException",
+        "ServiceUnavailableException",
+        "InternalServerException",
+        "ModelNotReadyException",
+        "ModelTimeoutException",
+    }
+)
+
+# Events buffered when an async stream is read from a sync boto3 stream
+DEFAULT_READ_AHEAD = 64
+
+# Cache breakpoints Anthropic accepts per request
+MAX_CACHE_BREAKPOINTS = 4
+
+_EPHEMERAL_CACHE = {"type": "ephemeral"}
 
 
 class AnthropicBedrockClient(BaseLLMClient):
     """
     Client for Anthropic through AWS Bedrock
 
+    The async `bedrock-runtime` client is created on first use and kept open for
+    the lifetime of the instance, so concurrent streams share its keep-alive
+    connection pool (`max_pool_connections`). Close it with `aclose()` or use the
+    instance as an async context manager. Like any aiohttp based client, it is
+    bound to the event loop that first used it.
+
+    With `use_aioboto3=False` the async methods use the sync boto3 client
+    instead: calls run in a worker thread and streams are read through a thread
+    bridge, so the event loop never blocks. `stream_read_ahead` reads sync
+    streams in a background thread, up to that many events ahead of the
+    consumer (0 reads them inline).
+
+    With a `retry_policy` set, the boto3 clients make a single attempt per
+    request, so botocore's own retries don't multiply the policy's attempts.
+
+    Messages and system prompts with `cache_prompt` set end with a prompt cache
+    breakpoint, up to `MAX_CACHE_BREAKPOINTS` per request.
+
     Todo:
-    - Handle `aws_region`, `nathropic_version`
+    - Handle `anthropic_version`
     """
 
     def __init__(
@@ -22,83 +72,89 @@ class AnthropicBedrockClient(BaseLLMClient):
         temperature=0.2,
         max_tokens=1000,
         aws_region="us-west-2",
+        max_pool_connections=10,
+        use_aioboto3=True,
+        stream_read_ahead=0,
     ):
         super().__init__(
             api_key=None, model_id=model_id, stream=stream, temperature=temperature
         )
         self._model_id = model_id
+        self._aws_region = aws_region
+        self._boto_config = Config(max_pool_connections=max_pool_connections)
 
-        self.client = boto3.client(
-            service_name="bedrock-runtime", region_name=aws_region
-        )
+        self._use_aioboto3 = use_aioboto3
+        self._stream_read_ahead = stream_read_ahead
+
+        # SDK clients and whether botocore retries on their own, see `_sdk_config`
+        self._client = None
+        self._client_sdk_retries: bool | None = None
+        self._client_lock = threading.Lock()
+        self._async_client = None
+        self._async_client_sdk_retries: bool | None = None
+        self._async_exit_stack: AsyncExitStack | None = None
+        self._async_client_lock = asyncio.Lock()
 
         self._temperature = temperature
         self._max_tokens = max_tokens
 
+    def _format_message(self, message: RequestMessage) -> dict:
+        if not message.b64_images:
+            if message.cache_prompt:
+                return {"role": message.role, "content": self._cached_text(message)}
+            return {"role": message.role, "content": message.content}
+
+        if len(message.b64_images) > 20:
+            raise ValueError("Claude only supports up to 20 images per request")
+
+        content = []
+        label_images = len(message.b64_images) > 1
+        for idx, image_item in enumerate(message.b64_images):
+            if label_images:
+                content.append({"type": "text", "text": f"Image {idx+1}:"})
+            content.append(
+                {
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": f"image/{image_item.image_type.value}",
+                        "data": image_item.b64_string,
+                    },
+                }
+            )
+        if message.cache_prompt:
+            content.extend(self._cached_text(message))
+        else:
+            content.append({"type": "text", "text": message.content})
+
+        return {"role": message.role, "content": content}
+
+    @staticmethod
+    def _cached_text(message: RequestMessage) -> list[dict]:
+        """Text content block of `message`, ending with a cache breakpoint"""
+        return [
+            {
+                "type": "text",
+                "text": message.content,
+                "cache_control": dict(_EPHEMERAL_CACHE),
+            }
+        ]
+
     def _build_payload(
         self,
-        messages: list[RequestMessage],
+        messages: list[RequestMessage] | Conversation,
         system_prompt: RequestMessage | None = None,
     ) -> dict:
-        formatted_messages = []
-        for message in messages:
-            if len(message.b64_images) == 1:
-                formatted_message = {
-                    "role": message.role,
-                    "content": [],
-                }
-
-                for image_item in message.b64_images:
-                    formatted_message["content"].append(
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": f"image/{image_item.image_type.value}",
-                                "data": image_item.b64_string,
-                            },
-                        }
-                    )
-                formatted_message["content"].append(
-                    {
-                        "type": "text",
-                        "text": message.content,
-                    }
-                )
-
-                formatted_messages.append(formatted_message)
-            elif len(message.b64_images) > 1:
-                formatted_message = {
-                    "role": message.role,
-                    "content": [],
-                }
+        breakpoints = sum(message.cache_prompt for message in messages)
+        if system_prompt and system_prompt.cache_prompt:
+            breakpoints += 1
+        if breakpoints > MAX_CACHE_BREAKPOINTS:
+            raise ValueError(
+                f"Claude only supports up to {MAX_CACHE_BREAKPOINTS} cache "
+                "breakpoints per request"
+            )
 
-                for idx, image_item in enumerate(message.b64_images):
-                    formatted_message["content"].append(
-                        {"type": "text", "text": f"Image {idx+1}:"}
-                    )
-                    formatted_message["content"].append(
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": f"image/{image_item.image_type.value}",
-                                "data": image_item.b64_string,
-                            },
-                        }
-                    )
-                formatted_message["content"].append(
-                    {
-                        "type": "text",
-                        "text": message.content,
-                    }
-                )
-                formatted_messages.append(formatted_message)
-            elif len(message.b64_images) > 20:
-                raise ValueError("Claude only supports up to 20 images per request")
-            else:
-                message_dict = message.dict(exclude={"b64_images"})
-                formatted_messages.append(message_dict)
+        formatted_messages = self._format_messages(messages)
 
         payload = {
             "anthropic_version": "bedrock-2023-05-31",
@@ -106,38 +162,156 @@ class AnthropicBedrockClient(BaseLLMClient):
             "messages": formatted_messages,
         }
 
-        if system_prompt:
+        if system_prompt and system_prompt.cache_prompt:
+            payload["system"] = self._cached_text(system_prompt)
+        elif system_prompt:
             payload["system"] = system_prompt.content
 
         return payload
 
-    # Async Method
-    async def async_send(
-        self, messages: list[RequestMessage], system_prompt: RequestMessage
-    ):
-        payload = self._build_payload(messages, system_prompt)
-
-        aio_session = aioboto3.Session()
-        async with aio_session.client(
-            "bedrock-runtime", region_name="us-west-2"
-        ) as aio_client:
-            if self.stream:
-                response = await aio_client.invoke_model_with_response_stream(
-                    body=json.dumps(payload), modelId=self._model_id
+    #
+    # SDK Clients
+    #
+    def _sdk_config(self, sdk_retries: bool) -> Config:
+        if sdk_retries:
+            return self._boto_config
+        # `retry_policy` retries the request, botocore makes a single attempt
+        return self._boto_config.merge(
+            Config(retries={"total_max_attempts": 1, "mode": "standard"})
+        )
+
+    @property
+    def client(self):
+        """The sync `bedrock-runtime` client, created on first use"""
+        sdk_retries = self.retry_policy is None
+        if self._client is not None and self._client_sdk_retries in (
+            None,
+            sdk_retries,
+        ):
+            return self._client
+
+        with self._client_lock:
+            if self._client is None or self._client_sdk_retries not in (
+                None,
+                sdk_retries,
+            ):
+                self._client = boto3.client(
+                    service_name="bedrock-runtime",
+                    region_name=self._aws_region,
+                    config=self._sdk_config(sdk_retries),
                 )
-                async for event in response.get("body"):
-                    chunk = json.loads(event["chunk"]["bytes"])
-                    yield self._process_stream_response(chunk)
-            else:
-                response = await aio_client.invoke_model(
-                    body=payload, modelId=self._model_id
+                self._client_sdk_retries = sdk_retries
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        # A client given by the caller is used whatever the retry policy
+        self._client = value
+        self._client_sdk_retries = None
+
+    #
+    # Async Client Lifecycle
+    #
+    async def _get_async_client(self):
+        sdk_retries = self.retry_policy is None
+        if (
+            self._async_client is not None
+            and self._async_client_sdk_retries == sdk_retries
+        ):
+            return self._async_client
+
+        async with self._async_client_lock:
+            if (
+                self._async_client is None
+                or self._async_client_sdk_retries != sdk_retries
+            ):
+                # aioboto3 is only needed by the async path
+                import aioboto3
+
+                if self._async_exit_stack is None:
+                    self._async_exit_stack = AsyncExitStack()
+                # A client of the previous retry policy stays open until
+                # `aclose`, requests may still be using it
+                self._async_client = await self._async_exit_stack.enter_async_context(
+                    aioboto3.Session().client(
+                        "bedrock-runtime",
+                        region_name=self._aws_region,
+                        config=self._sdk_config(sdk_retries),
+                    )
                 )
-                yield self._process_response(response)
+                self._async_client_sdk_retries = sdk_retries
+
+        return self._async_client
+
+    async def aclose(self):
+        """Close the shared async client and release its connection pool"""
+        async with self._async_client_lock:
+            exit_stack = self._async_exit_stack
+            self._async_client = None
+            self._async_client_sdk_retries = None
+            self._async_exit_stack = None
+
+            if exit_stack is not None:
+                await exit_stack.aclose()
+
+    async def __aenter__(self):
+        await self._get_async_client()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    # Async Method
+    async def _async_make_api_request(self, payload: dict) -> dict:
+        if not self._use_aioboto3:
+            response = await asyncio.to_thread(self._make_api_request, payload)
+            if not self.stream:
+                body = await asyncio.to_thread(response["body"].read)
+                response["body"] = BytesIO(body)
+            return response
+
+        aio_client = await self._get_async_client()
+        payload = json.dumps(payload)
+
+        if self.stream:
+            return await aio_client.invoke_model_with_response_stream(
+                body=payload, modelId=self._model_id
+            )
+
+        response = await aio_client.invoke_model(body=payload, modelId=self._model_id)
+        # Read the aiobotocore body here so `_process_response` handles both paths
+        response["body"] = BytesIO(await response["body"].read())
+        return response
+
+    async def _async_stream_response_generator(self, response):
+        events = response.get("body")
+        if not hasattr(events, "__aiter__"):
+            # A sync boto3 stream, see `use_aioboto3`
+            events = async_iterate_in_thread(
+                events, self._stream_read_ahead or DEFAULT_READ_AHEAD
+            )
+
+        stop_reason = None
+        async for event in events:
+            chunk = self._decode_stream_event(event)
+            if chunk is None:
+                continue
+            stop_reason = self._stop_reason(chunk, stop_reason)
+            yield self._process_stream_response(chunk, stop_reason)
 
     # Sync Method
     def _stream_response_generator(self, response):
-        for event in response.get("body"):
-            yield self._process_response(event)
+        events = response.get("body")
+        if self._stream_read_ahead:
+            events = read_ahead(events, self._stream_read_ahead)
+
+        stop_reason = None
+        for event in events:
+            chunk = self._decode_stream_event(event)
+            if chunk is None:
+                continue
+            stop_reason = self._stop_reason(chunk, stop_reason)
+            yield self._process_stream_response(chunk, stop_reason)
 
     def _make_api_request(self, payload: dict) -> dict:
         payload = json.dumps(payload)
@@ -147,49 +321,90 @@ class AnthropicBedrockClient(BaseLLMClient):
             )
         return self.client.invoke_model(body=payload, modelId=self._model_id)
 
-    def send(self, messages: list[RequestMessage], system_prompt: RequestMessage):
-        payload = self._build_payload(messages, system_prompt)
-        response = self._make_api_request(payload)
-
-        if self.stream:
-            return self._stream_response_generator(response)
-        else:
-            return self._process_response(response)
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(
+            error,
+            (botocore_exceptions.ConnectionError, botocore_exceptions.ReadTimeoutError),
+        ):
+            return True
+        if isinstance(error, botocore_exceptions.ClientError):
+            return error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+        return False
 
     #
     # Process Response
     #
-    def _process_response(self, response: dict) -> str:
-        if self.stream:
-            chunk = json.loads(response["chunk"]["bytes"])
-            if chunk["type"] == "content_block_delta":
-                return chunk["delta"]["text"]
-            else:
-                return ""
-        else:
-            body = response.get("body", None)
-            if body is None:
-                return ""
-            else:
-                response_body = json.loads(body.read())
-                contents = response_body.get("content", [])
-                text = contents[0].get("text", "")
-                return text
-
-    def _process_stream_response(self, chunk) -> dict:
+    def _process_response(self, response: dict) -> LLMResponse:
+        body = response.get("body", None)
+        if body is None:
+            return LLMResponse("")
+        return self._process_response_body(json.loads(body.read()))
+
+    def _process_response_body(self, response_body: dict) -> LLMResponse:
+        contents = response_body.get("content", [])
+        text = contents[0].get("text", "") if contents else ""
+
+        usage = response_body.get("usage") or {}
+        input_tokens = usage.get("input_tokens")
+        output_tokens = usage.get("output_tokens")
+        # `input_tokens` excludes the prompt tokens read from / written to the cache
+        cache_read_tokens = usage.get("cache_read_input_tokens")
+        cache_write_tokens = usage.get("cache_creation_input_tokens")
+        total_tokens = None
+        if input_tokens is not None and output_tokens is not None:
+            total_tokens = (
+                input_tokens
+                + output_tokens
+                + (cache_read_tokens or 0)
+                + (cache_write_tokens or 0)
+            )
+
+        return LLMResponse(
+            text,
+            input_tokens,
+            output_tokens,
+            total_tokens,
+            finish_reason=response_body.get("stop_reason"),
+            cache_read_tokens=cache_read_tokens,
+            cache_write_tokens=cache_write_tokens,
+        )
+
+    @staticmethod
+    def _decode_stream_event(event: dict) -> dict | None:
+        """Return the Anthropic chunk of a stream event, None for other events"""
+        # botocore raises the exception events of the stream itself
+        chunk = event.get("chunk")
+        if chunk is None:
+            return None
+        return json.loads(chunk["bytes"])
+
+    @staticmethod
+    def _stop_reason(chunk: dict, stop_reason: str | None) -> str | None:
+        # The stop reason comes in `message_delta`, before the `message_stop`
+        # chunk that carries the invocation metrics
+        if chunk["type"] == "message_delta":
+            return chunk.get("delta", {}).get("stop_reason", stop_reason)
+        return stop_reason
+
+    def _process_stream_response(
+        self, chunk, stop_reason: str | None = None
+    ) -> StreamDelta | StreamStop:
         if chunk["type"] == "content_block_delta":
-            return {
-                "delta": chunk["delta"]["text"],
-                "type": "delta",
-            }
+            return {"delta": chunk["delta"]["text"], "type": "delta"}
         elif chunk["type"] == "message_stop":
             usage = chunk["amazon-bedrock-invocationMetrics"]
-            return {
-                "delta": "",
-                "input_tokens": usage["inputTokenCount"],
-                "output_tokens": usage["outputTokenCount"],
-                "total_tokens": usage["inputTokenCount"] + usage["outputTokenCount"],
-                "type": "stop",
-            }
+            cache_read_tokens = usage.get("cacheReadInputTokenCount")
+            cache_write_tokens = usage.get("cacheWriteInputTokenCount")
+            return stream_stop(
+                input_tokens=usage["inputTokenCount"],
+                output_tokens=usage["outputTokenCount"],
+                total_tokens=usage["inputTokenCount"]
+                + usage["outputTokenCount"]
+                + (cache_read_tokens or 0)
+                + (cache_write_tokens or 0),
+                finish_reason=stop_reason,
+                cache_read_tokens=cache_read_tokens,
+                cache_write_tokens=cache_write_tokens,
+            )
         else:
             return {"delta": "", "type": "delta"}
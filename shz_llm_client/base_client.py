@@ -1,7 +1,37 @@
-from shz_llm_client.schemas import RequestMessage
+import asyncio
+import time
+import weakref
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import Any
+
+from shz_llm_client.instrumentation import (
+    NOOP_TRACER,
+    ClientObserver,
+    RequestTrace,
+    RequestTracer,
+)
+from shz_llm_client.lru_cache import LRUCache
+from shz_llm_client.rate_limit import RateLimiter, TokenBucket
+from shz_llm_client.response_cache import ResponseCache, make_cache_key
+from shz_llm_client.retry import Hedging, RetryPolicy
+from shz_llm_client.schemas import (
+    Conversation,
+    LLMResponse,
+    RequestMessage,
+    StreamStop,
+)
+from shz_llm_client.stream_coalescing import (
+    DeltaCoalescing,
+    async_coalesce_deltas,
+    coalesce_deltas,
+)
+from shz_llm_client.usage import UsageCounter, UsageStats
 
 
 class BaseLLMClient:
+    # Number of formatted messages memoized per client, see `_format_message_cached`
+    MESSAGE_FORMAT_CACHE_SIZE = 4096
+
     def __init__(self, api_key, model_id, stream=False, temperature=0.2):
         self._llm_client = None
         self.api_key = api_key
@@ -9,13 +39,442 @@ class BaseLLMClient:
         self.stream: bool = stream
         self._temperature: float = temperature
         self._config: dict = {}
+        self.response_cache: ResponseCache | None = None
+        self.rate_limiter: RateLimiter | None = None
+        self.retry_policy: RetryPolicy | None = None
+        self.hedging: Hedging | None = None
+        self.delta_coalescing: DeltaCoalescing | None = None
+        self.observers: list[ClientObserver] = []
+        self.usage_counter = UsageCounter()
 
-    def async_send(self, messages: list[RequestMessage], system_prompt: RequestMessage):
-        raise NotImplementedError
+        # id(message) -> (weakref to message, fingerprint, formatted message)
+        self._message_format_cache = LRUCache(maxsize=self.MESSAGE_FORMAT_CACHE_SIZE)
+
+    #
+    # Send
+    #
+    # Vendor clients implement the `_build_payload`, `_make_api_request` and
+    # `_process_*` hooks below, `send` and `async_send` tie them together.
+    #
+    async def async_send(
+        self, messages: list[RequestMessage], system_prompt: RequestMessage
+    ):
+        started_at = time.perf_counter()
+        tracer = self._start_trace()
+        try:
+            payload = self._build_payload(messages, system_prompt)
+            tracer.payload_built()
+
+            cache_key = self._response_cache_key(payload)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    tracer.cache_hit()
+                    self.usage_counter.record_cached()
+                    if self.stream:
+                        for event in self._coalesce(self._replay_cached(cached)):
+                            yield event
+                    else:
+                        yield self._cached_response(cached, started_at)
+                    tracer.end()
+                    return
+
+            response = await self._async_request(payload)
+            tracer.response()
+
+            if self.stream:
+                stream = tracer.async_trace_stream(
+                    self._async_stream_response_generator(response)
+                )
+                if self.delta_coalescing is not None:
+                    stream = async_coalesce_deltas(stream, self.delta_coalescing)
+
+                events = []
+                async for event in stream:
+                    if event["type"] == "stop":
+                        self._finish_stop(event, started_at)
+                    if cache_key is not None:
+                        events.append(dict(event))
+                    yield event
+
+                if cache_key is not None:
+                    self.response_cache.set(cache_key, events)
+            else:
+                text = self._finish_response(
+                    self._process_response(response), started_at
+                )
+                tracer.usage(text)
+                tracer.end()
+                if cache_key is not None:
+                    self.response_cache.set(cache_key, text)
+                yield text
+        except GeneratorExit:
+            tracer.end()
+            raise
+        except BaseException as e:
+            if isinstance(e, Exception):
+                self.usage_counter.record_error()
+            tracer.end(error=e)
+            raise
 
     def send(self, messages: list[RequestMessage], system_prompt: RequestMessage):
+        started_at = time.perf_counter()
+        tracer = self._start_trace()
+        try:
+            payload = self._build_payload(messages, system_prompt)
+            tracer.payload_built()
+
+            cache_key = self._response_cache_key(payload)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    tracer.cache_hit()
+                    tracer.end()
+                    self.usage_counter.record_cached()
+                    if self.stream:
+                        return self._coalesce(self._replay_cached(cached))
+                    return self._cached_response(cached, started_at)
+
+            response = self._request(payload)
+            tracer.response()
+
+            if self.stream:
+                # The tracer ends with the stream
+                events = tracer.trace_stream(self._stream_response_generator(response))
+                return self._finish_stream(
+                    self._coalesce(events), started_at, cache_key
+                )
+
+            text = self._finish_response(self._process_response(response), started_at)
+            tracer.usage(text)
+            tracer.end()
+        except Exception as e:
+            self.usage_counter.record_error()
+            tracer.end(error=e)
+            raise
+        except BaseException as e:
+            tracer.end(error=e)
+            raise
+
+        if cache_key is not None:
+            self.response_cache.set(cache_key, text)
+        return text
+
+    @property
+    def usage(self) -> UsageStats:
+        """Aggregated usage of the requests sent by this client"""
+        return self.usage_counter.stats
+
+    def _finish_response(self, text: str, started_at: float) -> LLMResponse:
+        if not isinstance(text, LLMResponse):
+            text = LLMResponse(text)
+        text.latency = time.perf_counter() - started_at
+        self.usage_counter.record(
+            text.input_tokens,
+            text.output_tokens,
+            text.total_tokens,
+            text.latency,
+            cache_read_tokens=text.cache_read_tokens,
+            cache_write_tokens=text.cache_write_tokens,
+        )
+        return text
+
+    def _finish_stop(self, event: StreamStop, started_at: float):
+        event["latency"] = time.perf_counter() - started_at
+        self.usage_counter.record(
+            event.get("input_tokens"),
+            event.get("output_tokens"),
+            event.get("total_tokens"),
+            event["latency"],
+            cache_read_tokens=event.get("cache_read_tokens"),
+            cache_write_tokens=event.get("cache_write_tokens"),
+        )
+
+    def _finish_stream(
+        self, events: Iterable, started_at: float, cache_key: str | None
+    ) -> Iterator:
+        # Only a fully consumed stream is stored
+        recorded = []
+        try:
+            for event in events:
+                if event["type"] == "stop":
+                    self._finish_stop(event, started_at)
+                if cache_key is not None:
+                    recorded.append(dict(event))
+                yield event
+        except Exception:
+            self.usage_counter.record_error()
+            raise
+
+        if cache_key is not None:
+            self.response_cache.set(cache_key, recorded)
+
+    def _cached_response(self, cached: str, started_at: float) -> LLMResponse:
+        return LLMResponse(
+            cached,
+            getattr(cached, "input_tokens", None),
+            getattr(cached, "output_tokens", None),
+            getattr(cached, "total_tokens", None),
+            getattr(cached, "finish_reason", None),
+            latency=time.perf_counter() - started_at,
+            cached=True,
+            cache_read_tokens=getattr(cached, "cache_read_tokens", None),
+            cache_write_tokens=getattr(cached, "cache_write_tokens", None),
+        )
+
+    def _start_trace(self):
+        """Return the tracer of a new request, a no-op without observers"""
+        if not self.observers:
+            return NOOP_TRACER
+        return RequestTracer(
+            self.observers,
+            RequestTrace(type(self).__name__, self._model_id, self.stream),
+        )
+
+    def _coalesce(self, events: Iterable) -> Iterable:
+        if self.delta_coalescing is None:
+            return events
+        return coalesce_deltas(events, self.delta_coalescing)
+
+    #
+    # Retries
+    #
+    def _is_retryable(self, error: Exception) -> bool:
+        """Whether `error` is transient, e.g. throttling, vendor clients override it"""
+        return False
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float | None:
+        """Seconds to wait before retrying a request that failed `attempt + 1` times"""
+        policy = self.retry_policy
+        if policy is None or attempt + 1 >= policy.max_attempts:
+            return None
+        if not (isinstance(error, policy.retry_on) or self._is_retryable(error)):
+            return None
+        if policy.budget is not None and not policy.budget.withdraw():
+            return None
+        return policy.backoff(attempt)
+
+    def _request(self, payload: dict):
+        if self.retry_policy is not None and self.retry_policy.budget is not None:
+            self.retry_policy.budget.deposit()
+
+        attempt = 0
+        while True:
+            try:
+                return self._make_api_request(payload)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    async def _async_request(self, payload: dict):
+        if self.retry_policy is not None and self.retry_policy.budget is not None:
+            self.retry_policy.budget.deposit()
+
+        attempt = 0
+        while True:
+            try:
+                if self.hedging is not None and not self.stream:
+                    return await self._async_hedged_request(payload)
+                return await self._async_attempt(payload)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _async_attempt(self, payload: dict):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(payload)
+        return await self._async_make_api_request(payload)
+
+    async def _async_hedged_request(self, payload: dict):
+        """
+        Send the request, and a second one if the first is slower than the
+        hedge delay. The first successful response wins, the other request is
+        cancelled; an error is raised only when both fail.
+        """
+        started_at = time.perf_counter()
+        first = asyncio.ensure_future(self._async_attempt(payload))
+        tasks = {first}
+        try:
+            hedge_delay = self.hedging.hedge_delay
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    tasks.add(asyncio.ensure_future(self._async_attempt(payload)))
+
+            while True:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Prefer the original request when both finished together
+                for task in sorted(done, key=lambda task: task is not first):
+                    if task.exception() is None:
+                        self.hedging.record(time.perf_counter() - started_at)
+                        return task.result()
+                if not tasks:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    #
+    # Response Cache
+    #
+    def _response_cache_key(self, payload: dict) -> str | None:
+        if self.response_cache is None:
+            return None
+        namespace = f"{type(self).__name__}:{self._model_id}:stream={self.stream}"
+        return make_cache_key(namespace, payload)
+
+    def _replay_cached(self, cached) -> Iterator:
+        if not self.stream:
+            yield cached
+            return
+        for event in cached:
+            # Copies, so callers editing events don't edit the cached ones
+            yield dict(event)
+
+    async def _async_collect(
+        self, messages: list[RequestMessage], system_prompt: RequestMessage | None
+    ) -> str:
+        """Run `async_send` to completion and return the full response text"""
+        if not self.stream:
+            responses = [r async for r in self.async_send(messages, system_prompt)]
+            return responses[-1] if responses else ""
+
+        deltas = []
+        async for event in self.async_send(messages, system_prompt):
+            if event["delta"]:
+                deltas.append(event["delta"])
+        return "".join(deltas)
+
+    async def send_many(
+        self,
+        conversations: Iterable[list[RequestMessage]],
+        system_prompt: RequestMessage | None = None,
+        max_concurrency: int = 8,
+        rate_limit: float | TokenBucket | None = None,
+        return_exceptions: bool = False,
+    ) -> AsyncIterator[tuple[int, str | BaseException]]:
+        """
+        Send many independent conversations concurrently
+
+        Yields `(index, response)` tuples in completion order, where `index` is the
+        position of the conversation in `conversations` and `response` is the full
+        response text (stream deltas are joined).
+
+        Args:
+            - conversations: Message lists, consumed lazily
+            - system_prompt: System prompt shared by every conversation
+            - max_concurrency: Maximum number of requests in flight
+            - rate_limit: Requests per second, or a shared `TokenBucket`
+            - return_exceptions: Yield failed requests as `(index, exception)`
+              instead of raising and cancelling the remaining requests
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        if isinstance(rate_limit, (int, float)):
+            rate_limit = TokenBucket(rate=rate_limit)
+
+        async def run(index: int, messages: list[RequestMessage]):
+            if rate_limit is not None:
+                await rate_limit.acquire()
+            try:
+                return index, await self._async_collect(messages, system_prompt)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return index, e
+
+        # Only `max_concurrency` tasks exist at a time, so `conversations` can be
+        # a large lazy iterable without scheduling everything upfront.
+        conversation_iter = enumerate(conversations)
+        pending: set[asyncio.Task] = set()
+        try:
+            while True:
+                for index, messages in conversation_iter:
+                    pending.add(asyncio.ensure_future(run(index, messages)))
+                    if len(pending) >= max_concurrency:
+                        break
+
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Retrieve the error of every finished task, so none is
+                # logged as never retrieved, then raise the first one
+                errors = [task.exception() for task in done]
+                error = next((e for e in errors if e is not None), None)
+                if error is not None:
+                    raise error
+                for result in sorted(task.result() for task in done):
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    #
+    # Message Formatting
+    #
+    def _format_message(self, message: RequestMessage) -> Any:
+        """Convert a single message into the vendor's wire format"""
         raise NotImplementedError
 
+    def _format_message_cached(self, message: RequestMessage) -> Any:
+        """
+        `_format_message` memoized per message object
+
+        Chat histories resend the same message objects every turn, so only new
+        messages are formatted. An entry is reused while the message is alive and
+        its role, content and image items are unchanged. The returned value is
+        shared between calls and must not be mutated.
+
+        Text-only messages are cheaper to format than to look up, only messages
+        with images (base64 payloads) are memoized.
+        """
+        if not message.b64_images:
+            return self._format_message(message)
+
+        fingerprint = (
+            message.role,
+            message.content,
+            tuple(message.b64_images),
+            message.cache_prompt,
+        )
+        entry = self._message_format_cache.get(id(message))
+        if entry is not None:
+            message_ref, cached_fingerprint, formatted = entry
+            if message_ref() is message and cached_fingerprint == fingerprint:
+                return formatted
+
+        formatted = self._format_message(message)
+
+        # Drop the entry as soon as the message is garbage collected, formatted
+        # messages can hold large image data URLs
+        cache, key = self._message_format_cache, id(message)
+        message_ref = weakref.ref(message, lambda _: cache.pop(key))
+        cache.put(key, (message_ref, fingerprint, formatted))
+        return formatted
+
+    def _format_messages(self, messages: list[RequestMessage] | Conversation) -> list:
+        """
+        Format the message history, returns a new list the caller may modify
+
+        A `Conversation` keeps the formatted prefix between calls, so only
+        messages appended since the last request are formatted.
+        """
+        if isinstance(messages, Conversation):
+            return messages.formatted(type(self).__name__, self._format_message_cached)
+        return [self._format_message_cached(message) for message in messages]
+
     def _build_payload(
         self, messages: list[RequestMessage], system_prompt: RequestMessage | None
     ) -> dict:
@@ -24,6 +483,15 @@ class BaseLLMClient:
     def _make_api_request(self, payload: dict) -> dict:
         raise NotImplementedError
 
+    async def _async_make_api_request(self, payload: dict):
+        raise NotImplementedError
+
+    def _stream_response_generator(self, response) -> Iterator:
+        raise NotImplementedError
+
+    def _async_stream_response_generator(self, response) -> AsyncIterator:
+        raise NotImplementedError
+
     def _process_response(self, response) -> str:
         raise NotImplementedError
 
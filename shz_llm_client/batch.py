@@ -0,0 +1,285 @@
+"""
+Provider-native offline batch jobs
+
+Batch APIs trade latency (results within hours) for lower price and much higher
+throughput than per-request calls. A job turns `BatchRequest`s into the
+provider's JSONL format with the client's own `_build_payload`, submits it, polls
+until the job finishes and streams the results back as `BatchResult`s keyed by
+`custom_id`.
+
+    job = OpenAIBatchJob(openai_client)
+    for result in job.run(requests):
+        print(result.custom_id, result.content)
+"""
+
+import json
+import logging
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING
+
+from .schemas import BatchRequest, BatchResult
+
+if TYPE_CHECKING:
+    from .anthropic_bedrock_client import AnthropicBedrockClient
+    from .openai_client import OpenAIClient
+
+logger = logging.getLogger(__name__)
+
+
+class BaseBatchJob:
+    TERMINAL_STATUSES: frozenset[str] = frozenset()
+
+    def __init__(self, client, poll_interval: float = 30.0):
+        self.client = client
+        self.poll_interval = poll_interval
+
+    def _build_request_payload(self, request: BatchRequest) -> dict:
+        # Batch endpoints don't stream, drop the streaming options of the client
+        payload = self.client._build_payload(
+            list(request.messages), request.system_prompt
+        )
+        payload.pop("stream", None)
+        payload.pop("stream_options", None)
+        return payload
+
+    def _build_record(self, request: BatchRequest) -> dict:
+        raise NotImplementedError
+
+    def build_jsonl(self, requests: Iterable[BatchRequest]) -> str:
+        lines = []
+        seen_ids = set()
+        for request in requests:
+            if request.custom_id in seen_ids:
+                raise ValueError(f"Duplicated custom_id: {request.custom_id}")
+            seen_ids.add(request.custom_id)
+            lines.append(json.dumps(self._build_record(request)))
+        return "\n".join(lines) + "\n"
+
+    def submit(self, requests: Iterable[BatchRequest]) -> str:
+        """Upload the requests and create the batch job, returns the job id"""
+        raise NotImplementedError
+
+    def status(self, job_id: str) -> str:
+        raise NotImplementedError
+
+    def wait(self, job_id: str, timeout: float | None = None) -> str:
+        """Poll the job until it reaches a terminal status and return that status"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if status in self.TERMINAL_STATUSES:
+                return status
+
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Batch job {job_id} is still {status}")
+
+            logger.debug(f"Batch job {job_id} is {status}")
+            time.sleep(self.poll_interval)
+
+    def iter_results(self, job_id: str) -> Iterator[BatchResult]:
+        raise NotImplementedError
+
+    def run(
+        self, requests: Iterable[BatchRequest], timeout: float | None = None
+    ) -> Iterator[BatchResult]:
+        job_id = self.submit(requests)
+        status = self.wait(job_id, timeout=timeout)
+        logger.info(f"Batch job {job_id} finished with status {status}")
+        yield from self.iter_results(job_id)
+
+
+class OpenAIBatchJob(BaseBatchJob):
+    """
+    OpenAI Batch API job for `/v1/chat/completions`
+
+    Works for any OpenAI compatible endpoint the client's SDK points at.
+    """
+
+    ENDPOINT = "/v1/chat/completions"
+    TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+    def __init__(
+        self,
+        client: "OpenAIClient",
+        poll_interval: float = 30.0,
+        completion_window: str = "24h",
+    ):
+        super().__init__(client, poll_interval)
+        self.completion_window = completion_window
+
+    def _build_record(self, request: BatchRequest) -> dict:
+        body = self._build_request_payload(request)
+        if self.client._extra_body is not None:
+            # The SDK merges `extra_body` into the request, so does the batch
+            body.update(self.client._extra_body)
+        return {
+            "custom_id": request.custom_id,
+            "method": "POST",
+            "url": self.ENDPOINT,
+            "body": body,
+        }
+
+    def submit(self, requests: Iterable[BatchRequest]) -> str:
+        sdk = self.client.client
+        batch_file = sdk.files.create(
+            file=("batch.jsonl", self.build_jsonl(requests).encode()),
+            purpose="batch",
+        )
+        batch = sdk.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=self.ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        return self.client.client.batches.retrieve(job_id).status
+
+    def _iter_file_lines(self, file_id: str) -> Iterator[dict]:
+        with self.client.client.files.with_streaming_response.content(
+            file_id
+        ) as response:
+            for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_results(self, job_id: str) -> Iterator[BatchResult]:
+        from openai.types.chat import ChatCompletion
+
+        batch = self.client.client.batches.retrieve(job_id)
+
+        if batch.output_file_id:
+            for record in self._iter_file_lines(batch.output_file_id):
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or response.get("body", {}).get("error")
+                    yield BatchResult(custom_id=record["custom_id"], error=str(error))
+                    continue
+
+                completion = ChatCompletion.model_validate(response["body"])
+                yield BatchResult(
+                    custom_id=record["custom_id"],
+                    content=self.client._process_response(completion) or "",
+                )
+
+        if batch.error_file_id:
+            for record in self._iter_file_lines(batch.error_file_id):
+                error = record.get("error") or record.get("response", {}).get("body")
+                yield BatchResult(custom_id=record["custom_id"], error=str(error))
+
+
+class BedrockBatchJob(BaseBatchJob):
+    """
+    Bedrock batch inference (model invocation job) for Anthropic models
+
+    Records are uploaded to `input_s3_uri` and the job writes its output under
+    `output_s3_uri`; `role_arn` must grant Bedrock access to both locations.
+    """
+
+    TERMINAL_STATUSES = frozenset(
+        {"Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"}
+    )
+
+    def __init__(
+        self,
+        client: "AnthropicBedrockClient",
+        role_arn: str,
+        input_s3_uri: str,
+        output_s3_uri: str,
+        poll_interval: float = 60.0,
+        job_name_prefix: str = "shz-llm-batch",
+        bedrock_client=None,
+        s3_client=None,
+    ):
+        super().__init__(client, poll_interval)
+        self.role_arn = role_arn
+        self.input_s3_uri = input_s3_uri.rstrip("/")
+        self.output_s3_uri = output_s3_uri.rstrip("/")
+        self.job_name_prefix = job_name_prefix
+
+        if bedrock_client is None or s3_client is None:
+            import boto3
+
+            bedrock_client = bedrock_client or boto3.client(
+                "bedrock", region_name=client._aws_region
+            )
+            s3_client = s3_client or boto3.client("s3", region_name=client._aws_region)
+
+        self.bedrock_client = bedrock_client
+        self.s3_client = s3_client
+
+        # job arn -> name of the uploaded input file
+        self._input_files: dict[str, str] = {}
+
+    @staticmethod
+    def _split_s3_uri(s3_uri: str) -> tuple[str, str]:
+        if not s3_uri.startswith("s3://"):
+            raise ValueError(f"Not an S3 URI: {s3_uri}")
+        bucket, _, prefix = s3_uri[len("s3://") :].partition("/")
+        return bucket, prefix
+
+    def _build_record(self, request: BatchRequest) -> dict:
+        return {
+            "recordId": request.custom_id,
+            "modelInput": self._build_request_payload(request),
+        }
+
+    def submit(self, requests: Iterable[BatchRequest]) -> str:
+        job_name = f"{self.job_name_prefix}-{uuid.uuid4().hex[:12]}"
+        input_file = f"{job_name}.jsonl"
+        input_uri = f"{self.input_s3_uri}/{input_file}"
+
+        bucket, key = self._split_s3_uri(input_uri)
+        self.s3_client.put_object(
+            Bucket=bucket, Key=key, Body=self.build_jsonl(requests).encode()
+        )
+
+        response = self.bedrock_client.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=self.client.model_id,
+            inputDataConfig={
+                "s3InputDataConfig": {"s3Uri": input_uri, "s3InputFormat": "JSONL"}
+            },
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": self.output_s3_uri}},
+        )
+        job_arn = response["jobArn"]
+        self._input_files[job_arn] = input_file
+        return job_arn
+
+    def status(self, job_id: str) -> str:
+        return self.bedrock_client.get_model_invocation_job(jobIdentifier=job_id)[
+            "status"
+        ]
+
+    def iter_results(self, job_id: str) -> Iterator[BatchResult]:
+        if job_id in self._input_files:
+            input_file = self._input_files[job_id]
+        else:
+            job = self.bedrock_client.get_model_invocation_job(jobIdentifier=job_id)
+            input_uri = job["inputDataConfig"]["s3InputDataConfig"]["s3Uri"]
+            input_file = input_uri.rsplit("/", 1)[-1]
+
+        # Bedrock writes `<output uri>/<job id>/<input file>.out`
+        job_suffix = job_id.rsplit("/", 1)[-1]
+        bucket, key = self._split_s3_uri(
+            f"{self.output_s3_uri}/{job_suffix}/{input_file}.out"
+        )
+        body = self.s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+
+        for line in body.iter_lines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "modelOutput" not in record:
+                yield BatchResult(
+                    custom_id=record["recordId"], error=str(record.get("error"))
+                )
+                continue
+
+            yield BatchResult(
+                custom_id=record["recordId"],
+                content=self.client._process_response_body(record["modelOutput"]),
+            )
@@ -1,19 +1,165 @@
-from .anthropic_client import AnthropicClient
-from .google_client import GoogleClient
-from .openai_client import OpenAIClient
-from .perplexity_client import PerplexityClient
+"""
+Client factory with a registry of reusable clients
+
+`create_client` builds a new client. `get_client` returns the registered client
+of (vendor, model, API key, options), building it on the first call, so request
+handlers can call it per request without paying for SDK clients, connection
+pools or `genai.configure` every time. Registered clients are shared: set
+per-request state (observers, temperature, ...) on clients from
+`create_client` instead.
+
+Past `maxsize` registered clients, the least recently used one is evicted and
+closed (`aclose`, e.g. the aioboto3 pool of a Bedrock client) on the running
+event loop, or on the next `ashutdown` when evicted outside of one. Keep the
+registry larger than the number of clients in concurrent use.
+
+    client = LLMClientFactory.get_client("openai", "gpt-4o-mini", api_key)
+    ...
+    await LLMClientFactory.ashutdown()
+"""
+
+import asyncio
+import importlib
+import sys
+import threading
+from collections.abc import Hashable
+from typing import Any
+
+from .base_client import BaseLLMClient
+from .lru_cache import CacheStats, LRUCache
+
+# Vendor name -> client class, resolved lazily so only the used SDK is imported
+_VENDOR_CLIENTS = {
+    "openai": "OpenAIClient",
+    "google": "GoogleClient",
+    "anthropic": "AnthropicBedrockClient",
+    "bedrock": "AnthropicBedrockClient",
+    "perplexity": "PerplexityClient",
+}
+
+# Clients without an API key, authenticated by the AWS credential chain
+_KEYLESS_CLIENTS = {"AnthropicBedrockClient"}
+
+
+def _client_class(vendor_name: str) -> type[BaseLLMClient]:
+    try:
+        class_name = _VENDOR_CLIENTS[vendor_name.lower()]
+    except KeyError:
+        raise ValueError(f"Unsupported LLM Vendor: {vendor_name}")
+
+    # The package raises an ImportError naming the extra to install
+    package = importlib.import_module(__package__)
+    return getattr(package, class_name)
+
+
+# Evicted clients waiting for `ashutdown`, evicted outside of an event loop
+_unclosed_clients: list[BaseLLMClient] = []
+# Keeps the `aclose` tasks of evicted clients alive until they finish
+_closing_tasks: set[asyncio.Task] = set()
+
+
+def _close_evicted(key: Hashable, client: BaseLLMClient):
+    aclose = getattr(client, "aclose", None)
+    if aclose is None:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _unclosed_clients.append(client)
+        return
+
+    task = loop.create_task(aclose())
+    _closing_tasks.add(task)
+    task.add_done_callback(_closing_tasks.discard)
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
 
 
 class LLMClientFactory:
+    # Registered clients, the least recently used ones are closed past `maxsize`
+    _registry = LRUCache(maxsize=256, on_evict=_close_evicted)
+    # Serializes registrations, so concurrent first calls get the same client
+    _registry_lock = threading.Lock()
+
     @staticmethod
-    def create_client(vendor_name: str, model_id: str, api_key: str, **kwargs):
-        if vendor_name.lower() == "openai":
-            return OpenAIClient(api_key=api_key, model_id=model_id, **kwargs)
-        elif vendor_name.lower() == "google":
-            return GoogleClient(api_key=api_key, model_id=model_id, **kwargs)
-        elif vendor_name.lower() == "anthropic":
-            return AnthropicClient(model_id=model_id, **kwargs)
-        elif vendor_name.lower() == "perplexity":
-            return PerplexityClient(api_key=api_key, model_id=model_id, **kwargs)
-        else:
-            raise ValueError(f"Unsupported LLM Vendor: {vendor_name}")
+    def create_client(
+        vendor_name: str, model_id: str, api_key: str | None = None, **kwargs
+    ) -> BaseLLMClient:
+        """Build a new client of `vendor_name`"""
+        client_class = _client_class(vendor_name)
+        if client_class.__name__ in _KEYLESS_CLIENTS:
+            return client_class(model_id=model_id, **kwargs)
+        return client_class(api_key=api_key, model_id=model_id, **kwargs)
+
+    @staticmethod
+    def _registry_key(
+        vendor_name: str, model_id: str, api_key: str | None, kwargs: dict
+    ) -> Hashable:
+        client_class = _client_class(vendor_name)
+        return (client_class.__name__, model_id, api_key, _freeze(kwargs))
+
+    @classmethod
+    def get_client(
+        cls, vendor_name: str, model_id: str, api_key: str | None = None, **kwargs
+    ) -> BaseLLMClient:
+        """Return the registered client of these arguments, building it once"""
+        key = cls._registry_key(vendor_name, model_id, api_key, kwargs)
+        client = cls._registry.get(key)
+        if client is not None:
+            return client
+
+        with cls._registry_lock:
+            client = cls._registry.get(key)
+            if client is None:
+                client = cls.create_client(vendor_name, model_id, api_key, **kwargs)
+                cls._registry.put(key, client)
+        return client
+
+    @classmethod
+    def evict(
+        cls, vendor_name: str, model_id: str, api_key: str | None = None, **kwargs
+    ) -> BaseLLMClient | None:
+        """Unregister a client, e.g. after its API key was rotated, and return it"""
+        key = cls._registry_key(vendor_name, model_id, api_key, kwargs)
+        return cls._registry.pop(key)
+
+    @classmethod
+    def stats(cls) -> CacheStats:
+        return cls._registry.stats
+
+    @classmethod
+    def shutdown(cls):
+        """Unregister every client and close the shared sync connection pools"""
+        cls._registry.clear()
+        _unclosed_clients.clear()
+
+        # Only loaded when an OpenAI compatible client was used
+        http_pool = sys.modules.get(f"{__package__}.http_pool")
+        if http_pool is not None:
+            http_pool.close_openai_clients()
+
+    @classmethod
+    async def ashutdown(cls):
+        """`shutdown`, also closing the async clients of the running event loop"""
+        for client in [*cls._registry.values(), *_unclosed_clients]:
+            aclose = getattr(client, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        loop = asyncio.get_running_loop()
+        closing = [task for task in _closing_tasks if task.get_loop() is loop]
+        if closing:
+            await asyncio.gather(*closing, return_exceptions=True)
+
+        http_pool = sys.modules.get(f"{__package__}.http_pool")
+        if http_pool is not None:
+            await http_pool.aclose_openai_clients()
+        cls.shutdown()
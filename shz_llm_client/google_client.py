@@ -1,15 +1,39 @@
+import asyncio
 import base64
+import copy
+import hashlib
 import logging
-from io import BytesIO
+import threading
+import weakref
+from itertools import chain
 
-import PIL.Image
 from google import generativeai as genai
+from google.ai import generativelanguage as glm
+from google.api_core import exceptions as google_exceptions
 
 from .base_client import BaseLLMClient
-from .schemas import RequestMessage
+from .lru_cache import CacheStats, LRUCache
+from .schemas import (
+    Base64ImageItem,
+    Conversation,
+    LLMResponse,
+    RequestMessage,
+    StreamDelta,
+    StreamStop,
+    stream_stop,
+)
 
 logger = logging.getLogger(__name__)
 
+# Transient errors retried by `retry_policy`
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
 
 class GoogleClient(BaseLLMClient):
     """
@@ -22,55 +46,174 @@ class GoogleClient(BaseLLMClient):
     While `start_chat` maintains the chat history itself, it is best to reuse it
     through out the whole chat session, instead of creating a new session for each message request.
     This client temporarily uses `generate_content` API, to perform the request like the traditional text completion API.
+
+    Gemini binds the system instruction to the model object, so models built for a
+    system prompt are kept in an LRU cache keyed by (model_id, system prompt hash)
+    and reused by later requests with the same prompt.
+
+    Images are sent as raw inline blobs rather than PIL images, which skips
+    decoding and re-encoding them. Decoded image bytes are shared by all
+    instances in a memory bounded LRU cache, keyed by `image_id` or content.
+
+    Each instance talks to Gemini through its own service clients, built from
+    its `api_key` (Application Default Credentials without one), instead of
+    the process wide `genai.configure` state. Clients of different API keys can
+    serve concurrently in one process. Service clients are created on first
+    use, the async one per event loop.
     """
 
+    # (image_id | str hash, length of the base64 string) -> (b64_string, blob)
+    _image_blob_cache = LRUCache(
+        maxsize=512,
+        max_weight=128 * 1024 * 1024,
+        weigher=lambda entry: len(entry[0]) + len(entry[1]["data"]),
+    )
+
     def __init__(
-        self, api_key, model_id="gemini-1.5-flash", stream=False, temperature=0.2
+        self,
+        api_key,
+        model_id="gemini-1.5-flash",
+        stream=False,
+        temperature=0.2,
+        model_cache_size=32,
+        model_cache_ttl=None,
+        transport=None,
     ):
         super().__init__(api_key, model_id, stream, temperature)
-        genai.configure(api_key=api_key)
         self._model_id = model_id
+
+        self._transport = transport
+        # Created on first use, see `_service_client`
+        self._sync_service_client: glm.GenerativeServiceClient | None = None
+        self._service_client_lock = threading.Lock()
+        # Event loop -> async service client
+        self._async_service_clients = weakref.WeakKeyDictionary()
+
         self._client = genai.GenerativeModel(model_name=model_id)
+        self._model_cache = LRUCache(maxsize=model_cache_size, ttl=model_cache_ttl)
+
+    #
+    # Service Clients
+    #
+    def _service_client_kwargs(self) -> dict:
+        if not self.api_key:
+            return {}
+        return {"client_options": {"api_key": self.api_key}}
+
+    @property
+    def _service_client(self) -> glm.GenerativeServiceClient:
+        if self._sync_service_client is None:
+            with self._service_client_lock:
+                if self._sync_service_client is None:
+                    client_kwargs = self._service_client_kwargs()
+                    if self._transport:
+                        client_kwargs["transport"] = self._transport
+                    self._sync_service_client = glm.GenerativeServiceClient(
+                        **client_kwargs
+                    )
+        return self._sync_service_client
+
+    def _async_service_client(self) -> glm.GenerativeServiceAsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_service_clients.get(loop)
+        if client is None:
+            client = glm.GenerativeServiceAsyncClient(**self._service_client_kwargs())
+            self._async_service_clients[loop] = client
+        return client
+
+    @staticmethod
+    def _bind_model(
+        model: genai.GenerativeModel, client=None, async_client=None
+    ) -> genai.GenerativeModel:
+        """
+        Copy of the cached `model` sending its requests with the given service
+        clients. Cached models are shared by concurrent requests, possibly of
+        different event loops, so they are never bound themselves.
+        """
+        bound_model = copy.copy(model)
+        # Without a client, `GenerativeModel` falls back to the global one
+        bound_model._client = client
+        bound_model._async_client = async_client
+        return bound_model
 
     def _get_client_with_sys_prompt(self, system_instruction: str):
-        return genai.GenerativeModel(
-            model_name=self._model_id, system_instruction=system_instruction
+        instruction_hash = hashlib.sha256(system_instruction.encode()).hexdigest()
+        model_id = self._model_id
+
+        return self._model_cache.get_or_create(
+            (model_id, instruction_hash),
+            lambda: genai.GenerativeModel(
+                model_name=model_id, system_instruction=system_instruction
+            ),
         )
 
+    @property
+    def model_cache_stats(self) -> CacheStats:
+        return self._model_cache.stats
+
+    @staticmethod
+    def _format_text_message(message: RequestMessage) -> dict:
+        role = "model" if message.role == "assistant" else message.role
+        return {"role": role, "parts": message.content}
+
+    @classmethod
+    def _image_blob(cls, image_item: Base64ImageItem) -> dict:
+        """Return the image as a Gemini inline blob, decoding it at most once"""
+        b64_string = image_item.b64_string
+        # `hash` of a str is computed once and cached on the object
+        key = (image_item.image_id or hash(b64_string), len(b64_string))
+
+        entry = cls._image_blob_cache.get(key)
+        if entry is not None:
+            cached_b64_string, blob = entry
+            if cached_b64_string is b64_string or cached_b64_string == b64_string:
+                return blob
+
+        blob = {
+            "mime_type": f"image/{image_item.image_type.value}",
+            "data": base64.b64decode(b64_string),
+        }
+        cls._image_blob_cache.put(key, (b64_string, blob))
+        return blob
+
+    def _format_message(self, message: RequestMessage) -> list:
+        """Format a message as flat content parts, used once the history has images"""
+        role = "model" if message.role == "assistant" else message.role
+        parts = [f"{role}: {message.content}"]
+        for image_item in message.b64_images:
+            parts.append(self._image_blob(image_item))
+        return parts
+
+    def _format_messages(self, messages: list[RequestMessage] | Conversation) -> list:
+        """
+        Gemini takes role/parts dicts for text-only histories, while histories with
+        images are sent as a flat list of "role: content" strings and images
+        """
+        has_images = any(message.b64_images for message in messages)
+
+        if not has_images:
+            if isinstance(messages, Conversation):
+                return messages.formatted(
+                    (type(self).__name__, "text"), self._format_text_message
+                )
+            return [self._format_text_message(message) for message in messages]
+
+        if isinstance(messages, Conversation):
+            formatted_messages = messages.formatted(
+                (type(self).__name__, "parts"), self._format_message_cached
+            )
+        else:
+            formatted_messages = [
+                self._format_message_cached(message) for message in messages
+            ]
+        return list(chain.from_iterable(formatted_messages))
+
     def _build_payload(
-        self, messages: list[RequestMessage], system_prompt: RequestMessage | None
+        self,
+        messages: list[RequestMessage] | Conversation,
+        system_prompt: RequestMessage | None,
     ):
-        text_only_messages = []
-        image_contain_messages = []
-        for message in messages:
-            if message.b64_images:
-                image_contain_messages.append(message)
-            else:
-                text_only_messages.append(message)
-
-        formatted_messages = []
-        if not image_contain_messages:
-            for message in messages:
-                role = message.role
-                if role == "assistant":
-                    role = "model"
-                content = message.content
-                tmp_prompt = {"role": role, "parts": content}
-                formatted_messages.append(tmp_prompt)
-        else:
-            for message in messages:
-                role = message.role
-                if role == "assistant":
-                    role = "model"
-                if message.b64_images:
-                    formatted_messages.append(f"{role}: {message.content}")
-                    for image_item in message.b64_images:
-                        b64_image_str = image_item.b64_string
-                        img_bytes = base64.b64decode(b64_image_str)
-                        image = PIL.Image.open(BytesIO(img_bytes))
-                        formatted_messages.append(image)
-                else:
-                    formatted_messages.append(f"{role}: {message.content}")
+        formatted_messages = self._format_messages(messages)
 
         generation_config = {
             "temperature": self.temperature,
@@ -85,62 +228,56 @@ class GoogleClient(BaseLLMClient):
         if self.stream:
             payload["stream"] = True
 
+        # Gemini needs to specific system_prompt at client level,
+        # `_make_api_request` picks the model from it
+        if system_prompt and system_prompt.content:
+            payload["system_instruction"] = system_prompt.content
+
         return payload
 
-    # Async Method
-    async def async_send(
-        self, messages: list[RequestMessage], system_prompt: RequestMessage
-    ):
-        payload = self._build_payload(messages, system_prompt)
+    def _split_payload(self, payload: dict):
+        """Return the model for the payload's system instruction and the request kwargs"""
+        request_kwargs = dict(payload)
+        system_instruction = request_kwargs.pop("system_instruction", None)
 
-        # Gemini needs to specific system_prompt at client level
-        if system_prompt.content:
-            client = self._get_client_with_sys_prompt(system_prompt.content)
+        if system_instruction:
+            client = self._get_client_with_sys_prompt(system_instruction)
         else:
             client = self._client
+        return client, request_kwargs
 
-        response = await client.generate_content_async(**payload)
+    # Async Method
+    async def _async_make_api_request(self, payload: dict):
+        model, request_kwargs = self._split_payload(payload)
+        model = self._bind_model(model, async_client=self._async_service_client())
+        return await model.generate_content_async(**request_kwargs)
 
-        if self.stream:
-            async for chunk in response:
-                yield self._process_stream_response(chunk)
-
-            # genai-0.7.2 doesn't have information of whether the response is stopped or not
-            # We manually add the stop message here for token count
-            yield {
-                "delta": "",
-                "input_tokens": chunk.usage_metadata.prompt_token_count,
-                "output_tokens": chunk.usage_metadata.candidates_token_count,
-                "total_tokens": chunk.usage_metadata.total_token_count,
-                "type": "stop",
-            }
-        else:
-            yield self._process_response(response)
+    async def _async_stream_response_generator(self, response):
+        async for chunk in response:
+            yield self._process_stream_response(chunk)
+
+        # genai-0.7.2 doesn't have information of whether the response is stopped or not
+        # We manually add the stop message here for token count
+        yield self._stop_event(chunk)
 
     # Sync Method
     def _stream_response_generator(self, response):
         for chunk in response:
-            yield self._process_response(chunk)
+            yield self._process_stream_response(chunk)
+        yield self._stop_event(chunk)
 
-    def send(self, messages: list[dict], system_prompt: dict):
-        payload = self._build_payload(messages, system_prompt)
-
-        if system_prompt.content:
-            client = self._get_client_with_sys_prompt(system_prompt.content)
-        else:
-            client = self._client
+    def _make_api_request(self, payload: dict):
+        model, request_kwargs = self._split_payload(payload)
+        model = self._bind_model(model, client=self._service_client)
+        return model.generate_content(**request_kwargs)
 
-        response = client.generate_content(**payload)
-
-        if self.stream:
-            return self._stream_response_generator(response)
-        else:
-            return self._process_response(response)
+    def _is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, RETRYABLE_ERRORS)
 
     #
     # Process Response
     #
-    def _process_response(self, response) -> str:
+    def _process_response(self, response) -> LLMResponse:
         candidate = response.candidates[0]
         try:
             text = candidate.content.parts[0].text
@@ -159,9 +296,33 @@ class GoogleClient(BaseLLMClient):
             logger.warning(candidate)
             text = ""
 
-        return text
+        usage = response.usage_metadata
+        return LLMResponse(
+            text,
+            usage.prompt_token_count,
+            usage.candidates_token_count,
+            usage.total_token_count,
+            finish_reason=self._finish_reason(candidate),
+        )
+
+    @staticmethod
+    def _finish_reason(candidate) -> str | None:
+        finish_reason = getattr(candidate, "finish_reason", None)
+        if not finish_reason:
+            return None
+        # A `FinishReason` enum, e.g. STOP or MAX_TOKENS
+        return getattr(finish_reason, "name", str(finish_reason))
+
+    def _stop_event(self, last_chunk) -> StreamStop:
+        usage = last_chunk.usage_metadata
+        return stream_stop(
+            input_tokens=usage.prompt_token_count,
+            output_tokens=usage.candidates_token_count,
+            total_tokens=usage.total_token_count,
+            finish_reason=self._finish_reason(last_chunk.candidates[0]),
+        )
 
-    def _process_stream_response(self, chunk) -> dict:
+    def _process_stream_response(self, chunk) -> StreamDelta:
         candidate = chunk.candidates[0]
         try:
             text = candidate.content.parts[0].text
@@ -179,10 +340,7 @@ class GoogleClient(BaseLLMClient):
             )
             logger.warning(candidate)
             text = ""
-        return {
-            "delta": text,
-            "type": "delta",
-        }
+        return {"delta": text, "type": "delta"}
 
 
 class GoogleLegacyClient(BaseLLMClient):
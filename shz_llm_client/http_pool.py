@@ -0,0 +1,148 @@
+"""
+Shared connection pools of the OpenAI compatible clients
+
+SDK clients are kept in a process wide registry keyed by (api key, base URL,
+pool settings, SDK retries), so every `OpenAIClient` / `PerplexityClient` with the same key
+and endpoint shares one connection pool instead of opening its own. The sync and
+async SDK clients are created separately on first use.
+
+    pool = HTTPPoolConfig(max_connections=500, http2=True)
+    client = OpenAIClient(api_key, http_pool=pool)
+
+Async SDK clients hold connections bound to the event loop that opened them, so
+they are registered per event loop and dropped with it.
+"""
+
+import asyncio
+import sys
+import threading
+import weakref
+from dataclasses import dataclass
+
+import openai
+
+
+@dataclass(frozen=True)
+class HTTPPoolConfig:
+    """
+    Connection pool and timeout settings of an SDK client
+
+    `http2` needs the `h2` package (`pip install shz-llm-client[http2]`). Over
+    HTTP/2 concurrent streams are multiplexed on a few connections.
+    """
+
+    max_connections: int = 1000
+    max_keepalive_connections: int = 100
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    timeout: float = 600.0
+    connect_timeout: float = 5.0
+
+
+DEFAULT_HTTP_POOL = HTTPPoolConfig()
+
+_lock = threading.Lock()
+_sync_clients: dict[tuple, openai.OpenAI] = {}
+# Event loop -> key -> async SDK client, clients created outside of a loop
+# are kept apart
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_unbound_async_clients: dict[tuple, openai.AsyncOpenAI] = {}
+
+
+def _http_module():
+    """
+    The HTTP library the installed SDK is built on, httpx or its successor
+
+    Pools must be configured with the `Limits` / `Timeout` classes of the same
+    library as the SDK's `DefaultHttpxClient`.
+    """
+    for base in openai.DefaultHttpxClient.__mro__:
+        if base.__name__ == "Client":
+            return sys.modules[base.__module__.partition(".")[0]]
+    raise ImportError("Cannot find the HTTP library of the openai SDK")
+
+
+def _http_client_kwargs(pool: HTTPPoolConfig) -> dict:
+    http = _http_module()
+    return {
+        "limits": http.Limits(
+            max_connections=pool.max_connections,
+            max_keepalive_connections=pool.max_keepalive_connections,
+            keepalive_expiry=pool.keepalive_expiry,
+        ),
+        "timeout": http.Timeout(pool.timeout, connect=pool.connect_timeout),
+        "http2": pool.http2,
+    }
+
+
+def get_openai_client(
+    api_key: str,
+    base_url: str | None = None,
+    pool: HTTPPoolConfig = DEFAULT_HTTP_POOL,
+    max_retries: int = openai.DEFAULT_MAX_RETRIES,
+) -> openai.OpenAI:
+    """Return the shared sync SDK client of `api_key` and `base_url`"""
+    key = (api_key, base_url, pool, max_retries)
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=max_retries,
+                http_client=openai.DefaultHttpxClient(**_http_client_kwargs(pool)),
+            )
+            _sync_clients[key] = client
+        return client
+
+
+def get_async_openai_client(
+    api_key: str,
+    base_url: str | None = None,
+    pool: HTTPPoolConfig = DEFAULT_HTTP_POOL,
+    max_retries: int = openai.DEFAULT_MAX_RETRIES,
+) -> openai.AsyncOpenAI:
+    """Return the shared async SDK client of `api_key` and `base_url` for this loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    key = (api_key, base_url, pool, max_retries)
+    with _lock:
+        if loop is None:
+            clients = _unbound_async_clients
+        else:
+            clients = _async_clients.setdefault(loop, {})
+
+        client = clients.get(key)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=max_retries,
+                http_client=openai.DefaultAsyncHttpxClient(**_http_client_kwargs(pool)),
+            )
+            clients[key] = client
+        return client
+
+
+def close_openai_clients():
+    """Close the shared sync SDK clients and forget every shared client"""
+    with _lock:
+        sync_clients = list(_sync_clients.values())
+        _sync_clients.clear()
+        _async_clients.clear()
+        _unbound_async_clients.clear()
+
+    for client in sync_clients:
+        client.close()
+
+
+async def aclose_openai_clients():
+    """Close and forget the shared async SDK clients of the running event loop"""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+
+    for client in clients.values():
+        await client.close()
@@ -0,0 +1,108 @@
+"""
+Content-addressed caches for prepared images
+
+`ImageCache` stores resized and encoded images under a hash of the source bytes
+and the target size limits, in memory and optionally in a directory shared by
+several processes:
+
+    cache = ImageCache(directory="/tmp/shz-images")
+    image_item = load_image_item("product.jpg", 768, 2000, cache=cache)
+
+`image_data_url` builds the `data:` URLs of the OpenAI compatible clients.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from .lru_cache import LRUCache
+from .schemas import Base64ImageItem
+
+logger = logging.getLogger(__name__)
+
+
+def image_cache_key(
+    source: bytes, max_short_side: int | None, max_long_side: int | None
+) -> str:
+    digest = hashlib.sha256(source)
+    digest.update(f":{max_short_side}x{max_long_side}".encode())
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Prepared `Base64ImageItem`s keyed by `image_cache_key`
+
+    The in-memory LRU is bounded by entry count and total base64 size. With a
+    `directory`, entries are also written there as JSON files and read back on
+    a memory miss; the directory is never pruned.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        max_bytes: int = 256 * 1024 * 1024,
+        directory: str | None = None,
+    ):
+        self._memory = LRUCache(
+            maxsize=maxsize,
+            max_weight=max_bytes,
+            weigher=lambda image_item: len(image_item.b64_string),
+        )
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Base64ImageItem | None:
+        image_item = self._memory.get(key)
+        if image_item is not None or self.directory is None:
+            return image_item
+
+        try:
+            with open(self._path(key)) as f:
+                image_item = Base64ImageItem(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable image cache entry {key}: {e}")
+            return None
+
+        self._memory.put(key, image_item)
+        return image_item
+
+    def put(self, key: str, image_item: Base64ImageItem):
+        self._memory.put(key, image_item)
+        if self.directory is None:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so other processes never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {
+                        "b64_string": image_item.b64_string,
+                        "image_type": image_item.image_type.value,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @property
+    def stats(self):
+        return self._memory.stats
+
+
+def image_data_url(image_item: Base64ImageItem) -> str:
+    """Return the `data:` URL of the image"""
+    return f"data:image/{image_item.image_type.value};base64,{image_item.b64_string}"
@@ -0,0 +1,283 @@
+"""
+Request instrumentation
+
+Observers added to `client.observers` are notified as `send` / `async_send`
+progress. Each request carries one `RequestTrace` with its timestamps
+(`time.perf_counter`) and the token usage reported in the "stop" event:
+
+    class PrintLatency(ClientObserver):
+        def on_request_end(self, trace):
+            print(trace.model_id, trace.time_to_first_token, trace.tokens_per_second)
+
+    client.observers.append(PrintLatency())
+
+Clients without observers skip the instrumentation entirely. Exceptions raised
+by observers are logged and never fail the request.
+"""
+
+import logging
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class RequestTrace:
+    """
+    Timings of a single request, `*_at` values are `time.perf_counter` times
+
+    `response_at` is when the vendor SDK returned: for streams once the
+    connection is open and the response headers arrived, otherwise once the
+    whole body was received.
+    """
+
+    client: str
+    model_id: str
+    stream: bool
+    started_at: float = field(default_factory=time.perf_counter)
+    payload_built_at: float | None = None
+    response_at: float | None = None
+    first_token_at: float | None = None
+    last_chunk_at: float | None = None
+    finished_at: float | None = None
+    chunks: int = 0
+    cached: bool = False
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    total_tokens: int | None = None
+    error: BaseException | None = None
+
+    @staticmethod
+    def _elapsed(start: float | None, end: float | None) -> float | None:
+        if start is None or end is None:
+            return None
+        return end - start
+
+    @property
+    def payload_build_time(self) -> float | None:
+        return self._elapsed(self.started_at, self.payload_built_at)
+
+    @property
+    def connect_time(self) -> float | None:
+        return self._elapsed(self.payload_built_at, self.response_at)
+
+    @property
+    def time_to_first_token(self) -> float | None:
+        return self._elapsed(self.started_at, self.first_token_at)
+
+    @property
+    def generation_time(self) -> float | None:
+        """Time from the SDK response to the end, streaming or response parsing"""
+        return self._elapsed(self.response_at, self.finished_at)
+
+    @property
+    def duration(self) -> float | None:
+        return self._elapsed(self.started_at, self.finished_at)
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Output tokens per second after the first token, streams only"""
+        elapsed = self._elapsed(self.first_token_at, self.last_chunk_at)
+        if not self.output_tokens or not elapsed:
+            return None
+        return self.output_tokens / elapsed
+
+
+class ClientObserver:
+    """
+    Interface of request observers, override the hooks you need
+
+    Hooks run inline on the request path and should return quickly.
+    """
+
+    def on_request_start(self, trace: RequestTrace):
+        pass
+
+    def on_payload_built(self, trace: RequestTrace):
+        pass
+
+    def on_response(self, trace: RequestTrace):
+        pass
+
+    def on_first_token(self, trace: RequestTrace):
+        pass
+
+    def on_chunk(self, trace: RequestTrace, event: Any, interval: float):
+        """Every raw stream event, `interval` is the time since the previous one"""
+
+    def on_request_end(self, trace: RequestTrace):
+        pass
+
+
+class _NoopTracer:
+    """Tracer of clients without observers"""
+
+    def payload_built(self):
+        pass
+
+    def response(self):
+        pass
+
+    def cache_hit(self):
+        pass
+
+    def usage(self, response):
+        pass
+
+    def end(self, error: BaseException | None = None):
+        pass
+
+    def trace_stream(self, events: Iterable) -> Iterable:
+        return events
+
+    def async_trace_stream(self, events: AsyncIterable) -> AsyncIterable:
+        return events
+
+
+NOOP_TRACER = _NoopTracer()
+
+
+class RequestTracer:
+    """Updates a `RequestTrace` and notifies the observers, `end` is idempotent"""
+
+    def __init__(self, observers: Iterable[ClientObserver], trace: RequestTrace):
+        # Copied, so observers added during the request don't get partial events
+        self.observers = list(observers)
+        self.trace = trace
+        self._ended = False
+        self._notify("on_request_start")
+
+    def _notify(self, hook: str, *args):
+        for observer in self.observers:
+            try:
+                getattr(observer, hook)(self.trace, *args)
+            except Exception:
+                logger.exception(f"Observer {observer!r} failed in {hook}")
+
+    def payload_built(self):
+        self.trace.payload_built_at = time.perf_counter()
+        self._notify("on_payload_built")
+
+    def response(self):
+        self.trace.response_at = time.perf_counter()
+        self._notify("on_response")
+
+    def cache_hit(self):
+        self.trace.cached = True
+
+    def usage(self, response):
+        """Take the token counts of a non-streaming `LLMResponse`"""
+        self.trace.input_tokens = response.input_tokens
+        self.trace.output_tokens = response.output_tokens
+        self.trace.total_tokens = response.total_tokens
+
+    def chunk(self, event):
+        now = time.perf_counter()
+        trace = self.trace
+        interval = now - (trace.last_chunk_at or trace.response_at or now)
+        trace.last_chunk_at = now
+        trace.chunks += 1
+
+        if event["type"] == "stop":
+            trace.input_tokens = event.get("input_tokens")
+            trace.output_tokens = event.get("output_tokens")
+            trace.total_tokens = event.get("total_tokens")
+        if trace.first_token_at is None and event["delta"]:
+            trace.first_token_at = now
+            self._notify("on_first_token")
+        self._notify("on_chunk", event, interval)
+
+    def end(self, error: BaseException | None = None):
+        if self._ended:
+            return
+        self._ended = True
+        self.trace.finished_at = time.perf_counter()
+        self.trace.error = error
+        self._notify("on_request_end")
+
+    def trace_stream(self, events: Iterable) -> Iterator:
+        try:
+            for event in events:
+                self.chunk(event)
+                yield event
+        except GeneratorExit:
+            # Closed by the consumer before the end of the stream
+            raise
+        except BaseException as e:
+            self.end(error=e)
+            raise
+        finally:
+            self.end()
+
+    async def async_trace_stream(self, events: AsyncIterable) -> AsyncIterator:
+        try:
+            async for event in events:
+                self.chunk(event)
+                yield event
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            self.end(error=e)
+            raise
+        finally:
+            self.end()
+
+
+class OpenTelemetryObserver(ClientObserver):
+    """
+    Records every request as an OpenTelemetry span
+
+    Spans are named `chat {model_id}` and carry the GenAI semantic convention
+    attributes for the model and token usage, the timings of the trace and a
+    `first_token` event. Requires `opentelemetry-api`.
+    """
+
+    def __init__(self, tracer=None):
+        from opentelemetry import trace
+
+        self._tracer = tracer or trace.get_tracer("shz_llm_client")
+        # id(RequestTrace) -> span, until the request ends
+        self._spans: dict[int, Any] = {}
+
+    def on_request_start(self, trace: RequestTrace):
+        self._spans[id(trace)] = self._tracer.start_span(
+            f"chat {trace.model_id}",
+            attributes={
+                "gen_ai.operation.name": "chat",
+                "gen_ai.system": trace.client,
+                "gen_ai.request.model": trace.model_id,
+                "shz_llm_client.stream": trace.stream,
+            },
+        )
+
+    def on_first_token(self, trace: RequestTrace):
+        span = self._spans.get(id(trace))
+        if span is not None:
+            span.add_event("first_token")
+
+    def on_request_end(self, trace: RequestTrace):
+        from opentelemetry.trace import Status, StatusCode
+
+        span = self._spans.pop(id(trace), None)
+        if span is None:
+            return
+
+        attributes = {
+            "gen_ai.usage.input_tokens": trace.input_tokens,
+            "gen_ai.usage.output_tokens": trace.output_tokens,
+            "shz_llm_client.cached": trace.cached,
+            "shz_llm_client.chunks": trace.chunks,
+            "shz_llm_client.payload_build_time": trace.payload_build_time,
+            "shz_llm_client.connect_time": trace.connect_time,
+            "shz_llm_client.time_to_first_token": trace.time_to_first_token,
+            "shz_llm_client.tokens_per_second": trace.tokens_per_second,
+        }
+        span.set_attributes({k: v for k, v in attributes.items() if v is not None})
+
+        if trace.error is not None:
+            span.record_exception(trace.error)
+            span.set_status(Status(StatusCode.ERROR, str(trace.error)))
+        span.end()
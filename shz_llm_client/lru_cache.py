@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live
+
+    Entries are evicted least-recently-used first once `maxsize` is exceeded,
+    and expire `ttl` seconds after they were stored (never if `ttl` is None).
+
+    With a `weigher` (e.g. `len` for bytes values), entries are also evicted
+    while the total weight exceeds `max_weight`. A value heavier than
+    `max_weight` on its own is not stored.
+
+    `on_evict(key, value)` is called for every entry evicted by size, weight or
+    age (not for `pop` / `clear`), with the cache lock held: keep it short.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: float | None = None,
+        max_weight: int | None = None,
+        weigher: Callable[[Any], int] | None = None,
+        on_evict: Callable[[Hashable, Any], None] | None = None,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        if (max_weight is None) != (weigher is None):
+            raise ValueError("max_weight and weigher must be given together")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self._weigher = weigher
+        self._weight = 0
+        self._on_evict = on_evict
+
+        # key -> (expires_at, value)
+        self._entries: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        # Reentrant: weakref callbacks fired by the garbage collector may pop
+        # entries while this thread already holds the lock
+        self._lock = threading.RLock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _lookup(self, key: Hashable) -> Any:
+        """Return the live value for `key` or `_MISSING`, caller holds the lock"""
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return _MISSING
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._evict(key)
+            return _MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key: Hashable) -> Any:
+        _, value = self._entries.pop(key)
+        if self._weigher is not None:
+            self._weight -= self._weigher(value)
+        return value
+
+    def _evict(self, key: Hashable):
+        value = self._remove(key)
+        self._evictions += 1
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+
+    def _store(self, key: Hashable, value: Any):
+        if key in self._entries:
+            self._remove(key)
+
+        if self._weigher is not None:
+            weight = self._weigher(value)
+            if weight > self.max_weight:
+                return
+            self._weight += weight
+
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        self._entries[key] = (expires_at, value)
+
+        while len(self._entries) > self.maxsize or (
+            self.max_weight is not None and self._weight > self.max_weight
+        ):
+            self._evict(next(iter(self._entries)))
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self._misses += 1
+                return default
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for `key`, building it with `factory` on a miss
+
+        The factory runs outside the lock, so two threads missing on the same key
+        may both build a value; the last one stored wins.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self._hits += 1
+                return value
+            self._misses += 1
+
+        value = factory()
+
+        with self._lock:
+            self._store(key, value)
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+
+    def values(self) -> list[Any]:
+        """Snapshot of the live values, least recently used first"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                value
+                for expires_at, value in self._entries.values()
+                if expires_at is None or expires_at > now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    @property
+    def weight(self) -> int:
+        return self._weight
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._entries),
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key) is not _MISSING
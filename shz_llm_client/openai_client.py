@@ -4,150 +4,281 @@ import openai
 from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
 from .base_client import BaseLLMClient
-from .schemas import RequestMessage
+from .http_pool import (
+    DEFAULT_HTTP_POOL,
+    HTTPPoolConfig,
+    get_async_openai_client,
+    get_openai_client,
+)
+from .image_cache import image_data_url
+from .schemas import (
+    Conversation,
+    LLMResponse,
+    RequestMessage,
+    StreamDelta,
+    StreamStop,
+    stream_stop,
+)
 
 logger = logging.getLogger(__name__)
 
+# Transient errors retried by `retry_policy`, timeouts are connection errors
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
 
-class OpenAIClient(BaseLLMClient):
-    def __init__(
-        self, api_key, model_id="gpt-3.5-turbo", stream=False, temperature=0.2
-    ):
-        super().__init__(api_key, model_id, stream, temperature)
 
-        self.client = openai.OpenAI(
-            api_key=api_key,
-        )
+def create_completion(
+    client: BaseLLMClient, completions, payload: dict, extra_body: dict | None = None
+):
+    """
+    Create a chat completion, feeding the `x-ratelimit-*` response headers to
+    the client's rate limiter when it has one
 
-        self.async_client = openai.AsyncOpenAI(
-            api_key=api_key,
-        )
+    `extra_body` holds request fields the SDK has no argument for, it is kept
+    out of `payload` so payloads stay the plain request body.
+    """
+    if extra_body is not None:
+        payload = {**payload, "extra_body": extra_body}
+    if client.rate_limiter is None:
+        return completions.create(**payload)
 
-    def _build_payload(
-        self,
-        messages: list[RequestMessage],
-        system_prompt: RequestMessage | None = None,
-    ):
-        if system_prompt:
-            messages.insert(0, system_prompt)
+    try:
+        raw_response = completions.with_raw_response.create(**payload)
+    except openai.APIStatusError as e:
+        client.rate_limiter.update_from_headers(e.response.headers)
+        raise
+    client.rate_limiter.update_from_headers(raw_response.headers)
+    return raw_response.parse()
 
-        formatted_messages = []
 
-        for message in messages:
-            if message.b64_images:
-                formatted_message = {
-                    "role": message.role,
-                    "content": [],
-                }
+def cached_prompt_tokens(usage) -> int | None:
+    """Prompt tokens OpenAI served from its prompt cache"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None)
 
-                formatted_message["content"].append(
-                    {
-                        "type": "text",
-                        "text": message.content,
-                    }
-                )
-
-                b64_images = message.b64_images
-                for image_item in b64_images:
-                    image_payload = {}
-                    image_payload["type"] = "image_url"
-                    image_payload["image_url"] = {
-                        "url": f"data:image/{image_item.image_type.value};base64,{image_item.b64_string}"
-                    }
-                    formatted_message["content"].append(image_payload)
-                formatted_messages.append(formatted_message)
-            else:
-                formatted_messages.append(message.dict(exclude={"images"}))
 
-        payload = {
-            "model": self._model_id,
-            "messages": formatted_messages,
-            "temperature": self.temperature,
-        }
+async def async_create_completion(
+    client: BaseLLMClient, completions, payload: dict, extra_body: dict | None = None
+):
+    """Async version of `create_completion`"""
+    if extra_body is not None:
+        payload = {**payload, "extra_body": extra_body}
+    if client.rate_limiter is None:
+        return await completions.create(**payload)
 
-        if self.stream:
-            payload["stream"] = True
-            payload["stream_options"] = {"include_usage": True}
+    try:
+        raw_response = await completions.with_raw_response.create(**payload)
+    except openai.APIStatusError as e:
+        client.rate_limiter.update_from_headers(e.response.headers)
+        raise
+    client.rate_limiter.update_from_headers(raw_response.headers)
+    return raw_response.parse()
 
-        return payload
+
+class OpenAICompatibleMixin:
+    """
+    Parts shared by the clients of OpenAI compatible APIs
+
+    The SDK clients of `base_url` are created on first use and shared with the
+    other clients of the same API key and pool settings, see `http_pool`. When
+    a `retry_policy` is set, SDK clients that don't retry on their own are used.
+
+    Implements the request and response hooks of `BaseLLMClient`, APIs ending
+    their streams differently override `_process_stream_response`.
+    """
+
+    base_url: str | None = None
+    # Request body fields sent through the SDK's `extra_body`
+    _extra_body: dict | None = None
+
+    def _init_sdk_clients(self, http_pool: HTTPPoolConfig):
+        self._http_pool = http_pool
+        self._client: openai.OpenAI | None = None
+        self._async_client: openai.AsyncOpenAI | None = None
+
+    @property
+    def _sdk_max_retries(self) -> int:
+        # With a `retry_policy` the SDK must not retry underneath it
+        return 0 if self.retry_policy is not None else openai.DEFAULT_MAX_RETRIES
+
+    @property
+    def client(self) -> openai.OpenAI:
+        if self._client is not None:
+            return self._client
+        return get_openai_client(
+            self.api_key, self.base_url, self._http_pool, self._sdk_max_retries
+        )
+
+    @client.setter
+    def client(self, value: openai.OpenAI):
+        self._client = value
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        # Not kept on the instance, the shared client depends on the event loop
+        if self._async_client is not None:
+            return self._async_client
+        return get_async_openai_client(
+            self.api_key, self.base_url, self._http_pool, self._sdk_max_retries
+        )
+
+    @async_client.setter
+    def async_client(self, value: openai.AsyncOpenAI):
+        self._async_client = value
+
+    def _format_message(self, message: RequestMessage) -> dict:
+        if not message.b64_images:
+            return {"role": message.role, "content": message.content}
+
+        content = [{"type": "text", "text": message.content}]
+        for image_item in message.b64_images:
+            content.append(
+                {
+                    "type": "image_url",
+                    "image_url": {"url": image_data_url(image_item)},
+                }
+            )
+        return {"role": message.role, "content": content}
 
     #
     # Async Method
     #
     async def _async_make_api_request(self, payload: dict):
-        response = await self.async_client.chat.completions.create(**payload)
-        return response
-
-    async def async_send(
-        self, messages: list[RequestMessage], system_prompt: RequestMessage
-    ):
-        payload = self._build_payload(messages, system_prompt)
-        response = await self._async_make_api_request(payload)
+        return await async_create_completion(
+            self, self.async_client.chat.completions, payload, self._extra_body
+        )
 
-        if self.stream:
-            async for chunk in response:
-                yield self._process_stream_response(chunk)
-        else:
-            # Todo:
-            # Test none-stream mode code in async mode
-            yield self._process_response(response)
+    async def _async_stream_response_generator(self, response):
+        finish_reason = None
+        async for chunk in response:
+            finish_reason = self._finish_reason(chunk, finish_reason)
+            yield self._process_stream_response(chunk, finish_reason)
 
     #
     # Sync Method
     #
     def _stream_response_generator(self, response):
+        finish_reason = None
         for chunk in response:
-            yield self._process_stream_response(chunk)
+            finish_reason = self._finish_reason(chunk, finish_reason)
+            yield self._process_stream_response(chunk, finish_reason)
 
     def _make_api_request(self, payload: dict):
-        response = self.client.chat.completions.create(**payload)
-        return response
+        return create_completion(
+            self, self.client.chat.completions, payload, self._extra_body
+        )
 
-    def send(self, messages: list[RequestMessage], system_prompt: RequestMessage):
-        payload = self._build_payload(messages, system_prompt)
-        response = self._make_api_request(payload)
-
-        if self.stream:
-            return self._stream_response_generator(response)
-        else:
-            return self._process_response(response)
+    def _is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, RETRYABLE_ERRORS)
 
     #
     # Process Response
     #
-    def _process_response(self, response: ChatCompletion) -> str:
+    def _process_response(self, response: ChatCompletion) -> LLMResponse:
+        usage = response.usage
+        if usage is None:
+            tokens = (None, None, None)
+        else:
+            tokens = (usage.prompt_tokens, usage.completion_tokens, usage.total_tokens)
+        cache_read_tokens = cached_prompt_tokens(usage)
+
         if len(response.choices) == 0:
-            return ""
+            return LLMResponse("", *tokens, cache_read_tokens=cache_read_tokens)
 
+        choice = response.choices[0]
         try:
-            content = response.choices[0].message.content
+            content = choice.message.content or ""
         except AttributeError:
             logger.warning(f"Content not found content in response: {response}")
-            return ""
+            content = ""
+
+        return LLMResponse(
+            content,
+            *tokens,
+            finish_reason=choice.finish_reason,
+            cache_read_tokens=cache_read_tokens,
+        )
 
-        return content
+    @staticmethod
+    def _finish_reason(
+        chunk: ChatCompletionChunk, finish_reason: str | None
+    ) -> str | None:
+        # The finish reason comes before the usage chunk, which has no choices
+        if chunk.choices and chunk.choices[0].finish_reason:
+            return chunk.choices[0].finish_reason
+        return finish_reason
 
-    def _process_stream_response(self, chunk: ChatCompletionChunk) -> str | dict:
+    def _process_stream_response(
+        self, chunk: ChatCompletionChunk, finish_reason: str | None = None
+    ) -> StreamDelta | StreamStop:
         if chunk.usage:
-            return {
-                "delta": "",
-                "input_tokens": chunk.usage.prompt_tokens,
-                "output_tokens": chunk.usage.completion_tokens,
-                "total_tokens": chunk.usage.total_tokens,
-                "type": "stop",
-            }
+            return stream_stop(
+                input_tokens=chunk.usage.prompt_tokens,
+                output_tokens=chunk.usage.completion_tokens,
+                total_tokens=chunk.usage.total_tokens,
+                finish_reason=finish_reason,
+                cache_read_tokens=cached_prompt_tokens(chunk.usage),
+            )
         else:
             choice = chunk.choices[0]
             if choice.finish_reason not in ["stop", None]:
                 logger.warning(f"{chunk.id}: Finish Reason: {choice.finish_reason}")
 
-            if chunk.choices[0].delta.content is not None:
-                return {
-                    "delta": chunk.choices[0].delta.content,
-                    "type": "delta",
-                }
-            else:
-                return {
-                    "delta": "",
-                    "type": "delta",
-                }
+            return {"delta": choice.delta.content or "", "type": "delta"}
+
+
+class OpenAIClient(OpenAICompatibleMixin, BaseLLMClient):
+    """
+    Client for OpenAI
+
+    The sync and async SDK clients are created on first use and shared with the
+    other clients of the same API key and pool settings, see `http_pool`.
+
+    OpenAI caches long prompt prefixes automatically. The system prompt is
+    always sent first, so requests sharing it share the cached prefix;
+    `prompt_cache_key` routes requests with the same key to the same cache.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        model_id="gpt-3.5-turbo",
+        stream=False,
+        temperature=0.2,
+        http_pool: HTTPPoolConfig = DEFAULT_HTTP_POOL,
+        prompt_cache_key: str | None = None,
+    ):
+        super().__init__(api_key, model_id, stream, temperature)
+
+        self._init_sdk_clients(http_pool)
+        self._prompt_cache_key = prompt_cache_key
+        if prompt_cache_key is not None:
+            # Sent as an extra body field, older SDKs have no such argument
+            self._extra_body = {"prompt_cache_key": prompt_cache_key}
+
+    def _build_payload(
+        self,
+        messages: list[RequestMessage] | Conversation,
+        system_prompt: RequestMessage | None = None,
+    ):
+        formatted_messages = self._format_messages(messages)
+
+        # The caller's history is left untouched, the system prompt only
+        # goes into the payload
+        if system_prompt:
+            formatted_messages.insert(0, self._format_message_cached(system_prompt))
+
+        payload = {
+            "model": self._model_id,
+            "messages": formatted_messages,
+            "temperature": self.temperature,
+        }
+
+        if self.stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+
+        return payload
@@ -0,0 +1,198 @@
+import asyncio
+import re
+import time
+from collections.abc import Callable, Mapping
+from typing import Any
+
+
+class TokenBucket:
+    """
+    Async token bucket rate limiter
+
+    Tokens refill continuously at `rate` per second up to `capacity` (defaults to
+    `rate`, i.e. one second worth of burst). `acquire` waits until enough tokens
+    are available; waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self, tokens: float = 1.0):
+        if tokens > self.capacity:
+            raise ValueError(
+                f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}"
+            )
+
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def drain_to(self, tokens: float):
+        """Lower the available tokens to `tokens`, e.g. to what a provider reports"""
+        self._refill()
+        self._tokens = min(self._tokens, max(tokens, 0.0))
+
+    def set_rate(self, rate: float, capacity: float | None = None):
+        """Change the refill rate, keeping the tokens accumulated so far"""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = min(self._tokens, self.capacity)
+
+
+# Characters per token used to estimate the token cost of a request
+CHARS_PER_TOKEN = 4
+# Flat token estimate of an image, images are sent as base64 data and their
+# length says little about their token cost
+IMAGE_TOKENS = 765
+
+_RESET_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_RESET_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: str) -> float | None:
+    """Parse an `x-ratelimit-reset-*` duration such as `6m0s` or `20ms` into seconds"""
+    parts = _RESET_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _RESET_UNITS[unit] for amount, unit in parts)
+
+
+def _count_chars(value: Any) -> tuple[int, int]:
+    """Return (text characters, images) found in a formatted message value"""
+    if isinstance(value, str):
+        if value.startswith("data:image/"):
+            return 0, 1
+        return len(value), 0
+    if isinstance(value, Mapping):
+        if value.get("type") == "image":
+            return 0, 1
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        return 0, 0
+
+    chars = images = 0
+    for item in items:
+        item_chars, item_images = _count_chars(item)
+        chars += item_chars
+        images += item_images
+    return chars, images
+
+
+def estimate_payload_tokens(payload: dict) -> int:
+    """
+    Rough token cost of a built payload: prompt tokens plus the completion limit
+
+    Providers count `max_tokens` against the tokens-per-minute limit when the
+    request is admitted, so it is included when set.
+    """
+    chars, images = _count_chars([payload.get("messages"), payload.get("system")])
+    completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or 0
+    return chars // CHARS_PER_TOKEN + images * IMAGE_TOKENS + completion + 1
+
+
+class RateLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute limiter
+
+    Set as `client.rate_limiter`, it is shared by every `async_send` of the client
+    (or of several clients using the same key). Each request waits in line for one
+    request token and the estimated token cost of its payload instead of failing
+    with a 429.
+
+    Clients that expose the provider's `x-ratelimit-*` response headers feed them
+    to `update_from_headers`: the buckets are lowered to the remaining budget the
+    provider reports, paused until the reset when it is exhausted, and limits that
+    were not configured are learnt from `x-ratelimit-limit-*`.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        estimate_tokens: Callable[[dict], int] = estimate_payload_tokens,
+    ):
+        self.requests = self._bucket(requests_per_minute)
+        self.tokens = self._bucket(tokens_per_minute)
+        self.estimate_tokens = estimate_tokens
+        self._resume_at = 0.0
+
+    @staticmethod
+    def _bucket(per_minute: float | None) -> TokenBucket | None:
+        if per_minute is None:
+            return None
+        return TokenBucket(rate=per_minute / 60, capacity=per_minute)
+
+    async def acquire(self, payload: dict | None = None):
+        """Wait until the request of `payload` fits in both budgets"""
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.requests is not None:
+            await self.requests.acquire()
+        if self.tokens is not None and payload is not None:
+            # A request larger than the whole budget waits for a full bucket
+            cost = min(self.estimate_tokens(payload), self.tokens.capacity)
+            await self.tokens.acquire(cost)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Adjust the buckets to the `x-ratelimit-*` headers of a response"""
+        for name in ("requests", "tokens"):
+            limit = _float_header(headers, f"x-ratelimit-limit-{name}")
+            remaining = _float_header(headers, f"x-ratelimit-remaining-{name}")
+            reset = headers.get(f"x-ratelimit-reset-{name}")
+
+            bucket = getattr(self, name)
+            if limit is not None and limit > 0:
+                if bucket is None:
+                    bucket = TokenBucket(rate=limit / 60, capacity=limit)
+                    setattr(self, name, bucket)
+                elif limit < bucket.capacity:
+                    bucket.set_rate(limit / 60, capacity=limit)
+
+            if bucket is None or remaining is None:
+                continue
+            bucket.drain_to(remaining)
+
+            if remaining <= 0 and reset:
+                reset_after = parse_reset(reset)
+                if reset_after:
+                    self._resume_at = max(
+                        self._resume_at, time.monotonic() + reset_after
+                    )
+
+
+def _float_header(headers: Mapping[str, str], name: str) -> float | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
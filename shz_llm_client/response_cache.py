@@ -0,0 +1,180 @@
+"""
+Response cache for `send` / `async_send`
+
+Responses are keyed on a stable hash of the built payload (plus the client class,
+model and stream mode), so byte-identical requests are answered without calling
+the provider. Streaming responses are stored as the full list of stream events
+and replayed in the same order.
+
+    client.response_cache = InMemoryResponseCache(maxsize=1024, ttl=3600)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any
+
+from .lru_cache import LRUCache
+
+
+def _normalize(value: Any) -> Any:
+    """`json.dumps` fallback for payload values that aren't JSON serializable"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if hasattr(value, "tobytes"):
+        # e.g. PIL images
+        return {"sha256": hashlib.sha256(value.tobytes()).hexdigest()}
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return repr(value)
+
+
+def _event_to_dict(value: Any) -> Any:
+    """Stream events are stored as plain dicts, see `BaseLLMClient._replay_cached`"""
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def make_cache_key(namespace: str, payload: dict) -> str:
+    serialized = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), default=_normalize
+    )
+    return hashlib.sha256(f"{namespace}\n{serialized}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Interface of a response cache backend
+
+    Values are either the response text or, for streaming requests, the list of
+    stream events. `get` returns None on a miss.
+    """
+
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryResponseCache(ResponseCache):
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any):
+        self._cache.put(key, value)
+
+    def delete(self, key: str):
+        self._cache.pop(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    @property
+    def stats(self):
+        return self._cache.stats
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    On-disk response cache backed by a single SQLite file
+
+    Can be shared by several processes. Values are stored as JSON; once more than
+    `max_entries` rows exist, the least recently used ones are deleted.
+    """
+
+    def __init__(
+        self, path: str, ttl: float | None = None, max_entries: int | None = 10_000
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        expires_at = None if self.ttl is None else now + self.ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=_event_to_dict), expires_at, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute(
+            "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        )
+        if self.max_entries is not None:
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self):
+        self._conn.close()
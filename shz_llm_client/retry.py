@@ -0,0 +1,129 @@
+"""
+Retries and request hedging for `send` / `async_send`
+
+A `RetryPolicy` retries failed API requests with jittered exponential backoff.
+Errors are retried when the vendor client classifies them as transient
+(`BaseLLMClient._is_retryable`, e.g. Bedrock throttling or OpenAI 5xx) or when
+they are instances of `retry_on`. An optional shared `RetryBudget` caps retries
+to a fraction of the requests, so an outage doesn't multiply the load.
+
+`Hedging` cuts the tail latency of non-streaming `async_send` calls: when the
+request isn't answered after `delay` (by default the observed p95 latency), a
+second identical request is launched and whichever finishes first wins, the
+other one is cancelled.
+
+    client.retry_policy = RetryPolicy(max_attempts=4, budget=RetryBudget(ratio=0.1))
+    client.hedging = Hedging(quantile=0.95)
+
+Streams are only retried until the provider accepted the request, events that
+were already yielded are never replayed.
+"""
+
+import math
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+
+class RetryBudget:
+    """
+    Shared allowance of retries, refilled by the requests themselves
+
+    Every request deposits `ratio` tokens and every retry withdraws one, up to
+    `capacity` tokens saved. With `ratio=0.1`, at most about one request in ten
+    is retried once the initial `capacity` is spent.
+    """
+
+    def __init__(self, ratio: float = 0.1, capacity: float = 10.0):
+        if ratio < 0 or capacity < 1:
+            raise ValueError("ratio must be >= 0 and capacity >= 1")
+
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take a retry token, False when the budget is spent"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def available(self) -> float:
+        return self._tokens
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retry policy of failed API requests
+
+    `max_attempts` counts the first request. The delay before retry `n` (from 0)
+    is drawn uniformly between 0 and `min(max_delay, base_delay * 2**n)`
+    ("full jitter"), so concurrent clients don't retry in lockstep.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    retry_on: tuple[type[BaseException], ...] = ()
+    budget: RetryBudget | None = field(default=None, compare=False)
+
+    def __post_init__(self):
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class Hedging:
+    """
+    Hedging of non-streaming async requests
+
+    The hedge is launched `delay` seconds after the first request, or, without a
+    fixed delay, after the `quantile` of the latencies of the last `window`
+    requests once `min_samples` were observed. Until then no request is hedged.
+    """
+
+    def __init__(
+        self,
+        delay: float | None = None,
+        quantile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        if not 0 < quantile < 1:
+            raise ValueError("quantile must be between 0 and 1")
+
+        self.delay = delay
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    @property
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait before hedging, None to not hedge"""
+        if self.delay is not None:
+            return self.delay
+
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        # Nearest-rank percentile
+        index = max(0, math.ceil(self.quantile * len(latencies)) - 1)
+        return latencies[index]
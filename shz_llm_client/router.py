@@ -0,0 +1,230 @@
+"""
+Latency-aware routing over several clients
+
+`RouterClient` sends each request to the fastest healthy client and fails over
+to the next one when it errors. Clients are ranked by an exponentially weighted
+moving average (EWMA) of their latency, the time to the first event for
+streams. A client whose EWMA error rate reaches `max_error_rate` is skipped for
+`cooldown` seconds, then tried again; it is still used as a last resort when
+every client is unhealthy.
+
+    router = RouterClient([openai_client, bedrock_client, google_client])
+    response = router.send(messages, system_prompt)
+
+Streams fail over until the first event is yielded. An error after that is
+raised, since another model can't continue a partially delivered answer.
+"""
+
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+
+from .base_client import BaseLLMClient
+from .schemas import RequestMessage
+
+
+@dataclass(slots=True)
+class BackendStats:
+    """Rolling health of a routed client"""
+
+    latency: float | None = None
+    error_rate: float = 0.0
+    unhealthy_until: float = 0.0
+    requests: int = 0
+    errors: int = 0
+
+
+class RouterClient(BaseLLMClient):
+    """
+    Route requests across `clients`, which must share the same stream mode
+
+    Args:
+        - clients: Clients to route to, any `BaseLLMClient`
+        - smoothing: EWMA weight of the latest sample, between 0 and 1
+        - max_error_rate: EWMA error rate at which a client is taken out
+        - cooldown: Seconds an unhealthy client is skipped
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[BaseLLMClient],
+        smoothing: float = 0.2,
+        max_error_rate: float = 0.5,
+        cooldown: float = 30.0,
+    ):
+        if not clients:
+            raise ValueError("RouterClient needs at least one client")
+        stream = clients[0].stream
+        if any(client.stream != stream for client in clients):
+            raise ValueError("All routed clients must use the same stream mode")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+
+        super().__init__(api_key=None, model_id="router", stream=stream)
+        self.clients = list(clients)
+        self.smoothing = smoothing
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+
+        self._stats = {id(client): BackendStats() for client in self.clients}
+        self._lock = threading.Lock()
+
+    def stats(self, client: BaseLLMClient) -> BackendStats:
+        """Snapshot of the health of a routed client"""
+        with self._lock:
+            stats = self._stats[id(client)]
+            return BackendStats(
+                stats.latency,
+                stats.error_rate,
+                stats.unhealthy_until,
+                stats.requests,
+                stats.errors,
+            )
+
+    #
+    # Routing
+    #
+    def _ordered(self) -> list[BaseLLMClient]:
+        """Healthy clients fastest first (untried ones before them), then the rest"""
+        now = time.monotonic()
+        with self._lock:
+            healthy, unhealthy = [], []
+            for client in self.clients:
+                stats = self._stats[id(client)]
+                if stats.unhealthy_until <= now:
+                    healthy.append((stats.latency or 0.0, client))
+                else:
+                    unhealthy.append((stats.unhealthy_until, client))
+
+        # `sort` is stable, ties keep the configured order
+        healthy.sort(key=lambda item: item[0])
+        unhealthy.sort(key=lambda item: item[0])
+        return [client for _, client in healthy + unhealthy]
+
+    def _record_success(self, client: BaseLLMClient, latency: float | None):
+        alpha = self.smoothing
+        with self._lock:
+            stats = self._stats[id(client)]
+            stats.requests += 1
+            stats.error_rate *= 1 - alpha
+            if latency is not None:
+                if stats.latency is None:
+                    stats.latency = latency
+                else:
+                    stats.latency = alpha * latency + (1 - alpha) * stats.latency
+
+    def _record_failure(self, client: BaseLLMClient):
+        alpha = self.smoothing
+        with self._lock:
+            stats = self._stats[id(client)]
+            stats.requests += 1
+            stats.errors += 1
+            stats.error_rate = alpha + (1 - alpha) * stats.error_rate
+            if stats.error_rate >= self.max_error_rate:
+                stats.unhealthy_until = time.monotonic() + self.cooldown
+
+    def _record_usage(self, response, started_at: float):
+        # An `LLMResponse` carries its usage as attributes, a stop event as items
+        usage = (
+            response
+            if isinstance(response, dict)
+            else getattr(response, "__dict__", {})
+        )
+        self.usage_counter.record(
+            usage.get("input_tokens"),
+            usage.get("output_tokens"),
+            usage.get("total_tokens"),
+            time.perf_counter() - started_at,
+            cache_read_tokens=usage.get("cache_read_tokens"),
+            cache_write_tokens=usage.get("cache_write_tokens"),
+        )
+
+    #
+    # Send
+    #
+    def send(self, messages: list[RequestMessage], system_prompt: RequestMessage):
+        if self.stream:
+            return self._stream(messages, system_prompt)
+
+        started_at = time.perf_counter()
+        error = None
+        for client in self._ordered():
+            sent_at = time.perf_counter()
+            try:
+                response = client.send(messages, system_prompt)
+            except Exception as e:  # noqa: BLE001
+                self._record_failure(client)
+                error = e
+                continue
+
+            # Cache hits say nothing about the provider's latency
+            cached = getattr(response, "cached", False)
+            latency = time.perf_counter() - sent_at
+            self._record_success(client, None if cached else latency)
+            self._record_usage(response, started_at)
+            return response
+
+        self.usage_counter.record_error()
+        raise error
+
+    def _stream(
+        self, messages: list[RequestMessage], system_prompt: RequestMessage
+    ) -> Iterator:
+        started_at = time.perf_counter()
+        error = None
+        for client in self._ordered():
+            sent_at = time.perf_counter()
+            first_event_latency = None
+            try:
+                for event in client.send(messages, system_prompt):
+                    if first_event_latency is None:
+                        first_event_latency = time.perf_counter() - sent_at
+                    if event["type"] == "stop":
+                        self._record_usage(event, started_at)
+                    yield event
+            except Exception as e:
+                self._record_failure(client)
+                if first_event_latency is not None:
+                    self.usage_counter.record_error()
+                    raise
+                error = e
+                continue
+
+            self._record_success(client, first_event_latency)
+            return
+
+        self.usage_counter.record_error()
+        raise error
+
+    async def async_send(
+        self, messages: list[RequestMessage], system_prompt: RequestMessage
+    ) -> AsyncIterator:
+        started_at = time.perf_counter()
+        error = None
+        for client in self._ordered():
+            sent_at = time.perf_counter()
+            first_event_latency = None
+            cached = False
+            try:
+                async for response in client.async_send(messages, system_prompt):
+                    if first_event_latency is None:
+                        first_event_latency = time.perf_counter() - sent_at
+                        cached = getattr(response, "cached", False)
+                    if not self.stream or response["type"] == "stop":
+                        self._record_usage(response, started_at)
+                    yield response
+            except Exception as e:
+                self._record_failure(client)
+                if first_event_latency is not None:
+                    self.usage_counter.record_error()
+                    raise
+                error = e
+                continue
+
+            # Cache hits say nothing about the provider's latency
+            self._record_success(client, None if cached else first_event_latency)
+            return
+
+        self.usage_counter.record_error()
+        raise error
@@ -1,5 +1,6 @@
+from collections.abc import Callable, Hashable, Iterable, Iterator
 from enum import Enum
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal, TypedDict
 
 from pydantic import BaseModel, BeforeValidator
 
@@ -25,6 +26,198 @@ class Base64ImageItem(BaseModel):
 
 
 class RequestMessage(BaseModel):
+    """
+    A chat message
+
+    `cache_prompt` marks the end of a prompt prefix the provider should cache,
+    e.g. a long system prompt or shared documents. Clients of providers with
+    explicit prompt caching (Anthropic) emit a cache breakpoint after it.
+    """
+
     content: str
     role: str
     b64_images: list[Base64ImageItem] = []
+    cache_prompt: bool = False
+
+
+class Conversation:
+    """
+    Append-only chat history that remembers how each client formatted it
+
+    Clients accept a `Conversation` anywhere a `list[RequestMessage]` is accepted.
+    The formatted form of the messages is cached per vendor format, so each turn
+    only the newly appended messages are formatted. Messages are treated as
+    immutable once appended; call `reset_cache` after editing one in place.
+
+        conversation = Conversation()
+        conversation.append(RequestMessage(role="user", content="Hi"))
+        response = client.send(conversation, system_prompt)
+        conversation.append(RequestMessage(role="assistant", content=response))
+    """
+
+    def __init__(self, messages: Iterable[RequestMessage] = ()):
+        self._messages: list[RequestMessage] = list(messages)
+        # format key -> formatted messages, a prefix of `_messages`
+        self._formatted: dict[Hashable, list] = {}
+
+    def append(self, message: RequestMessage):
+        self._messages.append(message)
+
+    def extend(self, messages: Iterable[RequestMessage]):
+        self._messages.extend(messages)
+
+    @property
+    def messages(self) -> list[RequestMessage]:
+        return list(self._messages)
+
+    def formatted(
+        self, key: Hashable, format_message: Callable[[RequestMessage], Any]
+    ) -> list:
+        """Return every message formatted by `format_message`, formatting only the tail"""
+        cached = self._formatted.setdefault(key, [])
+        for message in self._messages[len(cached) :]:
+            cached.append(format_message(message))
+        return list(cached)
+
+    def reset_cache(self):
+        self._formatted.clear()
+
+    def __iter__(self) -> Iterator[RequestMessage]:
+        return iter(self._messages)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def __repr__(self) -> str:
+        return f"Conversation({self._messages!r})"
+
+
+class BatchRequest(BaseModel):
+    custom_id: str
+    messages: list[RequestMessage]
+    system_prompt: RequestMessage | None = None
+
+
+class BatchResult(BaseModel):
+    custom_id: str
+    content: str = ""
+    error: str | None = None
+
+
+class StreamDelta(TypedDict):
+    """Event of a stream carrying the next piece of the response text"""
+
+    delta: str
+    type: Literal["delta"]
+
+
+class StreamStop(TypedDict):
+    """
+    Last event of a stream, with the token usage of the request
+
+    `latency` is set by the client, seconds from the start of `send` /
+    `async_send` to this event. `cache_read_tokens` / `cache_write_tokens` are
+    the prompt tokens read from / written to the provider's prompt cache.
+    """
+
+    delta: str
+    input_tokens: int | None
+    output_tokens: int | None
+    total_tokens: int | None
+    finish_reason: str | None
+    latency: float | None
+    cache_read_tokens: int | None
+    cache_write_tokens: int | None
+    type: Literal["stop"]
+
+
+# Events are plain dicts, so they can be serialized and forwarded as they are.
+# Streams build deltas as dict literals, the cheapest way to build a dict.
+StreamEvent = StreamDelta | StreamStop
+
+
+def stream_stop(
+    delta: str = "",
+    input_tokens: int | None = None,
+    output_tokens: int | None = None,
+    total_tokens: int | None = None,
+    finish_reason: str | None = None,
+    latency: float | None = None,
+    cache_read_tokens: int | None = None,
+    cache_write_tokens: int | None = None,
+) -> StreamStop:
+    """Build the stop event of a stream, with every key set"""
+    return {
+        "delta": delta,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": total_tokens,
+        "finish_reason": finish_reason,
+        "latency": latency,
+        "cache_read_tokens": cache_read_tokens,
+        "cache_write_tokens": cache_write_tokens,
+        "type": "stop",
+    }
+
+
+class LLMResponse(str):
+    """
+    Text of a non-streaming response with its usage and timing
+
+    A `str` subclass, so it is used as the response text everywhere a string
+    was returned before. `latency` is the time `send` / `async_send` took and
+    `cached` is True when the response cache answered the request. Prompt cache
+    usage is reported like `StreamStop`'s.
+    """
+
+    def __new__(
+        cls,
+        text: str = "",
+        input_tokens: int | None = None,
+        output_tokens: int | None = None,
+        total_tokens: int | None = None,
+        finish_reason: str | None = None,
+        latency: float | None = None,
+        cached: bool = False,
+        cache_read_tokens: int | None = None,
+        cache_write_tokens: int | None = None,
+    ):
+        response = super().__new__(cls, text)
+        response.input_tokens = input_tokens
+        response.output_tokens = output_tokens
+        response.total_tokens = total_tokens
+        response.finish_reason = finish_reason
+        response.latency = latency
+        response.cached = cached
+        response.cache_read_tokens = cache_read_tokens
+        response.cache_write_tokens = cache_write_tokens
+        return response
+
+    @property
+    def text(self) -> str:
+        return str.__str__(self)
+
+    def __repr__(self) -> str:
+        return (
+            f"LLMResponse({self.text!r}, input_tokens={self.input_tokens}, "
+            f"output_tokens={self.output_tokens}, finish_reason={self.finish_reason!r})"
+        )
+
+    def __reduce__(self):
+        return (
+            LLMResponse,
+            (
+                self.text,
+                self.input_tokens,
+                self.output_tokens,
+                self.total_tokens,
+                self.finish_reason,
+                self.latency,
+                self.cached,
+                self.cache_read_tokens,
+                self.cache_write_tokens,
+            ),
+        )
@@ -0,0 +1,120 @@
+"""
+Thread bridges for blocking streams
+
+boto3 event streams block the calling thread on every read. `read_ahead` drains
+such a stream in a background thread into a bounded buffer, so a sync consumer
+overlaps its own work with the network reads. `async_iterate_in_thread` lets an
+async consumer read a blocking stream without blocking the event loop.
+
+In both cases at most `max_buffer` items are read ahead of the consumer, errors
+of the stream are raised to the consumer, and the stream is closed when the
+consumer stops early.
+"""
+
+import asyncio
+import queue
+import threading
+from collections.abc import AsyncIterator, Iterable, Iterator
+
+_DONE = object()
+
+# Seconds the producer waits on a full buffer before checking for cancellation
+_PUT_POLL_INTERVAL = 0.1
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _close(iterable):
+    close = getattr(iterable, "close", None)
+    if close is not None:
+        close()
+
+
+def _produce(iterable: Iterable, put, stopped: threading.Event):
+    try:
+        for item in iterable:
+            if not put(item):
+                return
+        put(_DONE)
+    except BaseException as e:  # noqa: BLE001
+        put(_Failure(e))
+    finally:
+        if stopped.is_set():
+            _close(iterable)
+
+
+def read_ahead(iterable: Iterable, max_buffer: int = 64) -> Iterator:
+    """Iterate `iterable` in a background thread, buffering up to `max_buffer` items"""
+    if max_buffer < 1:
+        raise ValueError("max_buffer must be at least 1")
+
+    buffer: queue.Queue = queue.Queue(maxsize=max_buffer)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=_PUT_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    thread = threading.Thread(
+        target=_produce, args=(iterable, put, stopped), daemon=True
+    )
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+
+
+async def async_iterate_in_thread(
+    iterable: Iterable, max_buffer: int = 64
+) -> AsyncIterator:
+    """Iterate a blocking `iterable` in a thread without blocking the event loop"""
+    if max_buffer < 1:
+        raise ValueError("max_buffer must be at least 1")
+
+    loop = asyncio.get_running_loop()
+    buffer: asyncio.Queue = asyncio.Queue()
+    # Held by every buffered item, so the thread reads at most `max_buffer` ahead
+    slots = threading.Semaphore(max_buffer)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not slots.acquire(timeout=_PUT_POLL_INTERVAL):
+            if stopped.is_set():
+                return False
+        if stopped.is_set():
+            return False
+        loop.call_soon_threadsafe(buffer.put_nowait, item)
+        return True
+
+    thread = threading.Thread(
+        target=_produce, args=(iterable, put, stopped), daemon=True
+    )
+    thread.start()
+    try:
+        while True:
+            item = await buffer.get()
+            slots.release()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
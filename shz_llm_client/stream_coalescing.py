@@ -0,0 +1,129 @@
+"""
+Delta coalescing for streaming responses
+
+Providers often stream one or two characters per chunk. With coalescing enabled
+the client buffers deltas and yields them as one `StreamDelta` once the buffer
+reaches `max_bytes` (UTF-8) or its oldest delta is `max_delay` seconds old. The
+"stop" event is passed through unchanged, after the buffered text.
+
+    client.delta_coalescing = DeltaCoalescing(max_bytes=256, max_delay=0.02)
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass
+
+from .schemas import StreamDelta
+
+
+@dataclass(frozen=True)
+class DeltaCoalescing:
+    """
+    Flush policy of coalesced deltas, either limit may be None but not both
+
+    Async streams flush on `max_delay` even while waiting for the next chunk.
+    Sync streams can only check the window when a chunk arrives.
+    """
+
+    max_bytes: int | None = 256
+    max_delay: float | None = 0.02
+
+    def __post_init__(self):
+        if self.max_bytes is None and self.max_delay is None:
+            raise ValueError("Set at least one of max_bytes and max_delay")
+
+
+class _DeltaBuffer:
+    def __init__(self, coalescing: DeltaCoalescing):
+        self._max_bytes = coalescing.max_bytes
+        self._max_delay = coalescing.max_delay
+        self._parts: list[str] = []
+        self._size = 0
+        # Monotonic time the oldest buffered delta must be flushed by
+        self.deadline: float | None = None
+
+    def __bool__(self) -> bool:
+        return bool(self._parts)
+
+    def add(self, delta: str) -> bool:
+        """Buffer `delta`, return True when the buffer should be flushed"""
+        if not self._parts and self._max_delay is not None:
+            self.deadline = time.monotonic() + self._max_delay
+        self._parts.append(delta)
+
+        if self._max_bytes is not None:
+            self._size += len(delta.encode("utf-8"))
+            if self._size >= self._max_bytes:
+                return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def flush(self) -> StreamDelta:
+        event = {"delta": "".join(self._parts), "type": "delta"}
+        self._parts = []
+        self._size = 0
+        self.deadline = None
+        return event
+
+
+def coalesce_deltas(events: Iterable, coalescing: DeltaCoalescing) -> Iterator:
+    buffer = _DeltaBuffer(coalescing)
+    for event in events:
+        if event["type"] == "stop":
+            if buffer:
+                yield buffer.flush()
+            yield event
+        elif event["delta"] and buffer.add(event["delta"]):
+            yield buffer.flush()
+
+    if buffer:
+        yield buffer.flush()
+
+
+async def async_coalesce_deltas(
+    events: AsyncIterable, coalescing: DeltaCoalescing
+) -> AsyncIterator:
+    buffer = _DeltaBuffer(coalescing)
+    iterator = events.__aiter__()
+    next_event: asyncio.Future | None = None
+    try:
+        while True:
+            if buffer and buffer.deadline is not None:
+                # Wait for the next chunk in a task, so the buffer can be flushed
+                # on time without cancelling the upstream generator
+                if next_event is None:
+                    next_event = asyncio.ensure_future(iterator.__anext__())
+                timeout = max(0.0, buffer.deadline - time.monotonic())
+                done, _ = await asyncio.wait({next_event}, timeout=timeout)
+                if not done:
+                    yield buffer.flush()
+                    continue
+
+            try:
+                if next_event is not None:
+                    event = await next_event
+                else:
+                    event = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_event = None
+
+            if event["type"] == "stop":
+                if buffer:
+                    yield buffer.flush()
+                yield event
+            elif event["delta"] and buffer.add(event["delta"]):
+                yield buffer.flush()
+
+        if buffer:
+            yield buffer.flush()
+    finally:
+        if next_event is not None:
+            next_event.cancel()
+            try:
+                await next_event
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
@@ -0,0 +1,99 @@
+import threading
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class UsageStats:
+    """
+    Aggregated usage of a client
+
+    `requests` counts completed API requests, `latency` is their summed
+    duration in seconds. Cache hits and failed requests are counted apart and
+    add no tokens or latency. `cache_read_tokens` / `cache_write_tokens` count
+    prompt tokens served from / written to the providers' prompt caches.
+    """
+
+    requests: int
+    errors: int
+    cached: int
+    input_tokens: int
+    output_tokens: int
+    total_tokens: int
+    latency: float
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def average_latency(self) -> float | None:
+        return self.latency / self.requests if self.requests else None
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Output tokens per second of request time"""
+        return self.output_tokens / self.latency if self.latency else None
+
+
+class UsageCounter:
+    """
+    Thread-safe running totals of requests and tokens
+
+    Updated once per request, `stats` returns a consistent snapshot and is
+    cheap enough to scrape on every metrics poll.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = 0
+            self._errors = 0
+            self._cached = 0
+            self._input_tokens = 0
+            self._output_tokens = 0
+            self._total_tokens = 0
+            self._cache_read_tokens = 0
+            self._cache_write_tokens = 0
+            self._latency = 0.0
+
+    def record(
+        self,
+        input_tokens: int | None,
+        output_tokens: int | None,
+        total_tokens: int | None,
+        latency: float,
+        cache_read_tokens: int | None = None,
+        cache_write_tokens: int | None = None,
+    ):
+        with self._lock:
+            self._requests += 1
+            self._input_tokens += input_tokens or 0
+            self._output_tokens += output_tokens or 0
+            self._total_tokens += total_tokens or 0
+            self._cache_read_tokens += cache_read_tokens or 0
+            self._cache_write_tokens += cache_write_tokens or 0
+            self._latency += latency
+
+    def record_error(self):
+        with self._lock:
+            self._errors += 1
+
+    def record_cached(self):
+        with self._lock:
+            self._cached += 1
+
+    @property
+    def stats(self) -> UsageStats:
+        with self._lock:
+            return UsageStats(
+                requests=self._requests,
+                errors=self._errors,
+                cached=self._cached,
+                input_tokens=self._input_tokens,
+                output_tokens=self._output_tokens,
+                total_tokens=self._total_tokens,
+                latency=self._latency,
+                cache_read_tokens=self._cache_read_tokens,
+                cache_write_tokens=self._cache_write_tokens,
+            )
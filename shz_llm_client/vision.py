@@ -1,9 +1,75 @@
+import asyncio
 import base64
+import binascii
+import functools
+import os
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor
 from io import BytesIO
+from typing import BinaryIO
 
-import boto3
 from PIL import Image
 
+from .image_cache import ImageCache, image_cache_key
+from .schemas import Base64ImageItem
+
+# Read size for base64 encoding, a multiple of 3 so chunks encode without padding
+_B64_CHUNK_SIZE = 3 * 256 * 1024
+
+# Vendor -> (max short side, max long side) of images sent to the vendor
+IMAGE_SIZE_LIMITS = {
+    "openai": (768, 2000),
+    "anthropic": (1568, 1568),
+}
+
+ImageSource = str | os.PathLike | bytes
+
+# Connections kept by the shared S3 clients, and S3 downloads in flight per batch
+S3_MAX_POOL_CONNECTIONS = 32
+
+# Bytes of an S3 body read before its image format is detected
+_FORMAT_HEAD_SIZE = 64 * 1024
+
+
+class _Base64Encoder:
+    """
+    Incremental base64 encoder
+
+    Only whole 3 byte groups are encoded per `update`, so short reads never add
+    padding in the middle of the output.
+    """
+
+    def __init__(self):
+        self._encoded = bytearray()
+        self._remainder = b""
+
+    def update(self, chunk: bytes):
+        if self._remainder:
+            chunk = self._remainder + chunk
+        cut = len(chunk) - len(chunk) % 3
+        self._encoded += binascii.b2a_base64(chunk[:cut], newline=False)
+        self._remainder = chunk[cut:]
+
+    def finish(self) -> str:
+        if self._remainder:
+            self._encoded += binascii.b2a_base64(self._remainder, newline=False)
+            self._remainder = b""
+        return self._encoded.decode("ascii")
+
+
+def _stream_to_base64(stream: BinaryIO) -> str:
+    """
+    Base64 encode a binary stream chunk by chunk
+
+    Only one raw chunk is held at a time instead of the whole body next to its
+    encoded copy, useful for network streams such as S3 bodies.
+    """
+    encoder = _Base64Encoder()
+    while chunk := stream.read(_B64_CHUNK_SIZE):
+        encoder.update(chunk)
+    return encoder.finish()
+
 
 def image_to_base64(image_path):
     """
@@ -17,27 +83,99 @@ def image_to_base64(image_path):
     return encoded_string
 
 
-def s3_image_to_base64(bucket_name, object_key):
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def _get_s3_client():
+    """Shared S3 client, boto3 clients are thread-safe and pool their connections"""
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            # boto3 is only needed for S3 sources, keep it out of the module import
+            import boto3
+            from botocore.config import Config
+
+            _s3_client = boto3.client(
+                "s3", config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+            )
+        return _s3_client
+
+
+def s3_image_to_base64(bucket_name, object_key, s3_client=None):
     """
     Convert an image from S3 to Base64 format.
 
     :param bucket_name: The name of the S3 bucket
     :param object_key: The key of the image object in the S3 bucket
+    :param s3_client: boto3 S3 client to use, a shared pooled client by default
     :return: Base64 encoded string of the image
     """
-    # Initialize the S3 client
-    s3 = boto3.client("s3")
+    s3 = s3_client or _get_s3_client()
 
     # Get the object from S3
     response = s3.get_object(Bucket=bucket_name, Key=object_key)
 
-    # Read the object's content
-    image_data = response["Body"].read()
+    # Encode the object's content to Base64 while it downloads
+    return _stream_to_base64(response["Body"])
 
-    # Encode the image to Base64
-    encoded_string = base64.b64encode(image_data).decode("utf-8")
 
-    return encoded_string
+def _target_size(
+    width: int, height: int, max_short_side: int, max_long_side: int
+) -> tuple[int, int] | None:
+    """Return the size the image has to be resized to, or None if it fits"""
+    if width < height:
+        short_side, long_side = width, height
+    else:
+        short_side, long_side = height, width
+
+    # Check if the image needs resizing
+    if short_side <= max_short_side and long_side <= max_long_side:
+        return None
+
+    # Scale by the tighter limit, so both sides fit
+    scale_factor = min(max_short_side / short_side, max_long_side / long_side)
+
+    return max(1, int(width * scale_factor)), max(1, int(height * scale_factor))
+
+
+def _file_image_format(file) -> str | None:
+    name = getattr(file, "name", None)
+    if not isinstance(name, str) or "." not in name:
+        return None
+
+    image_format = name.split(".")[-1].upper()
+    if image_format == "JPG":
+        image_format = "JPEG"
+    return image_format
+
+
+def _resize(
+    file: BinaryIO, max_short_side: int, max_long_side: int, image_format: str | None
+) -> tuple[BytesIO | None, str]:
+    """
+    Resize the image in `file` to fit the limits
+
+    Returns the re-encoded image and its format, or None as image when the
+    original bytes can be used as they are. JPEGs are decoded at a reduced
+    scale (`Image.draft`) close to the target size instead of full size.
+    """
+    image = Image.open(file)
+    image_format = image_format or image.format
+
+    new_size = _target_size(*image.size, max_short_side, max_long_side)
+    if new_size is None and image_format == image.format:
+        # Nothing to resize, skip decoding and re-encoding the image
+        return None, image_format
+
+    if new_size is not None:
+        image.draft(image.mode, new_size)
+        image = image.resize(new_size, reducing_gap=2.0)
+
+    image_io = BytesIO()
+    image.save(image_io, format=image_format)
+    image_io.seek(0)
+    return image_io, image_format
 
 
 def resize_image(file, max_short_side=768, max_long_side=1568) -> BytesIO:
@@ -46,36 +184,326 @@ def resize_image(file, max_short_side=768, max_long_side=1568) -> BytesIO:
     This function is for the limitation of OpenAI's vision support.
     The maximum short side is 768 and the maximum long side is 2000.
     """
-    # Open the image
-    image = Image.open(file)
-    width, height = image.size
+    image_io, _ = _resize(
+        file, max_short_side, max_long_side, image_format=_file_image_format(file)
+    )
 
-    # Determine the scaling factor
-    if width < height:
-        short_side, long_side = width, height
+    if image_io is None:
+        # The image already fits, return the original bytes
+        file.seek(0)
+        image_io = BytesIO(file.read())
+
+    return image_io
+
+
+def load_image_item(
+    source: str | os.PathLike | BinaryIO,
+    max_short_side: int | None = None,
+    max_long_side: int | None = None,
+    image_name: str = "",
+    image_id: str = "",
+    cache: ImageCache | None = None,
+) -> Base64ImageItem:
+    """
+    Load an image from a path or binary file into a `Base64ImageItem`
+
+    Without size limits the file is base64 encoded as it is read. With limits,
+    larger images are downscaled first (see `resize_image`); images that already
+    fit are never decoded. With a `cache`, the file is read whole and images
+    with the same bytes and limits are resized and encoded only once.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return load_image_item(
+                file, max_short_side, max_long_side, image_name, image_id, cache
+            )
+
+    if cache is not None:
+        data = source.read()
+        key = image_cache_key(data, max_short_side, max_long_side)
+        image_item = cache.get(key)
+        if image_item is None:
+            image_item = load_image_item(BytesIO(data), max_short_side, max_long_side)
+            cache.put(key, image_item)
+        return image_item.model_copy(
+            update={
+                "image_name": image_name
+                or os.path.basename(getattr(source, "name", "") or ""),
+                "image_id": image_id,
+            }
+        )
+
+    start = source.tell()
+    if max_short_side is None and max_long_side is None:
+        # Reads the header only
+        image_format = Image.open(source).format
+        image_io = None
     else:
-        short_side, long_side = height, width
+        image_io, image_format = _resize(
+            source,
+            max_short_side or max_long_side,
+            max_long_side or max_short_side,
+            image_format=None,
+        )
 
-    # Check if the image needs resizing
-    if short_side > max_short_side or long_side > max_long_side:
-        # Determine new dimensions
-        if short_side > max_short_side:
-            scale_factor = max_short_side / short_side
-        else:
-            scale_factor = max_long_side / long_side
+    if image_io is None:
+        source.seek(start)
+        image_io = source
 
-        new_width = int(width * scale_factor)
-        new_height = int(height * scale_factor)
+    # Multi-picture JPEGs (most phone cameras) are plain JPEGs for the vendors
+    if image_format == "MPO":
+        image_format = "JPEG"
 
-        # Resize the image
-        image = image.resize((new_width, new_height))
+    return Base64ImageItem(
+        b64_string=_stream_to_base64(image_io),
+        image_type=image_format.lower(),
+        image_name=image_name or os.path.basename(getattr(source, "name", "") or ""),
+        image_id=image_id,
+    )
 
-    # Save the image to a BytesIO object
-    image_io = BytesIO()
-    image_format = file.name.split(".")[-1].upper()
-    if image_format == "JPG":
+
+#
+# Batch Preparation
+#
+_default_executor: ProcessPoolExecutor | None = None
+_default_executor_lock = threading.Lock()
+
+
+def _get_default_executor() -> ProcessPoolExecutor:
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ProcessPoolExecutor()
+        return _default_executor
+
+
+def _image_size_limits(vendor: str) -> tuple[int, int]:
+    try:
+        return IMAGE_SIZE_LIMITS[vendor]
+    except KeyError:
+        raise ValueError(
+            f"Unknown vendor {vendor!r}, expected one of {list(IMAGE_SIZE_LIMITS)}"
+        )
+
+
+def _prepare_image(
+    source: ImageSource, max_short_side: int, max_long_side: int
+) -> Base64ImageItem:
+    """Executor task, module level so it can be pickled for a process pool"""
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    return load_image_item(source, max_short_side, max_long_side)
+
+
+class _CachedBatch:
+    """
+    Splits a batch of sources into cache hits and the distinct images to prepare
+
+    Sources are read and hashed in the calling process, only misses are sent to
+    the executor and their results are stored in the cache afterwards.
+    """
+
+    def __init__(
+        self,
+        sources: Iterable[ImageSource],
+        max_short_side: int,
+        max_long_side: int,
+        cache: ImageCache,
+    ):
+        self.cache = cache
+        self.image_items: list[Base64ImageItem | None] = []
+        # key -> (image bytes, [(index, image name)])
+        self.misses: dict[str, tuple[bytes, list[tuple[int, str]]]] = {}
+
+        for idx, source in enumerate(sources):
+            if isinstance(source, bytes):
+                data, image_name = source, ""
+            else:
+                with open(source, "rb") as file:
+                    data = file.read()
+                image_name = os.path.basename(source)
+
+            key = image_cache_key(data, max_short_side, max_long_side)
+            image_item = cache.get(key)
+            if image_item is None:
+                self.misses.setdefault(key, (data, []))[1].append((idx, image_name))
+            else:
+                image_item = image_item.model_copy(update={"image_name": image_name})
+            self.image_items.append(image_item)
+
+    def complete(self, prepared: Iterable[Base64ImageItem]) -> list[Base64ImageItem]:
+        """Store the prepared misses, in the order of `misses`, and return all items"""
+        for (key, (_, positions)), image_item in zip(self.misses.items(), prepared):
+            self.cache.put(key, image_item)
+            for idx, image_name in positions:
+                self.image_items[idx] = image_item.model_copy(
+                    update={"image_name": image_name}
+                )
+        return self.image_items
+
+
+def prepare_images(
+    sources: Iterable[ImageSource],
+    vendor: str = "anthropic",
+    executor: Executor | None = None,
+    cache: ImageCache | None = None,
+) -> list[Base64ImageItem]:
+    """
+    Resize and encode many images in parallel for `vendor`'s size limits
+
+    Sources are file paths or raw image bytes. Runs in a shared process pool by
+    default; pass a `ThreadPoolExecutor` when the sources are mostly I/O bound
+    or already small. With a `cache`, images prepared before are not processed
+    again. Results keep the order of `sources`.
+    """
+    max_short_side, max_long_side = _image_size_limits(vendor)
+    executor = executor or _get_default_executor()
+
+    if cache is None:
+        futures = [
+            executor.submit(_prepare_image, source, max_short_side, max_long_side)
+            for source in sources
+        ]
+        return [future.result() for future in futures]
+
+    batch = _CachedBatch(sources, max_short_side, max_long_side, cache)
+    futures = [
+        executor.submit(_prepare_image, data, max_short_side, max_long_side)
+        for data, _ in batch.misses.values()
+    ]
+    return batch.complete(future.result() for future in futures)
+
+
+async def async_prepare_images(
+    sources: Iterable[ImageSource],
+    vendor: str = "anthropic",
+    executor: Executor | None = None,
+    cache: ImageCache | None = None,
+) -> list[Base64ImageItem]:
+    """`prepare_images` for async code, the event loop is not blocked while images are processed"""
+    max_short_side, max_long_side = _image_size_limits(vendor)
+    executor = executor or _get_default_executor()
+    loop = asyncio.get_running_loop()
+
+    if cache is None:
+        return await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    executor, _prepare_image, source, max_short_side, max_long_side
+                )
+                for source in sources
+            ]
+        )
+
+    # Reading and hashing the sources is file I/O too, keep it off the loop
+    batch = await loop.run_in_executor(
+        None, _CachedBatch, list(sources), max_short_side, max_long_side, cache
+    )
+    prepared = await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                executor, _prepare_image, data, max_short_side, max_long_side
+            )
+            for data, _ in batch.misses.values()
+        ]
+    )
+    return batch.complete(prepared)
+
+
+#
+# Async S3 Loading
+#
+async def _async_s3_body_to_item(
+    body, image_name: str, content_type: str | None
+) -> Base64ImageItem:
+    """Encode an aiobotocore body while it downloads, detecting the format early"""
+    encoder = _Base64Encoder()
+    head = b""
+    while len(head) < _FORMAT_HEAD_SIZE:
+        chunk = await body.read(_B64_CHUNK_SIZE)
+        if not chunk:
+            break
+        head += chunk
+    encoder.update(head)
+
+    try:
+        image_format = Image.open(BytesIO(head)).format
+    except (OSError, SyntaxError):
+        # Truncated or unknown header, fall back to the stored Content-Type
+        if not content_type or not content_type.startswith("image/"):
+            raise
+        image_format = content_type.removeprefix("image/").upper()
+    del head
+
+    while chunk := await body.read(_B64_CHUNK_SIZE):
+        encoder.update(chunk)
+
+    if image_format == "MPO":
         image_format = "JPEG"
-    image.save(image_io, format=image_format)
-    image_io.seek(0)
+    return Base64ImageItem(
+        b64_string=encoder.finish(),
+        image_type=image_format.lower(),
+        image_name=image_name,
+    )
 
-    return image_io
+
+async def async_load_s3_images(
+    objects: Iterable[tuple[str, str]],
+    max_short_side: int | None = None,
+    max_long_side: int | None = None,
+    s3_client=None,
+    max_concurrency: int = S3_MAX_POOL_CONNECTIONS,
+    executor: Executor | None = None,
+) -> list[Base64ImageItem]:
+    """
+    Download many `(bucket, key)` images from S3 concurrently as `Base64ImageItem`s
+
+    Without size limits each body is base64 encoded as it streams in. With
+    limits, the downloaded bytes are resized in `executor` (the loop's default
+    thread pool if None), like `load_image_item`. `s3_client` is an open
+    aioboto3 S3 client to reuse; by default one is opened for the call.
+    Results keep the order of `objects`.
+    """
+    objects = list(objects)
+    resize = max_short_side is not None or max_long_side is not None
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def load(client, bucket_name: str, object_key: str) -> Base64ImageItem:
+        image_name = os.path.basename(object_key)
+        async with semaphore:
+            response = await client.get_object(Bucket=bucket_name, Key=object_key)
+            body = response["Body"]
+            if not resize:
+                return await _async_s3_body_to_item(
+                    body, image_name, response.get("ContentType")
+                )
+            data = await body.read()
+
+        return await loop.run_in_executor(
+            executor,
+            functools.partial(
+                load_image_item,
+                BytesIO(data),
+                max_short_side,
+                max_long_side,
+                image_name=image_name,
+            ),
+        )
+
+    async def load_all(client) -> list[Base64ImageItem]:
+        return await asyncio.gather(
+            *[load(client, bucket, key) for bucket, key in objects]
+        )
+
+    if s3_client is not None:
+        return await load_all(s3_client)
+
+    # aioboto3 is only needed by the async path
+    import aioboto3
+    from botocore.config import Config
+
+    async with aioboto3.Session().client(
+        "s3", config=Config(max_pool_connections=max_concurrency)
+    ) as client:
+        return await load_all(client)
@@ -0,0 +1,65 @@
+import asyncio
+
+from shz_llm_client import BaseLLMClient, LLMResponse, RequestMessage, stream_stop
+
+
+class FakeClient(BaseLLMClient):
+    """
+    Offline client implementing the send hooks
+
+    Answers with the last message, streamed one character per chunk, and
+    reports `input_tokens` input tokens and one output token per character.
+    The message "fail" raises `RuntimeError`. Async requests and chunks are
+    delayed by `chunk_delay`, `api_calls` counts the requests.
+    """
+
+    def __init__(self, stream=False, model_id="fake", input_tokens=2, chunk_delay=0.0):
+        super().__init__(api_key=None, model_id=model_id, stream=stream)
+        self.input_tokens = input_tokens
+        self.chunk_delay = chunk_delay
+        self.api_calls = 0
+
+    def _build_payload(self, messages, system_prompt=None):
+        return {"content": messages[-1].content, "temperature": self.temperature}
+
+    def _make_api_request(self, payload):
+        self.api_calls += 1
+        if payload["content"] == "fail":
+            raise RuntimeError("boom")
+        return payload["content"]
+
+    async def _async_make_api_request(self, payload):
+        await asyncio.sleep(self.chunk_delay)
+        return self._make_api_request(payload)
+
+    def _process_response(self, response):
+        output_tokens = len(response)
+        return LLMResponse(
+            response,
+            self.input_tokens,
+            output_tokens,
+            self.input_tokens + output_tokens,
+            "stop",
+        )
+
+    def _events(self, response):
+        for char in response:
+            yield {"delta": char, "type": "delta"}
+        yield stream_stop(
+            input_tokens=self.input_tokens,
+            output_tokens=len(response),
+            total_tokens=self.input_tokens + len(response),
+            finish_reason="stop",
+        )
+
+    def _stream_response_generator(self, response):
+        yield from self._events(response)
+
+    async def _async_stream_response_generator(self, response):
+        for event in self._events(response):
+            await asyncio.sleep(self.chunk_delay)
+            yield event
+
+
+def user_messages(content="hello"):
+    return [RequestMessage(role="user", content=content)]
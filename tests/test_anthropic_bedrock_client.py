@@ -1,4 +1,6 @@
+import json
 import os
+from typing import ClassVar
 
 import pytest
 from faker import Faker
@@ -195,3 +197,77 @@ async def test_async_stream_response():
     assert last_resp["type"] == "stop"
     for k in ["input_tokens", "output_tokens", "total_tokens", "type"]:
         assert k in last_resp
+
+
+class _FakeStreamingBody:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    async def read(self):
+        return self._data
+
+
+class _FakeAioBedrockClient:
+    def __init__(self, region_name):
+        self.region_name = region_name
+        self.closed = False
+        self.calls = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def invoke_model(self, body, modelId):
+        self.calls += 1
+        response_body = {"content": [{"type": "text", "text": "pong"}]}
+        return {"body": _FakeStreamingBody(json.dumps(response_body).encode())}
+
+
+class _FakeAioSession:
+    clients: ClassVar[list] = []
+
+    def client(self, service_name, region_name=None, config=None):
+        client = _FakeAioBedrockClient(region_name)
+        _FakeAioSession.clients.append(client)
+        return client
+
+
+@pytest.fixture
+def fake_aioboto3_session(mocker):
+    _FakeAioSession.clients = []
+    mocker.patch("aioboto3.Session", _FakeAioSession)
+    return _FakeAioSession
+
+
+@pytest.mark.asyncio
+async def test_async_client_is_reused_across_requests(fake_aioboto3_session):
+    client = AnthropicClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0", aws_region="eu-west-1"
+    )
+    system_prompt = RequestMessage(role="system", content="")
+    messages = [RequestMessage(role="user", content="ping")]
+
+    for _ in range(3):
+        responses = [resp async for resp in client.async_send(messages, system_prompt)]
+        assert responses == ["pong"]
+
+    assert len(fake_aioboto3_session.clients) == 1
+    aio_client = fake_aioboto3_session.clients[0]
+    assert aio_client.region_name == "eu-west-1"
+    assert aio_client.calls == 3
+
+    await client.aclose()
+    assert aio_client.closed
+
+
+@pytest.mark.asyncio
+async def test_async_context_manager_closes_client(fake_aioboto3_session):
+    async with AnthropicClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0"
+    ) as client:
+        assert len(fake_aioboto3_session.clients) == 1
+
+    assert fake_aioboto3_session.clients[0].closed
+    assert client._async_client is None
@@ -0,0 +1,144 @@
+import asyncio
+import gc
+import time
+
+import pytest
+
+from shz_llm_client import BaseLLMClient, RequestMessage
+from shz_llm_client.rate_limit import TokenBucket
+
+
+class EchoClient(BaseLLMClient):
+    """Offline client that echoes the last message after `delay` seconds"""
+
+    def __init__(self, stream=False, delay=0.01):
+        super().__init__(api_key=None, model_id="echo", stream=stream)
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def async_send(self, messages, system_prompt):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            content = messages[-1].content
+            if content == "fail":
+                raise RuntimeError("boom")
+            await asyncio.sleep(self.delay * len(content))
+
+            if self.stream:
+                for char in content:
+                    yield {"delta": char, "type": "delta"}
+                yield {"delta": "", "type": "stop"}
+            else:
+                yield content
+        finally:
+            self.in_flight -= 1
+
+
+def _conversations(*contents):
+    return [[RequestMessage(role="user", content=c)] for c in contents]
+
+
+@pytest.mark.asyncio
+async def test_send_many_yields_every_result_with_its_index():
+    client = EchoClient()
+    conversations = _conversations("ccc", "a", "bb")
+
+    results = [r async for r in client.send_many(conversations)]
+
+    # Shorter contents finish first
+    assert results == [(1, "a"), (2, "bb"), (0, "ccc")]
+
+
+@pytest.mark.asyncio
+async def test_send_many_joins_stream_deltas():
+    client = EchoClient(stream=True)
+
+    results = dict([r async for r in client.send_many(_conversations("hello", "hi"))])
+
+    assert results == {0: "hello", 1: "hi"}
+
+
+@pytest.mark.asyncio
+async def test_send_many_bounds_concurrency():
+    client = EchoClient()
+    conversations = (c for c in _conversations(*["x"] * 20))
+
+    results = [r async for r in client.send_many(conversations, max_concurrency=3)]
+
+    assert len(results) == 20
+    assert client.max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_send_many_returns_exceptions_when_asked():
+    client = EchoClient()
+
+    results = dict(
+        [
+            r
+            async for r in client.send_many(
+                _conversations("ok", "fail"), return_exceptions=True
+            )
+        ]
+    )
+
+    assert results[0] == "ok"
+    assert isinstance(results[1], RuntimeError)
+
+
+@pytest.mark.asyncio
+async def test_send_many_raises_by_default():
+    client = EchoClient()
+
+    with pytest.raises(RuntimeError):
+        async for _ in client.send_many(_conversations("fail", "ok")):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_send_many_retrieves_every_failure():
+    unretrieved = []
+    asyncio.get_running_loop().set_exception_handler(
+        lambda loop, context: unretrieved.append(context["message"])
+    )
+    client = EchoClient()
+
+    with pytest.raises(RuntimeError):
+        async for _ in client.send_many(_conversations("fail", "fail", "fail", "ok")):
+            pass
+    gc.collect()
+    await asyncio.sleep(0)
+
+    assert unretrieved == []
+
+
+@pytest.mark.asyncio
+async def test_send_many_applies_rate_limit():
+    client = EchoClient(delay=0)
+    start = time.monotonic()
+
+    results = [
+        r
+        async for r in client.send_many(
+            _conversations(*["x"] * 6), rate_limit=TokenBucket(rate=50, capacity=1)
+        )
+    ]
+
+    assert len(results) == 6
+    # The first token is available immediately, the next five take 20ms each
+    assert time.monotonic() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_initial_burst():
+    bucket = TokenBucket(rate=1, capacity=5)
+    start = time.monotonic()
+
+    for _ in range(5):
+        await bucket.acquire()
+
+    assert time.monotonic() - start < 0.05
+    with pytest.raises(ValueError):
+        await bucket.acquire(tokens=6)
@@ -0,0 +1,318 @@
+import io
+import json
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ClassVar
+
+import openai
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import ANY, Stubber
+
+from shz_llm_client import (
+    AnthropicBedrockClient,
+    BatchRequest,
+    OpenAIClient,
+    RequestMessage,
+)
+from shz_llm_client.batch import BedrockBatchJob, OpenAIBatchJob
+
+
+def _requests():
+    return [
+        BatchRequest(
+            custom_id=f"req-{idx}",
+            messages=[RequestMessage(role="user", content=f"question {idx}")],
+            system_prompt=RequestMessage(role="system", content="Be brief."),
+        )
+        for idx in range(3)
+    ]
+
+
+class FakeOpenAIBatchServer(BaseHTTPRequestHandler):
+    """Minimal stand-in for the OpenAI files + batches endpoints"""
+
+    files: ClassVar[dict[str, bytes]] = {}
+    batches: ClassVar[dict[str, dict]] = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+
+        if self.path == "/v1/files":
+            message = BytesParser().parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+            )
+            content = next(
+                part.get_payload(decode=True)
+                for part in message.get_payload()
+                if part.get_param("name", header="content-disposition") == "file"
+            )
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+            self._send_json(
+                {
+                    "id": file_id,
+                    "object": "file",
+                    "bytes": len(content),
+                    "created_at": 0,
+                    "filename": "batch.jsonl",
+                    "purpose": "batch",
+                    "status": "processed",
+                }
+            )
+        elif self.path == "/v1/batches":
+            request = json.loads(body)
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": request["endpoint"],
+                "input_file_id": request["input_file_id"],
+                "completion_window": request["completion_window"],
+                "created_at": 0,
+                "status": "validating",
+            }
+            self._send_json(self.batches[batch_id])
+        else:
+            self.send_error(404)
+
+    def _complete(self, batch: dict):
+        """Answer every request by echoing its last message"""
+        output_lines = []
+        for line in self.files[batch["input_file_id"]].decode().splitlines():
+            record = json.loads(line)
+            messages = record["body"]["messages"]
+            output_lines.append(
+                json.dumps(
+                    {
+                        "id": "resp",
+                        "custom_id": record["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": {
+                                "id": "chatcmpl",
+                                "object": "chat.completion",
+                                "created": 0,
+                                "model": record["body"]["model"],
+                                "choices": [
+                                    {
+                                        "index": 0,
+                                        "finish_reason": "stop",
+                                        "message": {
+                                            "role": "assistant",
+                                            "content": messages[-1]["content"],
+                                        },
+                                    }
+                                ],
+                            },
+                        },
+                        "error": None,
+                    }
+                )
+            )
+        output_id = f"file-{len(self.files)}"
+        self.files[output_id] = "\n".join(output_lines).encode()
+        batch.update(status="completed", output_file_id=output_id)
+
+    def do_GET(self):
+        if self.path.startswith("/v1/batches/"):
+            batch = self.batches[self.path.rsplit("/", 1)[-1]]
+            if batch["status"] == "validating":
+                batch["status"] = "in_progress"
+            elif batch["status"] == "in_progress":
+                self._complete(batch)
+            self._send_json(batch)
+        elif self.path.startswith("/v1/files/") and self.path.endswith("/content"):
+            content = self.files[self.path.split("/")[3]]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture
+def fake_openai_url():
+    FakeOpenAIBatchServer.files = {}
+    FakeOpenAIBatchServer.batches = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIBatchServer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+def test_openai_batch_jsonl_reuses_client_payload():
+    client = OpenAIClient(api_key="fake-key", model_id="gpt-4o-mini", stream=True)
+    job = OpenAIBatchJob(client)
+
+    lines = [json.loads(line) for line in job.build_jsonl(_requests()).splitlines()]
+
+    assert [line["custom_id"] for line in lines] == ["req-0", "req-1", "req-2"]
+    body = lines[0]["body"]
+    assert body["model"] == "gpt-4o-mini"
+    assert body["messages"][0]["role"] == "system"
+    assert body["messages"][0]["content"] == "Be brief."
+    assert "stream" not in body and "stream_options" not in body
+
+
+def test_openai_batch_sends_prompt_cache_key_in_the_body():
+    client = OpenAIClient(api_key="fake-key", prompt_cache_key="support-bot")
+    job = OpenAIBatchJob(client)
+
+    body = json.loads(job.build_jsonl(_requests()).splitlines()[0])["body"]
+
+    assert body["prompt_cache_key"] == "support-bot"
+    assert "extra_body" not in body
+
+
+def test_openai_batch_rejects_duplicated_ids():
+    job = OpenAIBatchJob(OpenAIClient(api_key="fake-key"))
+    requests = _requests()
+    requests[1].custom_id = requests[0].custom_id
+
+    with pytest.raises(ValueError):
+        job.build_jsonl(requests)
+
+
+def test_openai_batch_round_trip(fake_openai_url):
+    client = OpenAIClient(api_key="fake-key", model_id="gpt-4o-mini")
+    client.client = openai.OpenAI(api_key="fake-key", base_url=fake_openai_url)
+    job = OpenAIBatchJob(client, poll_interval=0)
+
+    results = {result.custom_id: result for result in job.run(_requests(), timeout=5)}
+
+    assert set(results) == {"req-0", "req-1", "req-2"}
+    assert results["req-2"].content == "question 2"
+    assert results["req-2"].error is None
+
+
+def test_bedrock_batch_round_trip():
+    client = AnthropicBedrockClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0", aws_region="us-east-1"
+    )
+    job_arn = "arn:aws:bedrock:us-east-1:123456789012:model-invocation-job/abc123"
+
+    import boto3
+
+    bedrock = boto3.client(
+        "bedrock",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    s3 = boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    job = BedrockBatchJob(
+        client,
+        role_arn="arn:aws:iam::123456789012:role/batch",
+        input_s3_uri="s3://bucket/input/",
+        output_s3_uri="s3://bucket/output",
+        poll_interval=0,
+        bedrock_client=bedrock,
+        s3_client=s3,
+    )
+
+    output = "\n".join(
+        [
+            json.dumps(
+                {
+                    "recordId": "req-0",
+                    "modelInput": {},
+                    "modelOutput": {"content": [{"type": "text", "text": "answer 0"}]},
+                }
+            ),
+            json.dumps(
+                {
+                    "recordId": "req-1",
+                    "modelInput": {},
+                    "error": {"errorCode": 400, "errorMessage": "bad request"},
+                }
+            ),
+        ]
+    ).encode()
+
+    with Stubber(bedrock) as bedrock_stub, Stubber(s3) as s3_stub:
+        s3_stub.add_response(
+            "put_object", {}, {"Bucket": "bucket", "Key": ANY, "Body": ANY}
+        )
+        bedrock_stub.add_response(
+            "create_model_invocation_job",
+            {"jobArn": job_arn},
+            {
+                "jobName": ANY,
+                "roleArn": "arn:aws:iam::123456789012:role/batch",
+                "modelId": "anthropic.claude-3-haiku-20240307-v1:0",
+                "inputDataConfig": ANY,
+                "outputDataConfig": {
+                    "s3OutputDataConfig": {"s3Uri": "s3://bucket/output"}
+                },
+            },
+        )
+        for status in ["InProgress", "Completed"]:
+            bedrock_stub.add_response(
+                "get_model_invocation_job",
+                {
+                    "jobArn": job_arn,
+                    "modelId": "anthropic.claude-3-haiku-20240307-v1:0",
+                    "roleArn": "arn:aws:iam::123456789012:role/batch",
+                    "submitTime": "2024-01-01T00:00:00Z",
+                    "status": status,
+                    "inputDataConfig": {"s3InputDataConfig": {"s3Uri": "s3://x/y"}},
+                    "outputDataConfig": {"s3OutputDataConfig": {"s3Uri": "s3://x/z"}},
+                },
+                {"jobIdentifier": job_arn},
+            )
+        s3_stub.add_response(
+            "get_object",
+            {"Body": StreamingBody(io.BytesIO(output), len(output))},
+            {"Bucket": "bucket", "Key": ANY},
+        )
+
+        results = list(job.run(_requests()))
+
+        input_file = job._input_files[job_arn]
+        assert input_file.startswith("shz-llm-batch-")
+
+    assert results[0].custom_id == "req-0"
+    assert results[0].content == "answer 0"
+    assert results[1].custom_id == "req-1"
+    assert "bad request" in results[1].error
+
+
+def test_bedrock_batch_jsonl_reuses_client_payload():
+    client = AnthropicBedrockClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0", aws_region="us-east-1"
+    )
+    job = BedrockBatchJob(
+        client,
+        role_arn="arn:aws:iam::123456789012:role/batch",
+        input_s3_uri="s3://bucket/input",
+        output_s3_uri="s3://bucket/output",
+        bedrock_client=object(),
+        s3_client=object(),
+    )
+
+    record = json.loads(job.build_jsonl(_requests()[:1]))
+
+    assert record["recordId"] == "req-0"
+    assert record["modelInput"]["system"] == "Be brief."
+    assert record["modelInput"]["anthropic_version"] == "bedrock-2023-05-31"
@@ -0,0 +1,98 @@
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from shz_llm_client import (
+    AnthropicBedrockClient,
+    Base64ImageItem,
+    Conversation,
+    GoogleClient,
+    OpenAIClient,
+    PerplexityClient,
+    RequestMessage,
+)
+
+
+def _b64_png() -> str:
+    image_io = BytesIO()
+    Image.new("RGB", (4, 4), color="red").save(image_io, format="PNG")
+    return base64.b64encode(image_io.getvalue()).decode()
+
+
+def _history(with_image=False):
+    b64_images = [Base64ImageItem(b64_string=_b64_png(), image_type="png")]
+    return [
+        RequestMessage(
+            role="user", content="first", b64_images=b64_images if with_image else []
+        ),
+        RequestMessage(role="assistant", content="reply"),
+        RequestMessage(role="user", content="second"),
+    ]
+
+
+CLIENT_FACTORIES = {
+    "openai": lambda: OpenAIClient(api_key="fake-key"),
+    "perplexity": lambda: PerplexityClient(api_key="fake-key"),
+    "bedrock": lambda: AnthropicBedrockClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0"
+    ),
+    "google": lambda: GoogleClient(api_key="fake-key"),
+}
+
+
+@pytest.mark.parametrize("vendor", list(CLIENT_FACTORIES))
+@pytest.mark.parametrize("with_image", [False, True])
+def test_conversation_payload_matches_list_payload(vendor, with_image):
+    client = CLIENT_FACTORIES[vendor]()
+    system_prompt = RequestMessage(role="system", content="Be brief.")
+    history = _history(with_image)
+    conversation = Conversation(history[:1])
+
+    # Format a prefix first, so the second call only formats the tail
+    client._build_payload(conversation, system_prompt)
+    conversation.extend(history[1:])
+
+    from_list = client._build_payload(list(history), system_prompt)
+    from_conversation = client._build_payload(conversation, system_prompt)
+
+    assert from_conversation == from_list
+
+
+def test_conversation_only_formats_new_messages():
+    conversation = Conversation()
+    formatted_messages = []
+
+    def format_message(message):
+        formatted_messages.append(message.content)
+        return message.content
+
+    for idx in range(3):
+        conversation.append(RequestMessage(role="user", content=str(idx)))
+        assert conversation.formatted("key", format_message) == [
+            str(i) for i in range(idx + 1)
+        ]
+
+    assert formatted_messages == ["0", "1", "2"]
+
+
+def test_perplexity_system_prompt_does_not_leak_into_cached_prefix():
+    client = PerplexityClient(api_key="fake-key")
+    conversation = Conversation([RequestMessage(role="user", content="hi")])
+    system_prompt = RequestMessage(role="system", content="Be brief.")
+
+    client._build_payload(conversation, system_prompt)
+    payload = client._build_payload(conversation, system_prompt)
+
+    assert payload["messages"] == [{"role": "user", "content": "Be brief.\nhi"}]
+
+
+def test_conversation_behaves_like_a_message_list():
+    history = _history()
+    conversation = Conversation(history)
+
+    assert len(conversation) == 3
+    assert conversation[-1] is history[-1]
+    assert list(conversation) == history
+    assert conversation.messages == history
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from shz_llm_client import (
+    AnthropicBedrockClient,
+    GoogleClient,
+    LLMClientFactory,
+    OpenAIClient,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    LLMClientFactory.shutdown()
+    yield
+    LLMClientFactory.shutdown()
+
+
+def test_create_client_builds_each_vendor():
+    openai_client = LLMClientFactory.create_client("OpenAI", "gpt-4o-mini", "key")
+    bedrock_client = LLMClientFactory.create_client(
+        "anthropic", "anthropic.claude-3-haiku-20240307-v1:0", max_tokens=10
+    )
+
+    assert isinstance(openai_client, OpenAIClient)
+    assert isinstance(bedrock_client, AnthropicBedrockClient)
+    assert bedrock_client._max_tokens == 10
+    assert LLMClientFactory.create_client("openai", "gpt-4o-mini", "key") is not (
+        openai_client
+    )
+
+
+def test_unknown_vendor_raises():
+    with pytest.raises(ValueError):
+        LLMClientFactory.create_client("acme", "model", "key")
+
+
+def test_get_client_reuses_clients_per_arguments():
+    client = LLMClientFactory.get_client("openai", "gpt-4o-mini", "key", stream=True)
+
+    assert (
+        LLMClientFactory.get_client("openai", "gpt-4o-mini", "key", stream=True)
+        is client
+    )
+    assert LLMClientFactory.get_client("openai", "gpt-4o-mini", "key") is not client
+    assert LLMClientFactory.get_client("openai", "gpt-4o-mini", "other") is not client
+    assert LLMClientFactory.stats().size == 3
+
+
+def test_evict_and_shutdown_drop_clients():
+    client = LLMClientFactory.get_client("google", "gemini-1.5-flash", "key")
+    assert isinstance(client, GoogleClient)
+
+    assert LLMClientFactory.evict("google", "gemini-1.5-flash", "key") is client
+    assert (
+        LLMClientFactory.get_client("google", "gemini-1.5-flash", "key") is not client
+    )
+
+    LLMClientFactory.shutdown()
+    assert LLMClientFactory.stats().size == 0
+
+
+@pytest.mark.asyncio
+async def test_ashutdown_closes_async_clients():
+    client = LLMClientFactory.get_client(
+        "bedrock", "anthropic.claude-3-haiku-20240307-v1:0"
+    )
+    await client._get_async_client()
+
+    await LLMClientFactory.ashutdown()
+
+    assert client._async_client is None
+    assert LLMClientFactory.stats().size == 0
+
+
+@pytest.fixture
+def small_registry(monkeypatch):
+    monkeypatch.setattr(LLMClientFactory._registry, "maxsize", 1)
+
+
+def _bedrock(max_tokens):
+    return LLMClientFactory.get_client(
+        "bedrock", "anthropic.claude-3-haiku-20240307-v1:0", max_tokens=max_tokens
+    )
+
+
+@pytest.mark.asyncio
+async def test_evicted_clients_are_closed(small_registry):
+    evicted = _bedrock(10)
+    await evicted._get_async_client()
+
+    _bedrock(20)
+    await asyncio.sleep(0)
+
+    assert evicted._async_client is None
+    assert LLMClientFactory.stats().size == 1
+
+
+@pytest.mark.asyncio
+async def test_clients_evicted_outside_a_loop_are_closed_on_ashutdown(
+    small_registry,
+):
+    evicted = _bedrock(10)
+    await evicted._get_async_client()
+
+    # Evicted from a thread without an event loop
+    await asyncio.to_thread(_bedrock, 20)
+    assert evicted._async_client is not None
+
+    await LLMClientFactory.ashutdown()
+    assert evicted._async_client is None
@@ -158,3 +158,69 @@ async def test_async_stream_response():
     assert last_resp["type"] == "stop"
     for k in ["input_tokens", "output_tokens", "total_tokens", "type"]:
         assert k in last_resp
+
+
+def test_system_prompt_models_are_cached():
+    client = GoogleClient(api_key="fake-key", model_cache_size=2)
+
+    first = client._get_client_with_sys_prompt("You are a helpful assistant.")
+    second = client._get_client_with_sys_prompt("You are a helpful assistant.")
+    other = client._get_client_with_sys_prompt("You are a pirate.")
+
+    assert first is second
+    assert other is not first
+    stats = client.model_cache_stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 2)
+
+
+def test_system_prompt_model_cache_is_keyed_by_model_id():
+    client = GoogleClient(api_key="fake-key")
+    flash = client._get_client_with_sys_prompt("You are a helpful assistant.")
+
+    client.model_id = "gemini-1.5-pro"
+    pro = client._get_client_with_sys_prompt("You are a helpful assistant.")
+
+    assert flash is not pro
+    assert pro.model_name == "models/gemini-1.5-pro"
+
+
+def test_images_are_sent_as_inline_blobs():
+    client = GoogleClient(api_key="fake-key")
+    image_item = Base64ImageItem(b64_string="aGVsbG8=", image_type="jpg")
+    messages = [
+        RequestMessage(role="user", content="What is this?", b64_images=[image_item])
+    ]
+
+    payload = client._build_payload(messages, None)
+
+    assert payload["contents"] == [
+        "user: What is this?",
+        {"mime_type": "image/jpeg", "data": b"hello"},
+    ]
+
+
+def test_decoded_images_are_shared_across_messages_and_clients():
+    b64_string = "d29ybGQ="
+    first = GoogleClient._image_blob(
+        Base64ImageItem(b64_string=b64_string, image_type="png")
+    )
+    # An equal string in a new object, as loaded again from a database
+    loaded = "".join(["d29y", "bGQ="])  # noqa: FLY002
+    second = GoogleClient._image_blob(
+        Base64ImageItem(b64_string=loaded, image_type="png")
+    )
+
+    assert first is second
+    assert first["data"] == b"world"
+
+
+def test_image_id_collisions_are_detected():
+    first = GoogleClient._image_blob(
+        Base64ImageItem(b64_string="Zmlyc3Q=", image_type="png", image_id="same-id")
+    )
+    second = GoogleClient._image_blob(
+        Base64ImageItem(b64_string="c2Vjb25k", image_type="png", image_id="same-id")
+    )
+
+    assert first["data"] == b"first"
+    assert second["data"] == b"second"
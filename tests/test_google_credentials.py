@@ -0,0 +1,126 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from google.ai import generativelanguage as glm
+from google.generativeai import client as genai_client
+
+from shz_llm_client import GoogleClient, RequestMessage
+
+
+def _response(text: str) -> glm.GenerateContentResponse:
+    return glm.GenerateContentResponse(
+        candidates=[{"content": {"parts": [{"text": text}]}, "finish_reason": 1}],
+        usage_metadata={
+            "prompt_token_count": 1,
+            "candidates_token_count": 1,
+            "total_token_count": 2,
+        },
+    )
+
+
+def _api_key(service_client) -> str:
+    return service_client._transport._credentials.token
+
+
+@pytest.fixture
+def echo_api_key(monkeypatch):
+    """Answer every Gemini request with the API key it was sent with"""
+
+    def generate_content(self, request, **kwargs):
+        return _response(_api_key(self))
+
+    async def async_generate_content(self, request, **kwargs):
+        await asyncio.sleep(0)
+        return _response(_api_key(self._client))
+
+    monkeypatch.setattr(
+        glm.GenerativeServiceClient, "generate_content", generate_content
+    )
+    monkeypatch.setattr(
+        glm.GenerativeServiceAsyncClient, "generate_content", async_generate_content
+    )
+
+
+def _send(client: GoogleClient, system_prompt: str | None = None) -> str:
+    system = (
+        RequestMessage(role="system", content=system_prompt) if system_prompt else None
+    )
+    return client.send([RequestMessage(role="user", content="hi")], system)
+
+
+def test_clients_keep_their_own_keys_across_threads(echo_api_key):
+    tenants = {key: GoogleClient(api_key=key) for key in ("key-a", "key-b", "key-c")}
+    jobs = [(key, prompt) for key in tenants for prompt in (None, "Be brief.")] * 20
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(
+            pool.map(lambda job: (job[0], _send(tenants[job[0]], job[1])), jobs)
+        )
+
+    assert all(key == response for key, response in results)
+
+
+def test_clients_do_not_touch_the_global_configuration(echo_api_key):
+    genai_client._client_manager.clients.clear()
+
+    GoogleClient(api_key="key-a")
+    GoogleClient(api_key="key-b")
+
+    assert genai_client._client_manager.clients == {}
+
+
+@pytest.mark.asyncio
+async def test_async_clients_keep_their_own_keys(echo_api_key):
+    first, second = GoogleClient(api_key="key-a"), GoogleClient(api_key="key-b")
+    messages = [RequestMessage(role="user", content="hi")]
+
+    async def send(client):
+        return [r async for r in client.async_send(messages, None)][-1]
+
+    results = await asyncio.gather(*(send(c) for c in [first, second] * 10))
+
+    assert results == ["key-a", "key-b"] * 10
+
+
+def test_construction_does_not_create_service_clients(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("service client created eagerly")
+
+    monkeypatch.setattr(glm, "GenerativeServiceClient", fail)
+
+    client = GoogleClient(api_key=None)
+
+    assert client._sync_service_client is None
+
+
+def test_one_client_serves_several_event_loops(monkeypatch):
+    async def async_generate_content(self, request, **kwargs):
+        await asyncio.sleep(0.01)
+        return _response(str(id(self)))
+
+    monkeypatch.setattr(
+        glm.GenerativeServiceAsyncClient, "generate_content", async_generate_content
+    )
+    client = GoogleClient(api_key="key-a")
+    system = RequestMessage(role="system", content="Be brief.")
+    messages = [RequestMessage(role="user", content="hi")]
+
+    async def send_many():
+        responses = await asyncio.gather(
+            *(_async_send(client, messages, system) for _ in range(10))
+        )
+        service_client = client._async_service_clients[asyncio.get_running_loop()]
+        return responses, str(id(service_client))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: asyncio.run(send_many()), range(4)))
+
+    for responses, service_client_id in results:
+        assert responses == [service_client_id] * 10
+    # Cached models are copied per request, never bound themselves
+    assert all(model._async_client is None for model in client._model_cache.values())
+
+
+async def _async_send(client, messages, system):
+    return [r async for r in client.async_send(messages, system)][-1]
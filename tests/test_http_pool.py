@@ -0,0 +1,56 @@
+import asyncio
+
+from shz_llm_client import OpenAIClient, PerplexityClient
+from shz_llm_client.http_pool import HTTPPoolConfig, close_openai_clients
+
+
+def test_sdk_clients_are_created_lazily():
+    client = OpenAIClient(api_key="lazy-key")
+
+    assert client._client is None and client._async_client is None
+    assert client.client is client.client
+
+
+def test_clients_with_same_key_share_the_pool():
+    first, second = (
+        OpenAIClient(api_key="shared-key"),
+        OpenAIClient(api_key="shared-key"),
+    )
+    other_key = OpenAIClient(api_key="other-key")
+    perplexity = PerplexityClient(api_key="shared-key")
+
+    assert first.client is second.client
+    assert first.client is not other_key.client
+    assert first.client is not perplexity.client
+    assert str(perplexity.client.base_url).startswith("https://api.perplexity.ai")
+
+
+def test_pool_settings_are_applied():
+    pool = HTTPPoolConfig(timeout=30.0, connect_timeout=2.0)
+    client = OpenAIClient(api_key="pool-key", http_pool=pool)
+
+    assert client.client is not OpenAIClient(api_key="pool-key").client
+    assert client.client.timeout.read == 30.0
+    assert client.client.timeout.connect == 2.0
+
+
+def test_async_clients_are_shared_per_event_loop():
+    client, other = OpenAIClient(api_key="async-key"), OpenAIClient(api_key="async-key")
+
+    async def sdk_clients():
+        return client.async_client, other.async_client
+
+    first_loop = asyncio.run(sdk_clients())
+    second_loop = asyncio.run(sdk_clients())
+
+    assert first_loop[0] is first_loop[1]
+    assert first_loop[0] is not second_loop[0]
+
+
+def test_close_forgets_shared_clients():
+    client = OpenAIClient(api_key="closed-key")
+    sdk_client = client.client
+
+    close_openai_clients()
+
+    assert OpenAIClient(api_key="closed-key").client is not sdk_client
@@ -0,0 +1,111 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from shz_llm_client import Base64ImageItem, ImageCache
+from shz_llm_client.image_cache import image_cache_key, image_data_url
+from shz_llm_client.vision import async_prepare_images, load_image_item, prepare_images
+
+IMAGE_PATH = "./tests/images/vanGoh.jpg"
+
+
+def _large_png_bytes(color="green") -> bytes:
+    image_io = BytesIO()
+    Image.new("RGB", (4000, 3000), color=color).save(image_io, format="PNG")
+    return image_io.getvalue()
+
+
+def test_cache_key_depends_on_bytes_and_limits():
+    data = b"image bytes"
+
+    assert image_cache_key(data, 768, 2000) == image_cache_key(data, 768, 2000)
+    assert image_cache_key(data, 768, 2000) != image_cache_key(data, 1568, 1568)
+    assert image_cache_key(data, 768, 2000) != image_cache_key(b"other", 768, 2000)
+
+
+def test_load_image_item_reuses_cached_item(mocker):
+    cache = ImageCache()
+    first = load_image_item(IMAGE_PATH, 600, 650, cache=cache)
+
+    resize = mocker.patch("shz_llm_client.vision._resize")
+    second = load_image_item(IMAGE_PATH, 600, 650, image_id="img-1", cache=cache)
+
+    resize.assert_not_called()
+    assert second.b64_string is first.b64_string
+    assert second.image_name == "vanGoh.jpg"
+    assert second.image_id == "img-1"
+    assert cache.stats.hits == 1
+
+
+def test_disk_store_is_shared_between_caches(tmp_path):
+    item = load_image_item(IMAGE_PATH, 600, 650, cache=ImageCache(directory=tmp_path))
+
+    # A new cache on the same directory stands in for another process
+    other = ImageCache(directory=tmp_path)
+    with open(IMAGE_PATH, "rb") as file:
+        key = image_cache_key(file.read(), 600, 650)
+
+    cached = other.get(key)
+    assert cached.b64_string == item.b64_string
+    assert cached.image_type == item.image_type
+
+
+def test_disk_store_ignores_corrupt_entries(tmp_path):
+    cache = ImageCache(directory=tmp_path)
+    key = image_cache_key(b"data", None, None)
+    cache.put(key, Base64ImageItem(b64_string="aGk=", image_type="png"))
+
+    with open(cache._path(key), "w") as f:
+        f.write("{not json")
+
+    assert ImageCache(directory=tmp_path).get(key) is None
+
+
+def test_prepare_images_only_processes_misses(mocker):
+    cache = ImageCache()
+    executor = ThreadPoolExecutor(max_workers=2)
+    blue, red = _large_png_bytes("blue"), _large_png_bytes("red")
+    prepare_images([blue], vendor="openai", executor=executor, cache=cache)
+
+    submit = mocker.spy(executor, "submit")
+    image_items = prepare_images(
+        [blue, red, red, IMAGE_PATH], vendor="openai", executor=executor, cache=cache
+    )
+
+    # The blue image is a hit and the duplicate red image is prepared once
+    assert submit.call_count == 2
+    assert image_items[1].b64_string is image_items[2].b64_string
+    assert image_items[3].image_name == "vanGoh.jpg"
+    sizes = [
+        Image.open(BytesIO(base64.b64decode(item.b64_string))).size
+        for item in image_items
+    ]
+    assert sizes == [(1024, 768), (1024, 768), (1024, 768), (750, 977)]
+
+
+@pytest.mark.asyncio
+async def test_async_prepare_images_matches_sync_with_cache():
+    cache = ImageCache()
+    sources = [_large_png_bytes(), IMAGE_PATH]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        expected = prepare_images(sources, executor=executor)
+        image_items = await async_prepare_images(
+            sources, executor=executor, cache=cache
+        )
+        again = await async_prepare_images(sources, executor=executor, cache=cache)
+
+    assert image_items == expected
+    assert again == expected
+    assert cache.stats.hits == 2
+
+
+def test_image_data_url():
+    b64_string = base64.b64encode(b"pixels").decode()
+    image_item = Base64ImageItem(b64_string=b64_string, image_type="png")
+
+    data_url = image_data_url(image_item)
+    assert data_url == f"data:image/png;base64,{b64_string}"
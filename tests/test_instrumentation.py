@@ -0,0 +1,132 @@
+import pytest
+
+from shz_llm_client import ClientObserver
+from shz_llm_client.response_cache import InMemoryResponseCache
+from tests.conftest import FakeClient, user_messages
+
+
+def _client(stream=False):
+    return FakeClient(
+        stream=stream, model_id="timed", input_tokens=1, chunk_delay=0.005
+    )
+
+
+class RecordingObserver(ClientObserver):
+    def __init__(self):
+        self.calls = []
+        self.traces = []
+        self.intervals = []
+
+    def on_request_start(self, trace):
+        self.calls.append("start")
+
+    def on_payload_built(self, trace):
+        self.calls.append("payload")
+
+    def on_response(self, trace):
+        self.calls.append("response")
+
+    def on_first_token(self, trace):
+        self.calls.append("first_token")
+
+    def on_chunk(self, trace, event, interval):
+        self.intervals.append(interval)
+
+    def on_request_end(self, trace):
+        self.calls.append("end")
+        self.traces.append(trace)
+
+
+@pytest.mark.asyncio
+async def test_async_stream_trace():
+    client = _client(stream=True)
+    observer = RecordingObserver()
+    client.observers.append(observer)
+
+    events = [event async for event in client.async_send(user_messages(), None)]
+
+    assert len(events) == 6
+    assert observer.calls == ["start", "payload", "response", "first_token", "end"]
+    (trace,) = observer.traces
+    assert trace.chunks == 6
+    assert (trace.input_tokens, trace.output_tokens, trace.total_tokens) == (1, 5, 6)
+    assert trace.time_to_first_token >= trace.connect_time >= 0.005
+    assert trace.tokens_per_second > 0
+    assert all(interval >= 0.004 for interval in observer.intervals)
+    assert trace.error is None
+
+
+def test_sync_stream_trace_ends_with_the_stream():
+    client = _client(stream=True)
+    observer = RecordingObserver()
+    client.observers.append(observer)
+
+    stream = client.send(user_messages(), None)
+    assert observer.traces == []
+
+    list(stream)
+    (trace,) = observer.traces
+    assert trace.stream and trace.chunks == 6 and trace.output_tokens == 5
+
+
+def test_non_stream_trace_and_errors():
+    client = _client()
+    observer = RecordingObserver()
+    client.observers.append(observer)
+
+    assert client.send(user_messages(), None) == "hello"
+    with pytest.raises(RuntimeError):
+        client.send(user_messages("fail"), None)
+
+    ok, failed = observer.traces
+    assert ok.error is None and ok.generation_time is not None
+    assert isinstance(failed.error, RuntimeError)
+    assert failed.response_at is None
+
+
+def test_cache_hits_are_traced():
+    client = _client()
+    client.response_cache = InMemoryResponseCache()
+    observer = RecordingObserver()
+    client.observers.append(observer)
+
+    client.send(user_messages(), None)
+    client.send(user_messages(), None)
+
+    assert [trace.cached for trace in observer.traces] == [False, True]
+
+
+def test_failing_observer_does_not_fail_the_request(caplog):
+    class FailingObserver(ClientObserver):
+        def on_payload_built(self, trace):
+            raise ValueError("observer bug")
+
+    client = _client()
+    client.observers.append(FailingObserver())
+
+    assert client.send(user_messages(), None) == "hello"
+    assert "observer bug" in caplog.text
+
+
+def test_opentelemetry_observer_records_spans():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    from shz_llm_client.instrumentation import OpenTelemetryObserver
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    client = _client(stream=True)
+    client.observers.append(OpenTelemetryObserver(provider.get_tracer("test")))
+    list(client.send(user_messages(), None))
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "chat timed"
+    assert span.attributes["gen_ai.usage.output_tokens"] == 5
+    assert [event.name for event in span.events] == ["first_token"]
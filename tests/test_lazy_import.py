@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+import pytest
+
+VENDOR_MODULES = ["openai", "boto3", "aioboto3", "google.generativeai", "PIL"]
+
+
+def _loaded_vendor_modules(statement: str) -> list[str]:
+    probe = (
+        f"import sys\n{statement}\n"
+        f"print(','.join(m for m in {VENDOR_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", probe], text=True)
+    return [m for m in output.strip().split(",") if m]
+
+
+def test_package_import_does_not_load_vendor_sdks():
+    assert _loaded_vendor_modules("import shz_llm_client") == []
+
+
+def test_schemas_are_available_eagerly():
+    assert (
+        _loaded_vendor_modules(
+            "from shz_llm_client import BaseLLMClient, RequestMessage, Base64ImageItem"
+        )
+        == []
+    )
+
+
+def test_client_attribute_loads_only_its_vendor():
+    pytest.importorskip("openai")
+    loaded = _loaded_vendor_modules("from shz_llm_client import OpenAIClient")
+    assert "openai" in loaded
+    assert "google.generativeai" not in loaded
+    assert "aioboto3" not in loaded
+
+
+def test_lazy_attribute_resolves_to_module_object():
+    pytest.importorskip("openai")
+    import shz_llm_client
+    from shz_llm_client.openai_client import OpenAIClient
+
+    assert shz_llm_client.OpenAIClient is OpenAIClient
+    assert "OpenAIClient" in dir(shz_llm_client)
+
+
+def test_unknown_attribute_raises_attribute_error():
+    import shz_llm_client
+
+    with pytest.raises(AttributeError):
+        _ = shz_llm_client.NotAClient
@@ -0,0 +1,86 @@
+import pytest
+
+from shz_llm_client.lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    # Touch "a" so "b" becomes the eviction candidate
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.stats.evictions == 1
+
+
+def test_entries_expire_after_ttl(mocker):
+    clock = mocker.patch("shz_llm_client.lru_cache.time.monotonic", return_value=100.0)
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.put("a", 1)
+
+    clock.return_value = 109.0
+    assert cache.get("a") == 1
+
+    clock.return_value = 111.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_get_or_create_counts_hits_and_misses():
+    cache = LRUCache(maxsize=4)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    first = cache.get_or_create("key", factory)
+    second = cache.get_or_create("key", factory)
+
+    assert first is second
+    assert len(calls) == 1
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+
+def test_rejects_non_positive_maxsize():
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
+
+
+def test_weight_bound_evicts_until_under_max_weight():
+    cache = LRUCache(maxsize=10, max_weight=10, weigher=len)
+    cache.put("a", b"12345")
+    cache.put("b", b"1234")
+    cache.put("c", b"123")
+
+    assert "a" not in cache
+    assert cache.weight == 7
+
+    # Values heavier than the whole cache are not stored
+    cache.put("d", b"x" * 11)
+    assert "d" not in cache
+    assert cache.weight == 7
+
+    cache.pop("b")
+    assert cache.weight == 3
+
+
+def test_on_evict_sees_evicted_entries_only(mocker):
+    clock = mocker.patch("shz_llm_client.lru_cache.time.monotonic", return_value=100.0)
+    evicted = []
+    cache = LRUCache(maxsize=2, ttl=10, on_evict=lambda k, v: evicted.append((k, v)))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    cache.pop("b")
+
+    clock.return_value = 111.0
+    assert cache.get("c") is None
+
+    assert evicted == [("a", 1), ("c", 3)]
@@ -217,3 +217,73 @@ async def test_multi_client_async_send():
             client_message_hisotry[client].append(
                 RequestMessage(role="assistant", content=response)
             )
+
+
+def test_build_payload_does_not_mutate_history():
+    client = OpenAIClient(api_key="fake-key")
+    system_prompt = RequestMessage(role="system", content="You are helpful.")
+    history = [RequestMessage(role="user", content="hi")]
+
+    for _ in range(3):
+        payload = client._build_payload(history, system_prompt)
+
+    assert len(history) == 1
+    assert payload["messages"] == [
+        {"role": "system", "content": "You are helpful."},
+        {"role": "user", "content": "hi"},
+    ]
+
+
+def _image_message(content):
+    image_item = Base64ImageItem(b64_string="aGVsbG8=", image_type="jpg")
+    return RequestMessage(role="user", content=content, b64_images=[image_item])
+
+
+def test_build_payload_reuses_formatted_image_messages():
+    client = OpenAIClient(api_key="fake-key")
+    history = [_image_message(str(idx)) for idx in range(3)]
+
+    first = client._build_payload(history)["messages"]
+    history.append(RequestMessage(role="assistant", content="3"))
+    second = client._build_payload(history)["messages"]
+
+    assert all(a is b for a, b in zip(first, second))
+    assert second[-1] == {"role": "assistant", "content": "3"}
+
+
+def test_build_payload_reformats_changed_messages():
+    client = OpenAIClient(api_key="fake-key")
+    message = _image_message("before")
+    client._build_payload([message])
+
+    message.content = "after"
+
+    (formatted,) = client._build_payload([message])["messages"]
+    assert formatted["content"][0] == {"type": "text", "text": "after"}
+
+
+def test_formatted_messages_are_released_with_the_message():
+    client = OpenAIClient(api_key="fake-key")
+    message = _image_message("temporary")
+    client._build_payload([message])
+    assert len(client._message_format_cache) == 1
+
+    del message
+
+    assert len(client._message_format_cache) == 0
+
+
+def test_build_payload_formats_images():
+    client = OpenAIClient(api_key="fake-key")
+    image_item = Base64ImageItem(b64_string="aGVsbG8=", image_type="jpg")
+    message = RequestMessage(role="user", content="what?", b64_images=[image_item])
+
+    (formatted,) = client._build_payload([message])["messages"]
+
+    assert formatted["content"] == [
+        {"type": "text", "text": "what?"},
+        {
+            "type": "image_url",
+            "image_url": {"url": "data:image/jpeg;base64,aGVsbG8="},
+        },
+    ]
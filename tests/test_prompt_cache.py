@@ -0,0 +1,209 @@
+import json
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from shz_llm_client import (
+    AnthropicBedrockClient,
+    Conversation,
+    OpenAIClient,
+    RequestMessage,
+)
+from shz_llm_client.openai_client import create_completion
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def _bedrock_client(stream=False):
+    return AnthropicBedrockClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0", stream=stream
+    )
+
+
+def test_bedrock_cached_system_prompt_and_message_get_breakpoints():
+    system = RequestMessage(role="system", content="Be brief.", cache_prompt=True)
+    messages = Conversation(
+        [
+            RequestMessage(role="user", content="Long document", cache_prompt=True),
+            RequestMessage(role="user", content="Question"),
+        ]
+    )
+
+    payload = _bedrock_client()._build_payload(messages, system)
+
+    assert payload["system"] == [
+        {"type": "text", "text": "Be brief.", "cache_control": EPHEMERAL}
+    ]
+    assert payload["messages"] == [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Long document", "cache_control": EPHEMERAL}
+            ],
+        },
+        {"role": "user", "content": "Question"},
+    ]
+
+
+def test_bedrock_payload_without_markers_is_unchanged():
+    system = RequestMessage(role="system", content="Be brief.")
+
+    payload = _bedrock_client()._build_payload(
+        [RequestMessage(role="user", content="Hi")], system
+    )
+
+    assert payload["system"] == "Be brief."
+    assert payload["messages"] == [{"role": "user", "content": "Hi"}]
+
+
+def test_bedrock_rejects_too_many_breakpoints():
+    system = RequestMessage(role="system", content="Be brief.", cache_prompt=True)
+    messages = [
+        RequestMessage(role="user", content=str(i), cache_prompt=True) for i in range(4)
+    ]
+
+    with pytest.raises(ValueError, match="cache breakpoints"):
+        _bedrock_client()._build_payload(messages, system)
+
+
+def test_bedrock_response_reports_cache_usage():
+    body = {
+        "content": [{"type": "text", "text": "Hi"}],
+        "stop_reason": "end_turn",
+        "usage": {
+            "input_tokens": 4,
+            "output_tokens": 1,
+            "cache_read_input_tokens": 1000,
+            "cache_creation_input_tokens": 20,
+        },
+    }
+    response = _bedrock_client()._process_response(
+        {"body": BytesIO(json.dumps(body).encode())}
+    )
+
+    assert (response.cache_read_tokens, response.cache_write_tokens) == (1000, 20)
+    assert response.total_tokens == 1025
+
+
+def test_bedrock_stream_stop_reports_cache_usage():
+    chunks = [
+        {"type": "content_block_delta", "delta": {"text": "Hi"}},
+        {
+            "type": "message_stop",
+            "amazon-bedrock-invocationMetrics": {
+                "inputTokenCount": 4,
+                "outputTokenCount": 1,
+                "cacheReadInputTokenCount": 1000,
+                "cacheWriteInputTokenCount": 0,
+            },
+        },
+    ]
+    response = {"body": [{"chunk": {"bytes": json.dumps(c).encode()}} for c in chunks]}
+
+    stop = list(_bedrock_client(stream=True)._stream_response_generator(response))[-1]
+
+    assert stop["type"] == "stop"
+    assert (stop["cache_read_tokens"], stop["cache_write_tokens"]) == (1000, 0)
+    assert stop["cache_read_tokens"] == 1000 and stop["total_tokens"] == 1005
+
+
+def test_openai_prompt_cache_key_and_stable_prefix():
+    client = OpenAIClient(api_key="fake-key", prompt_cache_key="support-bot")
+    system = RequestMessage(role="system", content="Be brief.", cache_prompt=True)
+
+    payload = client._build_payload([RequestMessage(role="user", content="Hi")], system)
+
+    assert "extra_body" not in payload
+    assert payload["messages"][0] == {"role": "system", "content": "Be brief."}
+
+
+class StrictCompletions:
+    """Completions accepting only the arguments of `create` in openai 1.45"""
+
+    def __init__(self):
+        self.requests = []
+
+    def create(
+        self,
+        *,
+        messages,
+        model,
+        temperature=None,
+        stream=None,
+        stream_options=None,
+        extra_body=None,
+    ):
+        self.requests.append(extra_body)
+        return "completion"
+
+
+def test_openai_prompt_cache_key_goes_through_create_completion():
+    client = OpenAIClient(api_key="fake-key", prompt_cache_key="support-bot")
+    completions = StrictCompletions()
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    payload = client._build_payload([RequestMessage(role="user", content="Hi")])
+
+    assert client._make_api_request(payload) == "completion"
+    assert create_completion(client, completions, payload) == "completion"
+    assert completions.requests == [{"prompt_cache_key": "support-bot"}, None]
+
+
+def _usage(cached_tokens):
+    return {
+        "prompt_tokens": 1200,
+        "completion_tokens": 1,
+        "total_tokens": 1201,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def test_openai_response_reports_cached_tokens():
+    completion = ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Hi"},
+                }
+            ],
+            "usage": _usage(1024),
+        }
+    )
+
+    response = OpenAIClient(api_key="fake-key")._process_response(completion)
+
+    assert response.cache_read_tokens == 1024 and response.cache_write_tokens is None
+
+
+def test_openai_stream_stop_reports_cached_tokens():
+    chunk = ChatCompletionChunk.model_validate(
+        {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [],
+            "usage": _usage(1024),
+        }
+    )
+
+    stop = OpenAIClient(api_key="fake-key")._process_stream_response(chunk, "stop")
+
+    assert stop["type"] == "stop" and stop["cache_read_tokens"] == 1024
+
+
+def test_usage_counter_sums_cache_tokens():
+    client = OpenAIClient(api_key="fake-key")
+
+    client.usage_counter.record(10, 1, 11, 0.1, cache_read_tokens=8)
+    client.usage_counter.record(10, 1, 11, 0.1, cache_write_tokens=10)
+
+    stats = client.usage
+    assert (stats.cache_read_tokens, stats.cache_write_tokens) == (8, 10)
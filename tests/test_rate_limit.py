@@ -0,0 +1,144 @@
+import time
+from types import SimpleNamespace
+from typing import ClassVar
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from shz_llm_client import OpenAIClient, RequestMessage
+from shz_llm_client.rate_limit import (
+    RateLimiter,
+    estimate_payload_tokens,
+    parse_reset,
+)
+
+
+def test_parse_reset_durations():
+    assert parse_reset("1s") == 1
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("20ms") == pytest.approx(0.02)
+    assert parse_reset("1h2m3.5s") == pytest.approx(3723.5)
+    assert parse_reset("soon") is None
+
+
+def test_estimate_counts_text_images_and_completion_limit():
+    text_only = {"messages": [{"role": "user", "content": "x" * 400}]}
+    with_image = {
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "x" * 400},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": "data:image/png;base64,"},
+                    },
+                ],
+            }
+        ],
+        "max_tokens": 100,
+    }
+
+    assert estimate_payload_tokens(text_only) == 100 + len("user") // 4 + 1
+    assert (
+        estimate_payload_tokens(with_image) > estimate_payload_tokens(text_only) + 100
+    )
+
+
+@pytest.mark.asyncio
+async def test_requests_queue_instead_of_failing():
+    limiter = RateLimiter(requests_per_minute=60 * 50)
+    limiter.requests.capacity = 1
+    limiter.requests.drain_to(1)
+    start = time.monotonic()
+
+    for _ in range(3):
+        await limiter.acquire()
+
+    # One request every 20ms after the first
+    assert time.monotonic() - start >= 0.035
+
+
+@pytest.mark.asyncio
+async def test_limits_are_learnt_and_lowered_from_headers():
+    limiter = RateLimiter(tokens_per_minute=1_000_000)
+
+    limiter.update_from_headers(
+        {
+            "x-ratelimit-limit-requests": "600",
+            "x-ratelimit-remaining-requests": "10",
+            "x-ratelimit-limit-tokens": "60000",
+            "x-ratelimit-remaining-tokens": "500",
+        }
+    )
+
+    assert limiter.requests.capacity == 600 and limiter.requests.available < 11
+    assert limiter.tokens.rate == 1000 and limiter.tokens.available < 600
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_pauses_until_reset():
+    limiter = RateLimiter(requests_per_minute=6000)
+
+    limiter.update_from_headers(
+        {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "50ms"}
+    )
+    start = time.monotonic()
+    await limiter.acquire()
+
+    assert time.monotonic() - start >= 0.045
+
+
+class FakeRawResponse:
+    headers: ClassVar[dict[str, str]] = {
+        "x-ratelimit-limit-requests": "120",
+        "x-ratelimit-remaining-requests": "7",
+    }
+
+    def parse(self):
+        return ChatCompletion.model_validate(
+            {
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "Hi"},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 3,
+                    "completion_tokens": 1,
+                    "total_tokens": 4,
+                },
+            }
+        )
+
+
+class FakeCompletions:
+    """Stands in for `AsyncOpenAI().chat.completions`"""
+
+    def __init__(self):
+        self.with_raw_response = self
+
+    async def create(self, **payload):
+        return FakeRawResponse()
+
+
+@pytest.mark.asyncio
+async def test_openai_client_feeds_response_headers_to_limiter():
+    client = OpenAIClient(api_key="fake-key")
+    client.async_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=FakeCompletions())
+    )
+    client.rate_limiter = RateLimiter()
+    messages = [RequestMessage(role="user", content="Hello")]
+
+    responses = [r async for r in client.async_send(messages, None)]
+
+    assert responses == ["Hi"] and responses[0].total_tokens == 4
+    assert client.rate_limiter.requests.capacity == 120
+    assert client.rate_limiter.requests.available < 8
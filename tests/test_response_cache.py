@@ -0,0 +1,109 @@
+import pytest
+
+from shz_llm_client.response_cache import (
+    InMemoryResponseCache,
+    SQLiteResponseCache,
+    make_cache_key,
+)
+from tests.conftest import FakeClient, user_messages
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def response_cache(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryResponseCache(maxsize=16)
+    else:
+        cache = SQLiteResponseCache(str(tmp_path / "responses.db"))
+        yield cache
+        cache.close()
+
+
+def test_cache_key_ignores_dict_ordering():
+    assert make_cache_key("ns", {"a": 1, "b": [1, 2]}) == make_cache_key(
+        "ns", {"b": [1, 2], "a": 1}
+    )
+    assert make_cache_key("ns", {"a": 1}) != make_cache_key("other", {"a": 1})
+    assert make_cache_key("ns", {"image": b"abc"}) != make_cache_key(
+        "ns", {"image": b"abd"}
+    )
+
+
+def test_sync_responses_are_cached(response_cache):
+    client = FakeClient()
+    client.response_cache = response_cache
+
+    assert client.send(user_messages(), None) == "hello"
+    assert client.send(user_messages(), None) == "hello"
+    assert client.api_calls == 1
+
+    client.temperature = 0.7
+    assert client.send(user_messages(), None) == "hello"
+    assert client.api_calls == 2
+
+
+def test_stream_is_replayed_with_same_events(response_cache):
+    client = FakeClient(stream=True)
+    client.response_cache = response_cache
+
+    first = list(client.send(user_messages("hi"), None))
+    second = list(client.send(user_messages("hi"), None))
+
+    assert client.api_calls == 1
+    assert first == second
+    assert second[-1]["type"] == "stop"
+    assert [event["delta"] for event in second] == ["h", "i", ""]
+    # Also true for backends that store events as JSON
+    assert [event["type"] for event in second] == ["delta", "delta", "stop"]
+
+
+def test_partially_consumed_stream_is_not_cached():
+    client = FakeClient(stream=True)
+    client.response_cache = InMemoryResponseCache()
+
+    next(iter(client.send(user_messages(), None)))
+    list(client.send(user_messages(), None))
+
+    assert client.api_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_async_stream_is_replayed(response_cache):
+    client = FakeClient(stream=True)
+    client.response_cache = response_cache
+
+    first = [event async for event in client.async_send(user_messages(), None)]
+    second = [event async for event in client.async_send(user_messages(), None)]
+
+    assert client.api_calls == 1
+    assert first == second
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "responses.db"), max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_sqlite_cache_expires_entries(tmp_path, mocker):
+    clock = mocker.patch("shz_llm_client.response_cache.time.time", return_value=1000.0)
+    cache = SQLiteResponseCache(str(tmp_path / "responses.db"), ttl=60)
+    cache.set("a", ["event"])
+
+    clock.return_value = 1059.0
+    assert cache.get("a") == ["event"]
+
+    clock.return_value = 1061.0
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "responses.db")
+    SQLiteResponseCache(path).set("key", {"delta": "x", "type": "delta"})
+
+    assert SQLiteResponseCache(path).get("key") == {"delta": "x", "type": "delta"}
@@ -0,0 +1,178 @@
+import asyncio
+
+import openai
+import pytest
+from botocore.exceptions import ClientError
+
+from shz_llm_client import AnthropicBedrockClient, OpenAIClient
+from shz_llm_client.retry import Hedging, RetryBudget, RetryPolicy
+from tests.conftest import FakeClient, user_messages
+
+
+class TransientError(Exception):
+    pass
+
+
+class FlakyClient(FakeClient):
+    """Fake client whose first `failures` requests raise `TransientError`"""
+
+    def __init__(self, failures=0, delays=()):
+        super().__init__(model_id="flaky")
+        self.failures = failures
+        self.delays = list(delays)
+
+    def _request_number(self):
+        self.api_calls += 1
+        if self.api_calls <= self.failures:
+            raise TransientError(f"failure {self.api_calls}")
+        return self.api_calls
+
+    def _make_api_request(self, payload):
+        return f"{payload['content']} {self._request_number()}"
+
+    async def _async_make_api_request(self, payload):
+        number = self.api_calls + 1
+        delay = self.delays[number - 1] if number <= len(self.delays) else 0
+        self._request_number()
+        await asyncio.sleep(delay)
+        return f"{payload['content']} {number}"
+
+    def _is_retryable(self, error):
+        return isinstance(error, TransientError)
+
+
+def _fast_policy(**kwargs):
+    return RetryPolicy(base_delay=0.001, max_delay=0.01, **kwargs)
+
+
+def test_transient_errors_are_retried():
+    client = FlakyClient(failures=2)
+    client.retry_policy = _fast_policy(max_attempts=3)
+
+    assert client.send(user_messages("hi"), None) == "hi 3"
+    assert client.usage.requests == 1 and client.usage.errors == 0
+
+
+def test_retries_stop_after_max_attempts():
+    client = FlakyClient(failures=5)
+    client.retry_policy = _fast_policy(max_attempts=2)
+
+    with pytest.raises(TransientError):
+        client.send(user_messages("hi"), None)
+    assert client.api_calls == 2
+
+
+def test_non_retryable_errors_are_raised():
+    client = FlakyClient(failures=1)
+    client._is_retryable = lambda error: False
+    client.retry_policy = _fast_policy()
+
+    with pytest.raises(TransientError):
+        client.send(user_messages("hi"), None)
+
+    client.retry_policy = _fast_policy(retry_on=(TransientError,))
+    assert client.send(user_messages("hi"), None) == "hi 2"
+
+
+def test_budget_limits_retries():
+    client = FlakyClient(failures=10)
+    client.retry_policy = _fast_policy(
+        max_attempts=5, budget=RetryBudget(ratio=0, capacity=2)
+    )
+
+    with pytest.raises(TransientError):
+        client.send(user_messages("hi"), None)
+    # The first request and the two retries of the budget
+    assert client.api_calls == 3
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=4)
+
+    delays = [policy.backoff(10) for _ in range(100)]
+
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.asyncio
+async def test_async_send_retries():
+    client = FlakyClient(failures=1)
+    client.retry_policy = _fast_policy()
+
+    assert [r async for r in client.async_send(user_messages("hi"), None)] == ["hi 2"]
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_over_slow_request():
+    client = FlakyClient(delays=[1.0, 0.0])
+    client.hedging = Hedging(delay=0.02)
+
+    responses = [r async for r in client.async_send(user_messages("hi"), None)]
+
+    assert responses == ["hi 2"]
+    assert client.api_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_fast_requests_are_not_hedged():
+    client = FlakyClient()
+    client.hedging = Hedging(delay=0.5)
+
+    assert [r async for r in client.async_send(user_messages("hi"), None)] == ["hi 1"]
+    assert client.api_calls == 1
+
+
+def test_hedge_delay_follows_observed_latencies():
+    hedging = Hedging(quantile=0.9, min_samples=10)
+    assert hedging.hedge_delay is None
+
+    for latency in range(1, 11):
+        hedging.record(latency / 10)
+
+    assert hedging.hedge_delay == 0.9
+
+
+def test_hedge_delay_is_the_nearest_rank_percentile():
+    hedging = Hedging(quantile=0.95, min_samples=1)
+
+    for latency in range(1, 21):
+        hedging.record(latency / 100)
+
+    # p95 of 20 samples is the 19th, not the maximum
+    assert hedging.hedge_delay == 0.19
+
+
+def test_bedrock_throttling_is_retryable():
+    client = AnthropicBedrockClient(model_id="anthropic.claude-3-haiku-20240307-v1:0")
+
+    def error(code):
+        return ClientError({"Error": {"Code": code}}, "InvokeModel")
+
+    assert client._is_retryable(error("ThrottlingException"))
+    assert not client._is_retryable(error("ValidationException"))
+
+
+def test_openai_sdk_does_not_retry_under_a_retry_policy():
+    client = OpenAIClient(api_key="retry-key")
+    assert client.client.max_retries == openai.DEFAULT_MAX_RETRIES
+
+    client.retry_policy = _fast_policy()
+
+    other = OpenAIClient(api_key="retry-key")
+    other.retry_policy = _fast_policy()
+
+    assert client.client.max_retries == 0
+    assert client.client is other.client
+
+
+def test_bedrock_sdk_does_not_retry_under_a_retry_policy():
+    client = AnthropicBedrockClient(model_id="anthropic.claude-3-haiku-20240307-v1:0")
+    default_client = client.client
+    assert default_client is client.client
+
+    client.retry_policy = _fast_policy()
+
+    assert client.client is not default_client
+    assert client.client.meta.config.retries["total_max_attempts"] == 1
+    assert client.client is client.client
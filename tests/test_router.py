@@ -0,0 +1,116 @@
+import pytest
+
+from shz_llm_client import RouterClient
+from tests.conftest import FakeClient, user_messages
+
+
+class NamedClient(FakeClient):
+    """
+    Fake client answering with its name, failing when `fail` is set or in the
+    middle of a stream after `fail_after` characters
+    """
+
+    def __init__(self, name, stream=False, fail=False, fail_after=None):
+        super().__init__(stream=stream, model_id=name, input_tokens=1)
+        self.name = name
+        self.fail = fail
+        self.fail_after = fail_after
+
+    def _make_api_request(self, payload):
+        self.api_calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return self.name
+
+    def _events(self, response):
+        for index, event in enumerate(super()._events(response)):
+            if index == self.fail_after:
+                raise RuntimeError(f"{self.name} broke mid-stream")
+            yield event
+
+
+def test_routes_to_the_fastest_client():
+    slow, fast = NamedClient("slow"), NamedClient("fast")
+    router = RouterClient([slow, fast])
+    router._record_success(slow, 2.0)
+    router._record_success(fast, 0.5)
+
+    assert router.send(user_messages(), None) == "fast"
+    assert slow.api_calls == 0
+
+
+def test_fails_over_and_marks_client_unhealthy():
+    down, up = NamedClient("down", fail=True), NamedClient("up")
+    router = RouterClient([down, up], smoothing=0.5, max_error_rate=0.5)
+
+    assert router.send(user_messages(), None) == "up"
+    assert router.stats(down).errors == 1
+    assert router.stats(down).unhealthy_until > 0
+
+    # The unhealthy client is skipped while it cools down
+    assert router.send(user_messages(), None) == "up"
+    assert down.api_calls == 1
+    assert router.usage.requests == 2
+
+
+def test_raises_when_every_client_fails():
+    router = RouterClient([NamedClient("a", fail=True), NamedClient("b", fail=True)])
+
+    with pytest.raises(RuntimeError, match="b is down"):
+        router.send(user_messages(), None)
+    assert router.usage.errors == 1
+
+
+def test_latency_is_smoothed():
+    client = NamedClient("a")
+    router = RouterClient([client], smoothing=0.5)
+
+    router._record_success(client, 1.0)
+    router._record_success(client, 3.0)
+
+    assert router.stats(client).latency == 2.0
+
+
+def test_stream_fails_over_before_first_event():
+    down = NamedClient("down", stream=True, fail_after=0)
+    up = NamedClient("up", stream=True)
+    router = RouterClient([down, up])
+
+    events = list(router.send(user_messages(), None))
+
+    assert "".join(event["delta"] for event in events) == "up"
+    assert events[-1]["type"] == "stop"
+
+
+def test_stream_error_after_output_is_raised():
+    router = RouterClient(
+        [
+            NamedClient("broken", stream=True, fail_after=2),
+            NamedClient("up", stream=True),
+        ]
+    )
+
+    with pytest.raises(RuntimeError, match="mid-stream"):
+        list(router.send(user_messages(), None))
+
+
+def test_clients_must_share_stream_mode():
+    with pytest.raises(ValueError):
+        RouterClient([NamedClient("a"), NamedClient("b", stream=True)])
+
+
+@pytest.mark.asyncio
+async def test_async_send_fails_over():
+    router = RouterClient([NamedClient("down", fail=True), NamedClient("up")])
+
+    assert [r async for r in router.async_send(user_messages(), None)] == ["up"]
+
+    streaming = RouterClient(
+        [
+            NamedClient("down", stream=True, fail=True),
+            NamedClient("up", stream=True),
+        ]
+    )
+    events = [e async for e in streaming.async_send(user_messages(), None)]
+    assert "".join(event["delta"] for event in events) == "up"
+    assert streaming.usage.output_tokens == 2
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from shz_llm_client import AnthropicBedrockClient, RequestMessage
+from shz_llm_client.stream_bridge import async_iterate_in_thread, read_ahead
+
+
+class BlockingStream:
+    """Iterator recording how far it was read, optionally failing at `fail_at`"""
+
+    def __init__(self, count, fail_at=None, delay=0.0):
+        self.count = count
+        self.fail_at = fail_at
+        self.delay = delay
+        self.read = 0
+        self.closed = False
+        self.threads = set()
+
+    def __iter__(self):
+        for index in range(self.count):
+            self.threads.add(threading.get_ident())
+            if index == self.fail_at:
+                raise RuntimeError("stream broke")
+            time.sleep(self.delay)
+            self.read += 1
+            yield index
+
+    def close(self):
+        self.closed = True
+
+
+def test_read_ahead_yields_every_item_from_another_thread():
+    stream = BlockingStream(10)
+
+    assert list(read_ahead(stream, max_buffer=3)) == list(range(10))
+    assert threading.get_ident() not in stream.threads
+
+
+def test_read_ahead_is_bounded_and_closes_early():
+    stream = BlockingStream(100)
+    items = read_ahead(stream, max_buffer=4)
+
+    assert next(items) == 0
+    time.sleep(0.05)
+    # One item consumed, four buffered, one waiting to be buffered
+    assert stream.read <= 6
+
+    items.close()
+    time.sleep(0.3)
+    assert stream.closed
+
+
+def test_read_ahead_raises_stream_errors():
+    with pytest.raises(RuntimeError, match="stream broke"):
+        list(read_ahead(BlockingStream(5, fail_at=2)))
+
+
+@pytest.mark.asyncio
+async def test_async_iteration_does_not_block_the_loop():
+    stream = BlockingStream(5, delay=0.02)
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticker = asyncio.ensure_future(tick())
+    items = [item async for item in async_iterate_in_thread(stream, max_buffer=2)]
+    ticker.cancel()
+
+    assert items == list(range(5))
+    assert ticks > 5
+
+
+@pytest.mark.asyncio
+async def test_async_iteration_raises_stream_errors():
+    with pytest.raises(RuntimeError, match="stream broke"):
+        [item async for item in async_iterate_in_thread(BlockingStream(5, fail_at=1))]
+
+
+def _bedrock_events():
+    chunks = [
+        {"type": "message_start"},
+        {"type": "content_block_delta", "delta": {"text": "Hi"}},
+        {"type": "message_delta", "delta": {"stop_reason": "end_turn"}},
+        {
+            "type": "message_stop",
+            "amazon-bedrock-invocationMetrics": {
+                "inputTokenCount": 4,
+                "outputTokenCount": 1,
+            },
+        },
+    ]
+    return [{"chunk": {"bytes": json.dumps(c).encode()}} for c in chunks]
+
+
+class FakeBedrockRuntime:
+    def invoke_model_with_response_stream(self, body, modelId):
+        return {"body": iter(_bedrock_events())}
+
+
+def _client(**kwargs):
+    client = AnthropicBedrockClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0", stream=True, **kwargs
+    )
+    client.client = FakeBedrockRuntime()
+    return client
+
+
+def test_bedrock_sync_stream_with_read_ahead():
+    client = _client(stream_read_ahead=8)
+
+    events = list(client.send([RequestMessage(role="user", content="Hi")], None))
+
+    assert "".join(event["delta"] for event in events) == "Hi"
+    assert events[-1]["type"] == "stop"
+    assert events[-1]["total_tokens"] == 5 and events[-1]["finish_reason"] == "end_turn"
+
+
+@pytest.mark.asyncio
+async def test_bedrock_async_stream_through_sync_client():
+    client = _client(use_aioboto3=False)
+    messages = [RequestMessage(role="user", content="Hi")]
+
+    events = [event async for event in client.async_send(messages, None)]
+
+    assert "".join(event["delta"] for event in events) == "Hi"
+    assert events[-1]["type"] == "stop"
+    assert events[-1]["total_tokens"] == 5 and events[-1]["finish_reason"] == "end_turn"
+    assert client._async_client is None
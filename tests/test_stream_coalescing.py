@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from shz_llm_client import DeltaCoalescing, stream_stop
+from shz_llm_client.stream_coalescing import async_coalesce_deltas, coalesce_deltas
+from tests.conftest import FakeClient, user_messages
+
+STOP = stream_stop(delta="", input_tokens=1, output_tokens=2, total_tokens=3)
+
+
+def _delta(text):
+    return {"delta": text, "type": "delta"}
+
+
+def test_coalesce_by_size_keeps_stop_event():
+    events = [_delta(c) for c in "abcdefg"] + [_delta(""), STOP]
+
+    coalescing = DeltaCoalescing(max_bytes=3, max_delay=None)
+    coalesced = list(coalesce_deltas(events, coalescing))
+
+    assert coalesced == [_delta("abc"), _delta("def"), _delta("g"), STOP]
+    assert coalesced[-1] is STOP
+
+
+def test_coalesce_counts_utf8_bytes():
+    events = [_delta("é"), _delta("é"), _delta("a")]
+
+    coalescing = DeltaCoalescing(max_bytes=4, max_delay=None)
+    coalesced = list(coalesce_deltas(events, coalescing))
+
+    assert coalesced == [_delta("éé"), _delta("a")]
+
+
+def test_coalescing_needs_a_limit():
+    with pytest.raises(ValueError):
+        DeltaCoalescing(max_bytes=None, max_delay=None)
+
+
+def test_client_send_coalesces_when_enabled():
+    client = FakeClient(stream=True)
+    messages = user_messages("hello world")
+
+    assert len(list(client.send(messages, None))) == 12
+
+    client.delta_coalescing = DeltaCoalescing(max_bytes=4, max_delay=None)
+    events = list(client.send(messages, None))
+    assert [event["delta"] for event in events] == ["hell", "o wo", "rld", ""]
+    assert events[-1]["type"] == "stop" and events[-1]["output_tokens"] == 11
+
+
+@pytest.mark.asyncio
+async def test_async_coalesce_flushes_on_time_while_upstream_stalls():
+    received = []
+
+    async def events():
+        yield _delta("a")
+        yield _delta("b")
+        await asyncio.sleep(0.2)
+        yield _delta("c")
+        yield STOP
+
+    coalescing = DeltaCoalescing(max_bytes=None, max_delay=0.02)
+    async for event in async_coalesce_deltas(events(), coalescing):
+        received.append((event["delta"], event["type"]))
+        if event["delta"] == "ab":
+            # Flushed by the window, before the stalled chunk arrived
+            assert len(received) == 1
+
+    assert received == [("ab", "delta"), ("c", "delta"), ("", "stop")]
+
+
+@pytest.mark.asyncio
+async def test_async_send_coalesces_and_closes_upstream_early():
+    client = FakeClient(stream=True, chunk_delay=0.001)
+    client.delta_coalescing = DeltaCoalescing(max_bytes=5, max_delay=1.0)
+    messages = user_messages("0123456789abc")
+
+    events = [event async for event in client.async_send(messages, None)]
+    assert [event["delta"] for event in events] == ["01234", "56789", "abc", ""]
+
+    stream = client.async_send(messages, None)
+    assert (await stream.__anext__())["delta"] == "01234"
+    await stream.aclose()
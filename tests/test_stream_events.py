@@ -0,0 +1,86 @@
+import json
+
+from openai.types.chat import ChatCompletionChunk
+
+from shz_llm_client import AnthropicBedrockClient, OpenAIClient, stream_stop
+
+
+def test_stop_event_has_every_key():
+    stop = stream_stop(input_tokens=1, output_tokens=2, total_tokens=3)
+
+    assert stop == {
+        "delta": "",
+        "input_tokens": 1,
+        "output_tokens": 2,
+        "total_tokens": 3,
+        "finish_reason": None,
+        "latency": None,
+        "cache_read_tokens": None,
+        "cache_write_tokens": None,
+        "type": "stop",
+    }
+    assert type(stop) is dict
+
+
+def test_events_are_json_serializable():
+    delta = {"delta": "hi", "type": "delta"}
+    stop = stream_stop(input_tokens=1, output_tokens=2, total_tokens=3, latency=0.5)
+
+    assert json.loads(json.dumps(delta)) == delta
+    assert json.loads(json.dumps(stop)) == stop
+
+
+def _openai_chunk(content=None, usage=None) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [] if usage else [{"index": 0, "delta": {"content": content}}],
+            "usage": usage,
+        }
+    )
+
+
+def test_openai_stream_events():
+    client = OpenAIClient(api_key="fake-key", stream=True)
+    chunks = [
+        _openai_chunk("Hel"),
+        _openai_chunk(None),
+        _openai_chunk(
+            usage={"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+        ),
+    ]
+
+    events = list(client._stream_response_generator(chunks))
+
+    assert events == [
+        {"delta": "Hel", "type": "delta"},
+        {"delta": "", "type": "delta"},
+        stream_stop(input_tokens=3, output_tokens=2, total_tokens=5),
+    ]
+    assert all(type(event) is dict for event in events)
+
+
+def test_bedrock_sync_stream_yields_events_with_usage():
+    client = AnthropicBedrockClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0", stream=True
+    )
+    chunks = [
+        {"type": "message_start"},
+        {"type": "content_block_delta", "delta": {"text": "Hi"}},
+        {
+            "type": "message_stop",
+            "amazon-bedrock-invocationMetrics": {
+                "inputTokenCount": 4,
+                "outputTokenCount": 1,
+            },
+        },
+    ]
+    response = {"body": [{"chunk": {"bytes": json.dumps(c).encode()}} for c in chunks]}
+
+    events = list(client._stream_response_generator(response))
+
+    assert [event["delta"] for event in events] == ["", "Hi", ""]
+    assert events[-1] == stream_stop(input_tokens=4, output_tokens=1, total_tokens=5)
@@ -0,0 +1,153 @@
+import json
+from io import BytesIO
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from shz_llm_client import AnthropicBedrockClient, LLMResponse, OpenAIClient
+from shz_llm_client.response_cache import InMemoryResponseCache
+from tests.conftest import FakeClient, user_messages
+
+
+def test_llm_response_is_a_str_with_usage():
+    response = LLMResponse("hi", 1, 2, 3, "stop")
+
+    assert response == "hi" and isinstance(response, str)
+    assert response.text == "hi" and type(response.text) is str
+    assert (response.input_tokens, response.output_tokens) == (1, 2)
+    assert response.upper() == "HI"
+
+
+def test_send_returns_response_with_usage_and_latency():
+    client = FakeClient()
+
+    response = client.send(user_messages(), None)
+
+    assert response == "hello"
+    assert response.output_tokens == 5 and response.finish_reason == "stop"
+    assert response.latency >= 0 and not response.cached
+
+    stats = client.usage
+    assert stats.requests == 1
+    assert (stats.input_tokens, stats.output_tokens, stats.total_tokens) == (2, 5, 7)
+    assert stats.average_latency == stats.latency
+
+
+def test_plain_str_responses_are_wrapped():
+    client = FakeClient()
+    client._process_response = lambda response: response
+
+    response = client.send(user_messages(), None)
+
+    assert isinstance(response, LLMResponse) and response.input_tokens is None
+    assert client.usage.requests == 1 and client.usage.total_tokens == 0
+
+
+def test_stream_stop_gets_latency_and_is_counted():
+    client = FakeClient(stream=True)
+
+    events = list(client.send(user_messages("abc"), None))
+
+    assert events[-1]["latency"] >= 0 and events[-1]["finish_reason"] == "stop"
+    assert client.usage.requests == 1 and client.usage.output_tokens == 3
+
+
+@pytest.mark.asyncio
+async def test_async_paths_are_counted():
+    client = FakeClient()
+    responses = [r async for r in client.async_send(user_messages("ab"), None)]
+    assert responses[-1].output_tokens == 2 and responses[-1].latency >= 0
+
+    client.stream = True
+    events = [e async for e in client.async_send(user_messages("abc"), None)]
+    assert events[-1]["latency"] >= 0
+
+    assert client.usage.requests == 2 and client.usage.output_tokens == 5
+
+
+@pytest.mark.asyncio
+async def test_errors_and_cache_hits_are_counted_apart():
+    client = FakeClient()
+    client.response_cache = InMemoryResponseCache(maxsize=4)
+
+    client.send(user_messages(), None)
+    cached = client.send(user_messages(), None)
+    with pytest.raises(RuntimeError):
+        client.send(user_messages("fail"), None)
+    with pytest.raises(RuntimeError):
+        [r async for r in client.async_send(user_messages("fail"), None)]
+
+    assert cached.cached and cached.output_tokens == 5
+    stats = client.usage
+    assert (stats.requests, stats.cached, stats.errors) == (1, 1, 2)
+    assert stats.output_tokens == 5
+
+    client.usage_counter.reset()
+    assert client.usage.requests == 0 and client.usage.tokens_per_second is None
+
+
+def test_openai_response_usage():
+    client = OpenAIClient(api_key="fake-key")
+    completion = ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "length",
+                    "message": {"role": "assistant", "content": "Hi"},
+                }
+            ],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4},
+        }
+    )
+
+    response = client._process_response(completion)
+
+    assert response == "Hi"
+    assert (response.input_tokens, response.total_tokens) == (3, 4)
+    assert response.finish_reason == "length"
+
+
+def _bedrock_client(stream=False):
+    return AnthropicBedrockClient(
+        model_id="anthropic.claude-3-haiku-20240307-v1:0", stream=stream
+    )
+
+
+def test_bedrock_response_usage():
+    body = {
+        "content": [{"type": "text", "text": "Hi"}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": 4, "output_tokens": 1},
+    }
+
+    response = _bedrock_client()._process_response(
+        {"body": BytesIO(json.dumps(body).encode())}
+    )
+
+    assert response == "Hi"
+    assert (response.input_tokens, response.output_tokens) == (4, 1)
+    assert response.total_tokens == 5 and response.finish_reason == "end_turn"
+
+
+def test_bedrock_sync_stream_stop_has_metrics_and_stop_reason():
+    chunks = [
+        {"type": "content_block_delta", "delta": {"text": "Hi"}},
+        {"type": "message_delta", "delta": {"stop_reason": "max_tokens"}},
+        {
+            "type": "message_stop",
+            "amazon-bedrock-invocationMetrics": {
+                "inputTokenCount": 4,
+                "outputTokenCount": 1,
+            },
+        },
+    ]
+    response = {"body": [{"chunk": {"bytes": json.dumps(c).encode()}} for c in chunks]}
+
+    stop = list(_bedrock_client(stream=True)._stream_response_generator(response))[-1]
+
+    assert stop["total_tokens"] == 5 and stop["finish_reason"] == "max_tokens"
@@ -0,0 +1,245 @@
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from shz_llm_client import vision
+from shz_llm_client.vision import (
+    _stream_to_base64,
+    async_load_s3_images,
+    async_prepare_images,
+    image_to_base64,
+    load_image_item,
+    prepare_images,
+    resize_image,
+    s3_image_to_base64,
+)
+
+IMAGE_PATH = "./tests/images/vanGoh.jpg"
+
+
+class ShortReadStream(BytesIO):
+    """Returns fewer bytes than requested, like a network stream"""
+
+    def read(self, size=-1):
+        return super().read(min(size, 1000) if size and size > 0 else size)
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 1000, 786_433])
+def test_stream_to_base64_matches_base64(size):
+    data = bytes(range(256)) * (size // 256 + 1)
+    data = data[:size]
+
+    assert _stream_to_base64(BytesIO(data)) == base64.b64encode(data).decode()
+    assert _stream_to_base64(ShortReadStream(data)) == base64.b64encode(data).decode()
+
+
+def test_resize_image_fits_both_limits():
+    with open(IMAGE_PATH, "rb") as file:
+        image = Image.open(resize_image(file, max_short_side=600, max_long_side=650))
+
+    # 750x977: the long side is the tighter limit
+    assert image.size == (498, 650)
+    assert image.format == "JPEG"
+
+
+def test_resize_image_returns_original_bytes_when_image_fits():
+    with open(IMAGE_PATH, "rb") as file:
+        original = file.read()
+        file.seek(0)
+        resized = resize_image(file, max_short_side=768, max_long_side=2000)
+
+    assert resized.read() == original
+
+
+def test_load_image_item_without_limits_is_the_plain_encoding():
+    image_item = load_image_item(IMAGE_PATH)
+
+    assert image_item.b64_string == image_to_base64(IMAGE_PATH)
+    assert image_item.image_type.value == "jpeg"
+    assert image_item.image_name == "vanGoh.jpg"
+
+
+def test_load_image_item_downscales_large_images():
+    image_io = BytesIO()
+    Image.new("RGB", (4000, 3000), color="blue").save(image_io, format="PNG")
+    image_io.seek(0)
+
+    image_item = load_image_item(image_io, max_short_side=768, max_long_side=2000)
+
+    image = Image.open(BytesIO(base64.b64decode(image_item.b64_string)))
+    assert image.size == (1024, 768)
+    assert image_item.image_type.value == "png"
+
+
+def _large_png_bytes(width=4000, height=3000) -> bytes:
+    image_io = BytesIO()
+    Image.new("RGB", (width, height), color="green").save(image_io, format="PNG")
+    return image_io.getvalue()
+
+
+def _image_bytes() -> bytes:
+    with open(IMAGE_PATH, "rb") as file:
+        return file.read()
+
+
+def test_prepare_images_applies_vendor_limits_in_order():
+    sources = [_large_png_bytes(), IMAGE_PATH]
+
+    image_items = prepare_images(sources, vendor="openai")
+
+    sizes = [
+        Image.open(BytesIO(base64.b64decode(item.b64_string))).size
+        for item in image_items
+    ]
+    assert sizes == [(1024, 768), (750, 977)]
+
+
+@pytest.mark.asyncio
+async def test_async_prepare_images_with_thread_pool():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        image_items = await async_prepare_images(
+            [_large_png_bytes(), _large_png_bytes(3000, 4000)],
+            vendor="anthropic",
+            executor=executor,
+        )
+
+    sizes = [
+        Image.open(BytesIO(base64.b64decode(item.b64_string))).size
+        for item in image_items
+    ]
+    assert sizes == [(1568, 1176), (1176, 1568)]
+
+
+def test_prepare_images_rejects_unknown_vendor():
+    with pytest.raises(ValueError):
+        prepare_images([IMAGE_PATH], vendor="unknown")
+
+
+class _FakeAioBody:
+    def __init__(self, data: bytes):
+        self._stream = ShortReadStream(data)
+
+    async def read(self, size=-1):
+        await asyncio.sleep(0)
+        return self._stream.read(size)
+
+
+class _FakeAioS3Client:
+    """aioboto3 S3 client stand-in that records how many GETs overlap"""
+
+    def __init__(self, objects: dict):
+        self.objects = objects
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_object(self, Bucket, Key):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return {"Body": _FakeAioBody(self.objects[(Bucket, Key)])}
+
+
+@pytest.mark.asyncio
+async def test_async_load_s3_images_streams_in_order_with_bounded_concurrency():
+    original = _image_bytes()
+    objects = {("bucket", f"images/{idx}.jpg"): original for idx in range(10)}
+    objects[("bucket", "images/large.png")] = _large_png_bytes()
+    s3_client = _FakeAioS3Client(objects)
+
+    image_items = await async_load_s3_images(
+        list(objects), s3_client=s3_client, max_concurrency=4
+    )
+
+    assert s3_client.max_in_flight == 4
+    assert [item.image_name for item in image_items][-2:] == ["9.jpg", "large.png"]
+    assert image_items[0].b64_string == base64.b64encode(original).decode()
+    assert image_items[0].image_type.value == "jpeg"
+    assert image_items[-1].image_type.value == "png"
+
+
+@pytest.mark.asyncio
+async def test_async_load_s3_images_resizes_with_limits():
+    s3_client = _FakeAioS3Client({("bucket", "large.png"): _large_png_bytes()})
+
+    (image_item,) = await async_load_s3_images(
+        [("bucket", "large.png")], 768, 2000, s3_client=s3_client
+    )
+
+    image = Image.open(BytesIO(base64.b64decode(image_item.b64_string)))
+    assert image.size == (1024, 768)
+
+
+def test_s3_image_to_base64_reuses_the_shared_client(mocker):
+    mocker.patch.object(vision, "_s3_client", None)
+    s3_client = mocker.Mock()
+    s3_client.get_object.side_effect = lambda Bucket, Key: {
+        "Body": BytesIO(b"image bytes")
+    }
+    boto3_client = mocker.patch("boto3.client", return_value=s3_client)
+
+    for key in ("a.jpg", "b.jpg"):
+        assert (
+            s3_image_to_base64("bucket", key)
+            == base64.b64encode(b"image bytes").decode()
+        )
+
+    boto3_client.assert_called_once()
+
+
+def test_s3_image_to_base64_against_moto(mocker):
+    moto = pytest.importorskip("moto")
+    mocker.patch.object(vision, "_s3_client", None)
+
+    with moto.mock_aws():
+        import boto3
+
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="bucket")
+        with open(IMAGE_PATH, "rb") as file:
+            s3.put_object(Bucket="bucket", Key="vanGoh.jpg", Body=file.read())
+
+        assert s3_image_to_base64("bucket", "vanGoh.jpg", s3) == image_to_base64(
+            IMAGE_PATH
+        )
+
+
+@pytest.fixture
+def moto_s3_url():
+    moto_server = pytest.importorskip("moto.server")
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.mark.asyncio
+async def test_async_load_s3_images_against_moto(moto_s3_url):
+    aioboto3 = pytest.importorskip("aioboto3")
+    original = _image_bytes()
+
+    session = aioboto3.Session(
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="us-east-1",
+    )
+    async with session.client("s3", endpoint_url=moto_s3_url) as s3_client:
+        await s3_client.create_bucket(Bucket="bucket")
+        for key in ("images/a.jpg", "images/b.jpg"):
+            await s3_client.put_object(
+                Bucket="bucket", Key=key, Body=original, ContentType="image/jpeg"
+            )
+
+        image_items = await async_load_s3_images(
+            [("bucket", "images/a.jpg"), ("bucket", "images/b.jpg")],
+            s3_client=s3_client,
+        )
+
+    assert [item.image_name for item in image_items] == ["a.jpg", "b.jpg"]
+    assert image_items[0].b64_string == base64.b64encode(original).decode()
+    assert image_items[1].image_type.value == "jpeg"